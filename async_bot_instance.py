@@ -0,0 +1,28 @@
+from telebot import asyncio_filters, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_storage import StateMemoryStorage
+from config import config
+from outbox import AsyncOutbox
+
+if config.TELEGRAM_API_URL:
+    asyncio_helper.API_URL = config.TELEGRAM_API_URL
+
+if config.STATE_STORAGE != "memory":
+    # StatePostgresStorage синхронный и заблокировал бы event loop
+    raise ValueError(
+        "В асинхронном режиме доступно только хранилище состояний memory"
+    )
+
+storage = StateMemoryStorage()
+bot = AsyncTeleBot(config.BOT_TOKEN, state_storage=storage)
+bot.add_custom_filter(asyncio_filters.StateFilter(bot))
+# Ответы обработчиков уходят через очередь с лимитами Telegram
+outbox = AsyncOutbox(
+    bot,
+    global_rate=config.OUTBOX_GLOBAL_RATE,
+    chat_rate=config.OUTBOX_CHAT_RATE,
+    chat_burst=config.OUTBOX_CHAT_BURST,
+    workers=config.OUTBOX_WORKERS,
+    max_retries=config.OUTBOX_MAX_RETRIES,
+    stop_timeout=config.OUTBOX_STOP_TIMEOUT,
+)
@@ -0,0 +1,10 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from config import config
+from db_pool import engine_options
+
+
+# Движок для асинхронного режима (BOT_MODE=async), драйвер asyncpg
+engine = create_async_engine(
+    config.ASYNC_DSN, echo=False, **engine_options(is_async=True),
+)
+Session = async_sessionmaker(bind=engine, expire_on_commit=False)
@@ -0,0 +1,503 @@
+"""
+Обработчики асинхронного режима (BOT_MODE=async): те же сценарии,
+что и в handlers, но корутинами AsyncTeleBot поверх async_services.
+"""
+import logging
+
+from telebot import types
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from async_bot_instance import bot, outbox
+from config import config
+from dispatch import Router
+from outbox import Priority
+from quiz import (
+    CallbackAction,
+    Command,
+    StateWords,
+    callback_answer,
+    inline_mode,
+    inline_quiz_markup,
+    quiz_markup,
+    start_markup,
+)
+from async_services import (
+    add_user_word,
+    create_words,
+    get_user_id,
+    get_words,
+    leaderboard_text,
+    new_user,
+    remove_word,
+    update_learning_history,
+)
+from services import (
+    QuizCard,
+    make_card,
+    show_hint,
+    show_target,
+)
+from validators import validate_english_word, validate_russian_text
+
+logger = logging.getLogger(__name__)
+
+# Команды, кнопки и состояния выбираются одним поиском (см. dispatch.py)
+router = Router()
+# Карточки с inline-кнопками вместо текстовых (QUIZ_MODE=inline)
+INLINE = inline_mode(config.QUIZ_MODE)
+
+
+@router.command("start")
+async def start(message):
+    """
+    Обработчик команды /start
+    Регистрирует пользователя, отправляет приветственное сообщение
+    и отображает кнопку 'Тренька!'
+    """
+    await new_user(message)
+    markup = start_markup(inline=INLINE)
+    hello = (
+        f"Привет {message.from_user.username}👋 "
+        "Давай попрактикуемся в английском языке. "
+        "Нажми на кнопку 'Тренька!'"
+    )
+    outbox.send_message(
+        message.chat.id, hello, reply_markup=markup,
+    )
+
+
+async def prepare_card(user_id, tg_id, chat_id):
+    """
+    Новая карточка: сохраняется в состоянии выбора слова. Возвращает
+    текст вопроса и клавиатуру или None, если слов для тренировки нет
+    """
+    pairs = await create_words(user_id)
+    if not pairs:
+        return None
+    card, options, question = make_card(pairs)
+
+    await bot.set_state(tg_id, StateWords.choose_word, chat_id)
+    async with bot.retrieve_data(tg_id, chat_id) as data:
+        data["card"] = card
+
+    if INLINE:
+        markup = inline_quiz_markup(
+            card.word_id, card.option_ids, options,
+        )
+    else:
+        markup = quiz_markup(options)
+    return f"Тогда выбери перевод слова:\n🇷🇺 {question}", markup
+
+
+@router.button(Command.TRAIN)
+async def train(message):
+    """
+    Обработчик кнопки 'Тренька!' - запускает тренировку.
+    Для уже известных пользователей new_user отвечает из кэша,
+    таблица users на каждой карточке не читается
+    """
+    user_id = await new_user(message)
+    if user_id is None:
+        outbox.send_message(
+            message.chat.id, "Ошибка: пользователь не найден",
+        )
+        return
+    card = await prepare_card(user_id, message.from_user.id, message.chat.id)
+    if card is None:
+        outbox.send_message(
+            message.chat.id, "Ошибка: не удалось получить слова для тренировки"
+        )
+        return
+
+    question, markup = card
+    outbox.send_message(message.chat.id, question, reply_markup=markup)
+
+
+@router.button(Command.NEXT)
+async def next_cards(message):
+    """
+    Обработчик кнопки 'Дальше' - запускает тренировку с новым словом
+    """
+    await train(message)
+
+
+@router.button(Command.DELETE_WORD)
+async def delete_word(message):
+    """
+    Обработчик кнопки 'Удалить слово' - запрашивает слово для удаления
+    """
+    outbox.send_message(
+        message.chat.id,
+        "Введите слово на английском для удаления:",
+    )
+    await bot.set_state(
+        message.from_user.id,
+        StateWords.delete_word,
+        message.chat.id,
+    )
+
+
+@router.state(StateWords.delete_word)
+async def input_delete_word(message):
+    """
+    Обработчик удаления слова у пользователя.
+    Слово общего словаря скрывается только для него (hidden_words),
+    добавленное пользователем удаляется из Dictionary.
+    """
+    eng_word = (message.text or "").strip()
+    tg_id = message.from_user.id
+
+    ok, err = validate_english_word(eng_word)
+    if not ok:
+        outbox.send_message(message.chat.id, err)
+        await train(message)
+        return
+
+    try:
+        await bot.delete_state(message.from_user.id, message.chat.id)
+
+        user_id = await get_user_id(tg_id)
+        if user_id is None:
+            outbox.send_message(message.chat.id, "Пользователь не найден!")
+            return
+
+        if await remove_word(user_id, eng_word):
+            outbox.send_message(
+                message.chat.id, f"Слово '{eng_word}' успешно удалено!"
+            )
+        else:
+            outbox.send_message(message.chat.id, "Слово не найдено.")
+
+        await train(message)
+    except SQLAlchemyError as e:
+        logger.exception(
+            "Ошибка БД при удалении слова (tg_id=%s, слово=%s): %s",
+            tg_id, eng_word, e,
+        )
+        outbox.send_message(
+            message.chat.id,
+            "Произошла ошибка при удалении слова. Попробуйте позже.",
+        )
+        await train(message)
+    except Exception as e:
+        logger.exception("Неожиданная ошибка в input_delete_word: %s", e)
+        outbox.send_message(
+            message.chat.id,
+            "Произошла ошибка при удалении слова.",
+        )
+        await train(message)
+
+
+@router.command("stats")
+async def show_stats(message):
+    """
+    Обработчик команды /stats - показывает статистику пользователей
+    """
+    try:
+        # Топ-3 пользователей по количеству правильных ответов
+        text = await leaderboard_text()
+
+        if text is None:
+            outbox.send_message(
+                message.chat.id,
+                "Статистика пока пуста. "
+                "Начните тренироваться, чтобы попасть в рейтинг!",
+            )
+            return
+
+        # Таблица лидеров подождёт ответов викторины
+        outbox.send_message(message.chat.id, text, priority=Priority.BULK)
+    except SQLAlchemyError as e:
+        logger.exception("Ошибка БД в show_stats: %s", e)
+        outbox.send_message(
+            message.chat.id,
+            "Не удалось загрузить статистику. Попробуйте позже.",
+        )
+    except Exception as e:
+        logger.exception("Неожиданная ошибка в show_stats: %s", e)
+        outbox.send_message(
+            message.chat.id,
+            "Произошла ошибка при получении статистики.",
+        )
+
+
+@router.button(Command.ADD_WORD)
+async def add_word(message):
+    """
+    Обработчик кнопки 'Добавить слово' - запрашивает английское слово
+    """
+    outbox.send_message(message.chat.id, "Введите английское слово:")
+    await bot.set_state(
+        message.from_user.id, StateWords.add_eng_word, message.chat.id,
+    )
+
+
+@router.state(StateWords.add_eng_word)
+async def get_add_eng_word(message):
+    """
+    Обработчик ввода английского слова
+    """
+    text = (message.text or "").strip()
+    ok, err = validate_english_word(text)
+    if not ok:
+        outbox.send_message(message.chat.id, err)
+        return
+
+    try:
+        async with bot.retrieve_data(
+            message.from_user.id, message.chat.id,
+        ) as data:
+            data["add_eng_word"] = text
+            data["word_id"] = message.from_user.id
+        outbox.send_message(message.chat.id, "Введите перевод слова:")
+        await bot.set_state(
+            message.from_user.id,
+            StateWords.add_rus_word,
+            message.chat.id,
+        )
+    except Exception as e:
+        logger.exception(
+            "Ошибка при сохранении английского слова (tg_id=%s): %s",
+            message.from_user.id, e,
+        )
+        outbox.send_message(
+            message.chat.id,
+            "Произошла ошибка при сохранении слова. Попробуйте снова.",
+        )
+
+
+@router.state(StateWords.add_rus_word)
+async def get_add_rus_word(message):
+    """
+    Обработчик ввода перевода слова - добавляет слово в базу данных
+    """
+    rus_text = (message.text or "").strip()
+    ok, err = validate_russian_text(rus_text)
+    if not ok:
+        outbox.send_message(message.chat.id, err)
+        return
+
+    try:
+        async with bot.retrieve_data(
+            message.from_user.id, message.chat.id,
+        ) as data:
+            eng_word = (data.get("add_eng_word") or "").strip()
+            ok_eng, err_eng = validate_english_word(eng_word)
+            if not ok_eng:
+                outbox.send_message(
+                    message.chat.id,
+                    "Английское слово некорректно. "
+                    "Начните заново: кнопка «Добавить слово».",
+                )
+                await bot.delete_state(message.from_user.id, message.chat.id)
+                return
+            data["add_rus_word"] = rus_text
+
+            user_id = await get_user_id(message.from_user.id)
+            if user_id is None:
+                outbox.send_message(
+                    message.chat.id,
+                    "Пользователь не найден в базе данных!",
+                )
+                await bot.delete_state(message.from_user.id, message.chat.id)
+                return
+
+            await add_user_word(user_id, eng_word, rus_text)
+        outbox.send_message(message.chat.id, "Слово успешно добавлено!")
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        await train(message)
+    except IntegrityError as e:
+        logger.warning(
+            "Ошибка целостности при добавлении слова (tg_id=%s): %s",
+            message.from_user.id, e,
+        )
+        outbox.send_message(
+            message.chat.id,
+            "Такое слово уже есть в словаре или ошибка данных.",
+        )
+        await bot.delete_state(message.from_user.id, message.chat.id)
+    except SQLAlchemyError as e:
+        logger.exception(
+            "Ошибка БД при добавлении слова (tg_id=%s): %s",
+            message.from_user.id, e,
+        )
+        outbox.send_message(
+            message.chat.id,
+            "Не удалось добавить слово. Попробуйте позже.",
+        )
+        await bot.delete_state(message.from_user.id, message.chat.id)
+    except Exception as e:
+        logger.exception("Неожиданная ошибка в get_add_rus_word: %s", e)
+        outbox.send_message(
+            message.chat.id,
+            "Произошла ошибка при добавлении слова.",
+        )
+        await bot.delete_state(message.from_user.id, message.chat.id)
+
+
+@router.default
+async def message_reply(message):
+    """
+    Обработчик ответа пользователя
+    """
+    text = message.text
+
+    # Инициализируем переменные для хранения данных о текущем слове
+    choose_word = None
+    translate_word = None
+    word_id = None
+    options = []
+
+    # Получаем сохраненные данные о текущем состоянии пользователя
+    async with bot.retrieve_data(
+        message.from_user.id, message.chat.id,
+    ) as data:
+        card = QuizCard.from_state(data.get("card"))
+
+    # В inline-режиме отвечают кнопками карточки: набранный текст не
+    # проверяется, чтобы не слать reply-клавиатуру и новые карточки
+    if INLINE:
+        if card is None:
+            await train(message)
+        else:
+            outbox.send_message(
+                message.chat.id, "Выбери ответ кнопкой под карточкой 👆",
+            )
+        return
+
+    # Тексты слов восстанавливаем по id из кэша
+    if card:
+        words = await get_words(card.option_ids)
+        if card.word_id in words:
+            word_id = card.word_id
+            choose_word, translate_word = words[word_id]
+            options = [
+                words[option_id][0]
+                for option_id in card.option_ids
+                if option_id in words
+            ]
+
+    user_id = await get_user_id(message.from_user.id) if word_id else None
+
+    # Проверяем правильность ответа пользователя
+    if text == choose_word:
+        # Обработка правильного ответа
+        if user_id:
+            await update_learning_history(user_id, word_id, is_correct=True)
+        hint = show_target(
+            {"choose_word": choose_word, "translate_word": translate_word}
+        )
+        hint_text = ["Отлично!❤", hint]
+        hint = show_hint(*hint_text)
+        outbox.send_message(message.chat.id, hint)
+    else:
+        # Обработка неправильного ответа
+        if user_id:
+            await update_learning_history(user_id, word_id, is_correct=False)
+        hint = show_hint(
+            "Допущена ошибка!",
+            f"Попробуй ещё раз - 🇷🇺{translate_word}",
+        )
+        # Отправляем сообщение с подсказкой и клавиатурой
+        if options:
+            markup = quiz_markup(options)
+        else:
+            markup = types.ReplyKeyboardMarkup(row_width=2)
+        outbox.send_message(message.chat.id, hint, reply_markup=markup)
+        return
+
+    # Переход к следующему слову или начало новой тренировки
+    if not choose_word:
+        await train(message)
+    else:
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        await train(message)
+
+
+async def edit_card(call, header=None):
+    """
+    Следующая карточка в том же сообщении (inline-режим): чат не
+    растёт на два сообщения за каждый ответ
+    """
+    chat_id = call.message.chat.id
+    user_id = await get_user_id(call.from_user.id)
+    card = None
+    if user_id is not None:
+        card = await prepare_card(user_id, call.from_user.id, chat_id)
+    if card is None:
+        outbox.send_message(
+            chat_id, "Ошибка: не удалось получить слова для тренировки"
+        )
+        return
+    question, markup = card
+    if header:
+        question = f"{header}\n\n{question}"
+    outbox.edit_message_text(
+        chat_id, call.message.message_id, question, reply_markup=markup,
+    )
+
+
+@router.callback(CallbackAction.ANSWER)
+async def inline_answer(call):
+    """
+    Ответ кнопкой inline-карточки: id загаданного слова и варианта из
+    callback_data сверяются с карточкой в состоянии, текст не
+    сравнивается; нажатие на старой карточке отклоняется. Верный
+    ответ правит сообщение на следующую карточку, ошибка — подсказка
+    во всплывающем уведомлении
+    """
+    chat_id = call.message.chat.id
+    async with bot.retrieve_data(call.from_user.id, chat_id) as data:
+        card = QuizCard.from_state(data.get("card"))
+    answer = callback_answer(call.data)
+    if (
+        card is None
+        or answer is None
+        or answer[0] != card.word_id
+        or answer[1] not in card.option_ids
+    ):
+        # Кнопка старой карточки
+        outbox.answer_callback_query(
+            chat_id, call.id, text="Эта карточка уже закрыта",
+        )
+        return
+
+    is_correct = answer[1] == card.word_id
+    user_id = await get_user_id(call.from_user.id)
+    if user_id:
+        await update_learning_history(user_id, card.word_id, is_correct)
+    words = await get_words([card.word_id])
+    choose_word, translate_word = words.get(card.word_id, ("", ""))
+
+    if not is_correct:
+        outbox.answer_callback_query(
+            chat_id, call.id,
+            text=show_hint(
+                "Допущена ошибка!",
+                f"Попробуй ещё раз - 🇷🇺{translate_word}",
+            ),
+        )
+        return
+
+    outbox.answer_callback_query(chat_id, call.id, text="Отлично!❤")
+    hint = show_target(
+        {"choose_word": choose_word, "translate_word": translate_word}
+    )
+    await edit_card(call, header=show_hint("Отлично!❤", hint))
+
+
+@router.callback(CallbackAction.NEXT)
+async def inline_next(call):
+    """
+    Кнопка 'Дальше' inline-карточки
+    """
+    outbox.answer_callback_query(call.message.chat.id, call.id)
+    await edit_card(call)
+
+
+bot.register_message_handler(
+    router.async_dispatcher(bot), content_types=["text"],
+)
+bot.register_callback_query_handler(
+    router.async_callback_dispatcher(), func=None,
+)
@@ -0,0 +1,313 @@
+"""
+Бизнес-логика для асинхронного режима (BOT_MODE=async).
+
+Те же операции, что и в services, но корутинами поверх AsyncSession
+(asyncpg): пока одна корутина ждёт Postgres, event loop обслуживает
+другие апдейты. Запросы берутся из queries, кэши и чистые функции —
+из services, поэтому оба режима ведут себя одинаково.
+"""
+import asyncio
+import logging
+
+import event_log
+import queries
+from async_db import Session
+from batching import AsyncWriteBehindBuffer
+from config import config
+from models import Dictionary
+from services import (
+    LEADERBOARD_KEY, build_cards, card_buffer, card_id,
+    format_leaderboard, leaderboard, permanent_write_error, remember_hidden,
+    remember_words, unsaved_answer_ids, user_cards, user_ids, username_for,
+    word_texts,
+)
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+async def get_user_id(tg_id):
+    """
+    Возвращает user_id по Telegram ID: из кэша или одним SELECT.
+    None — пользователь не зарегистрирован
+    """
+    user_id = user_ids.get(tg_id)
+    if user_id is not None:
+        return user_id
+
+    try:
+        async with Session() as session:
+            user_id = (
+                await session.execute(queries.user_id_by_tg(tg_id))
+            ).scalar()
+    except SQLAlchemyError as e:
+        logger.exception("Ошибка БД в get_user_id (tg_id=%s): %s", tg_id, e)
+        return None
+
+    if user_id is not None:
+        user_ids.set(tg_id, user_id)
+    return user_id
+
+
+async def new_user(message):
+    """
+    Регистрирует пользователя при первом обращении (insert-if-absent).
+    Возвращает user_id; известные процессу пользователи берутся из кэша
+    """
+    tg_id = message.from_user.id
+    user_id = user_ids.get(tg_id)
+    if user_id is not None:
+        return user_id
+
+    stmt = queries.register_user(tg_id, username_for(message.from_user))
+    try:
+        async with Session() as session:
+            user_id = (await session.execute(stmt)).scalar()
+            if user_id is None:
+                # Пользователь уже зарегистрирован
+                user_id = (
+                    await session.execute(queries.user_id_by_tg(tg_id))
+                ).scalar()
+            await session.commit()
+    except SQLAlchemyError as e:
+        logger.exception(
+            "Ошибка БД в new_user (tg_id=%s): %s", tg_id, e,
+        )
+        return None
+    except Exception as e:
+        logger.exception("Неожиданная ошибка в new_user: %s", e)
+        return None
+
+    user_ids.set(tg_id, user_id)
+    return user_id
+
+
+async def fill_cards(user_id, n, exclude=()):
+    """
+    Пакет из n новых карточек пользователя ([] при ошибке БД)
+    """
+    exclude = [
+        *card_buffer.queued_word_ids(user_id),
+        *exclude,
+        *unsaved_answer_ids(answer_buffer, user_id),
+    ]
+    try:
+        async with Session() as session:
+            # Выборка синхронная (стратегии sampler) — через run_sync
+            return await session.run_sync(build_cards, user_id, n, exclude)
+    except SQLAlchemyError as e:
+        logger.exception(
+            "Ошибка БД в fill_cards (user_id=%s): %s", user_id, e,
+        )
+    except Exception as e:
+        logger.exception("Неожиданная ошибка в fill_cards: %s", e)
+    return []
+
+
+async def refill_cards(user_id, generation, exclude=()):
+    """
+    Фоновое пополнение буфера карточек; устаревший пакет отбрасывается
+    """
+    try:
+        card_buffer.push(
+            user_id, await fill_cards(user_id, config.CARD_BATCH, exclude),
+            generation,
+        )
+    finally:
+        card_buffer.release(user_id)
+
+
+async def create_words(user_id):
+    """
+    Карточка для тренировки из буфера готовых; пакет готовится
+    синхронно только при пустом буфере, пополнение идёт задачей
+    """
+    pairs = card_buffer.pop(user_id)
+    if pairs is None:
+        generation = card_buffer.generation(user_id)
+        cards = await fill_cards(user_id, config.CARD_BATCH)
+        if not cards:
+            return []
+        pairs = cards[0]
+        card_buffer.push(user_id, cards[1:], generation)
+    generation = card_buffer.claim_refill(user_id)
+    if generation is not None:
+        task = asyncio.create_task(
+            refill_cards(user_id, generation, (pairs[0][2],))
+        )
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    for _, _, word_id in pairs:
+        if word_id > 0:
+            seen_counter.add((user_id, word_id))
+    return pairs
+
+
+async def write_batch(items, write):
+    """
+    Пакет буфера одной транзакцией, при удалённом слове или
+    пользователе — построчно без них (как services.write_batch)
+    """
+    async with Session() as session:
+        try:
+            await write(session, items)
+            await session.commit()
+            return
+        except IntegrityError:
+            await session.rollback()
+
+        for key, value in items.items():
+            try:
+                async with session.begin_nested():
+                    await write(session, {key: value})
+            except IntegrityError:
+                logger.warning("Запись удалённого слова пропущена: %s", key)
+        await session.commit()
+
+
+async def write_seen(session, counts):
+    await session.execute(queries.seen_upsert(counts))
+
+
+async def write_answers(session, events):
+    await event_log.copy_events_async(session, events)
+    for stmt in queries.answer_statements(event_log.tallies(events)):
+        await session.execute(stmt)
+
+
+async def flush_seen(counts):
+    await write_batch(counts, write_seen)
+
+
+async def flush_answers(events):
+    await write_batch(events, write_answers)
+
+
+# (user_id, word_id) -> показы, ещё не записанные в learning_history
+seen_counter = AsyncWriteBehindBuffer(
+    flush_seen,
+    interval=config.SEEN_FLUSH_INTERVAL,
+    max_events=config.SEEN_FLUSH_MAX,
+    max_retries=config.FLUSH_MAX_RETRIES,
+    permanent=permanent_write_error,
+)
+
+# (user_id, word_id) -> [(answered_at, is_correct)]: ответы, ещё не
+# записанные в БД
+answer_buffer = AsyncWriteBehindBuffer(
+    flush_answers,
+    interval=config.ANSWER_FLUSH_INTERVAL,
+    max_events=config.ANSWER_FLUSH_MAX,
+    max_retries=config.FLUSH_MAX_RETRIES,
+    permanent=permanent_write_error,
+)
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+_background = set()
+
+
+async def get_words(word_ids):
+    """
+    Возвращает {word_id: (original, translation)}: из кэша word_texts,
+    недостающие слова — одним SELECT
+    """
+    words = {}
+    missing = []
+    for word_id in word_ids:
+        cached = word_texts.get(word_id)
+        if cached is None:
+            missing.append(word_id)
+        else:
+            words[word_id] = cached
+    if not missing:
+        return words
+
+    try:
+        async with Session() as session:
+            rows = (
+                await session.execute(queries.cards_by_ids(missing))
+            ).all()
+    except SQLAlchemyError as e:
+        logger.exception("Ошибка БД в get_words (word_ids=%s): %s", missing, e)
+        return words
+
+    remember_words(rows)
+    for word_id, original, translation in rows:
+        words[word_id] = (original, translation)
+    return words
+
+
+async def update_learning_history(user_id, word_id, is_correct):
+    """
+    Ставит ответ в answer_buffer; в БД ответы уходят пакетом
+    """
+    if not word_id:
+        return
+    answer_buffer.add((user_id, word_id), event_log.answer_event(is_correct))
+
+
+async def remove_word(user_id, eng_word):
+    """
+    Скрывает слово общего словаря от пользователя или удаляет его слово
+    из Dictionary. Возвращает True, если слово найдено. Ошибки БД
+    пробрасываются
+    """
+    async with Session() as session:
+        word_id = (
+            await session.execute(queries.hide_word(user_id, eng_word))
+        ).scalar()
+        if word_id is not None:
+            await session.commit()
+            remember_hidden(user_id, word_id)
+            return True
+
+        dict_row = (
+            await session.scalars(queries.find_user_word(user_id, eng_word))
+        ).first()
+        if dict_row:
+            await session.delete(dict_row)
+            await session.commit()
+            user_cards.pop(user_id)
+            card_buffer.drop(user_id)
+            word_texts.pop(card_id(dict_row.dictionary_id))
+            return True
+
+    return False
+
+
+async def add_user_word(user_id, eng_word, rus_word):
+    """
+    Добавляет слово в словарь пользователя. Ошибки БД пробрасываются
+    """
+    async with Session() as session:
+        session.add(
+            Dictionary(
+                user_id=user_id,
+                added_eng_word=eng_word,
+                added_rus_word=rus_word,
+            )
+        )
+        await session.commit()
+    user_cards.pop(user_id)
+    card_buffer.drop(user_id)
+
+
+async def top_users():
+    """
+    Топ-3 пользователей. Ошибки БД пробрасываются
+    """
+    async with Session() as session:
+        return (await session.execute(queries.top_users(3))).all()
+
+
+async def leaderboard_text():
+    """
+    Текст /stats из общего с services кэша. None — рейтинг пуст.
+    Ошибки БД пробрасываются
+    """
+    text = leaderboard.get(LEADERBOARD_KEY)
+    if text is None:
+        stats = await top_users()
+        text = format_leaderboard(stats) if stats else ""
+        leaderboard.set(LEADERBOARD_KEY, text)
+    return text or None
@@ -0,0 +1,317 @@
+"""
+Отложенная пакетная запись в БД (write-behind).
+
+События копятся в памяти и схлопываются по ключу функцией merge, а в БД
+уходят одним пакетом раз в interval секунд или сразу после max_events
+событий. Если запись не удалась, пакет возвращается и уйдёт со
+следующим — но не больше max_retries раз подряд: при долгом отказе БД
+накопленное отбрасывается, а не растёт в памяти без предела. Пакет с
+ошибкой, которую повтор не исправит (permanent(error) истинно,
+например DataError), отбрасывается сразу. При остановке накопленное
+записывается.
+
+    python batching.py [секунд] — ответы: транзакция на ответ и пакеты
+"""
+import asyncio
+import atexit
+import logging
+import operator
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Буфер key -> значение (по умолчанию сумма); flush(items) вызывается
+    в фоновом потоке, который запускается при первом add()
+    """
+
+    def __init__(self, flush, interval=1.0, max_events=1000,
+                 merge=operator.add, max_retries=100, permanent=None):
+        self.flush = flush
+        self.interval = interval
+        self.max_events = max_events
+        self.merge = merge
+        self.max_retries = max_retries
+        self.permanent = permanent
+        # Неудачных записей подряд
+        self.failures = 0
+        self.dropped = 0
+        self._items = {}
+        # Пакет, который сейчас пишется в БД
+        self._flushing = {}
+        self._events = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._runner = None
+
+    def add(self, key, value=1):
+        with self._lock:
+            if key in self._items:
+                value = self.merge(self._items[key], value)
+            self._items[key] = value
+            self._events += 1
+            full = self._events >= self.max_events
+        self._ensure_started()
+        if full:
+            self._notify()
+
+    def _notify(self):
+        self._wake.set()
+
+    def drain(self):
+        """
+        Забирает накопленное
+        """
+        with self._lock:
+            items, self._items = self._items, {}
+            self._flushing = items
+            self._events = 0
+        return items
+
+    def restore(self, items):
+        """
+        Возвращает пакет, который не удалось записать. Его события
+        старше накопленных за это время, поэтому идут первыми в merge
+        """
+        with self._lock:
+            for key, value in items.items():
+                if key in self._items:
+                    value = self.merge(value, self._items[key])
+                self._items[key] = value
+            self._flushing = {}
+
+    def flushed(self):
+        with self._lock:
+            self._flushing = {}
+        self.failures = 0
+
+    def failed(self, items, error):
+        """
+        Возвращает пакет в буфер или, если повтор бесполезен,
+        отбрасывает его
+        """
+        self.failures += 1
+        permanent = self.permanent is not None and self.permanent(error)
+        if not permanent and self.failures <= self.max_retries:
+            logger.exception(
+                "Ошибка записи пакета (%s), попытка %s: %s",
+                len(items), self.failures, error,
+            )
+            self.restore(items)
+            return
+        reason = "ошибка не исправится повтором" if permanent else (
+            f"{self.failures} неудачных попыток подряд"
+        )
+        logger.error(
+            "Пакет из %s ключей отброшен (%s): %s", len(items), reason,
+            error, exc_info=error,
+        )
+        self.dropped += len(items)
+        self.failures = 0
+        with self._lock:
+            self._flushing = {}
+
+    def pending(self):
+        with self._lock:
+            return len(self._items)
+
+    def pending_keys(self):
+        """
+        Ключи, ещё не записанные в БД: накопленные и пишущиеся сейчас
+        """
+        with self._lock:
+            return list(self._items) + list(self._flushing)
+
+    def flush_once(self):
+        items = self.drain()
+        if not items:
+            return
+        try:
+            self.flush(items)
+        except Exception as e:
+            self.failed(items, e)
+        else:
+            self.flushed()
+
+    def _ensure_started(self):
+        if self._runner is not None or self._stopped:
+            return
+        with self._lock:
+            if self._runner is not None:
+                return
+            self._runner = threading.Thread(
+                target=self._run, name="write-behind", daemon=True,
+            )
+            self._runner.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush_once()
+
+    def stop(self):
+        """
+        Останавливает фоновый поток и записывает остаток
+        """
+        self._stopped = True
+        self._wake.set()
+        if self._runner is not None:
+            self._runner.join()
+        self.flush_once()
+
+
+class AsyncWriteBehindBuffer(WriteBehindBuffer):
+    """
+    То же для асинхронного режима: flush — корутина, запись идёт
+    задачей в event loop
+    """
+
+    def __init__(self, flush, interval=1.0, max_events=1000,
+                 merge=operator.add, max_retries=100, permanent=None):
+        super().__init__(
+            flush, interval, max_events, merge, max_retries, permanent,
+        )
+        self._event = None
+
+    def _ensure_started(self):
+        if self._runner is not None or self._stopped:
+            return
+        self._event = asyncio.Event()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    def _notify(self):
+        self._event.set()
+
+    async def _run(self):
+        while not self._stopped:
+            try:
+                await asyncio.wait_for(self._event.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._event.clear()
+            await self.flush_once()
+
+    async def flush_once(self):
+        items = self.drain()
+        if not items:
+            return
+        try:
+            await self.flush(items)
+        except Exception as e:
+            self.failed(items, e)
+        else:
+            self.flushed()
+
+    async def stop(self):
+        self._stopped = True
+        if self._runner is not None:
+            self._event.set()
+            await self._runner
+        await self.flush_once()
+
+
+def benchmark(duration=5, rate=1000, users=300, workers=8):
+    """
+    Запись ответов, поступающих rate в секунду от users пользователей
+    на workers потоках обработчиков: транзакция на каждый ответ против
+    services.answer_buffer. Печатает достигнутую скорость, число
+    коммитов в БД и задержку ответа p50/p99 от момента поступления.
+    Пользователи бенчмарка удаляются после прогона вместе с историей
+    и журналом ответов
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import text
+
+    import event_log
+    import services
+    from default_db import engine
+
+    def commits():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_stat_clear_snapshot()"))
+            return conn.execute(
+                text(
+                    "SELECT xact_commit FROM pg_stat_database "
+                    "WHERE datname = current_database()"
+                )
+            ).scalar()
+
+    def one_transaction(user_id, word_id, is_correct):
+        services.write_batch(
+            {(user_id, word_id): event_log.answer_event(is_correct)},
+            services.write_answers,
+        )
+
+    with engine.begin() as conn:
+        # отрицательный tg_id не совпадёт с настоящим пользователем
+        user_ids = conn.execute(
+            text(
+                "INSERT INTO users (username, tg_id) "
+                "SELECT 'bench' || g, -2000000 - g "
+                "FROM generate_series(1, :users) g RETURNING user_id"
+            ),
+            {"users": users},
+        ).scalars().all()
+        word_ids = conn.execute(
+            text("SELECT word_id FROM words")
+        ).scalars().all()
+    answers = [
+        (
+            random.choice(user_ids), random.choice(word_ids),
+            random.random() < 0.7,
+        )
+        for _ in range(duration * rate)
+    ]
+    try:
+        for name, answer in (
+            ("транзакция на ответ", one_transaction),
+            ("пакеты", services.update_learning_history),
+        ):
+            latencies = []
+
+            def handle(scheduled, args):
+                answer(*args)
+                latencies.append(time.perf_counter() - scheduled)
+
+            before = commits()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(workers) as pool:
+                for n, args in enumerate(answers):
+                    scheduled = started + n / rate
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(handle, scheduled, args)
+            elapsed = time.perf_counter() - started
+            services.answer_buffer.flush_once()
+            latencies.sort()
+            print(
+                f"{name:>19}: {len(answers) / elapsed:.0f} ответов/с, "
+                f"{commits() - before} коммитов, задержка "
+                f"p50 {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс"
+            )
+    finally:
+        services.answer_buffer.stop()
+        with engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM answer_events WHERE user_id = ANY(:ids)"),
+                {"ids": user_ids},
+            )
+            conn.execute(
+                text("DELETE FROM users WHERE user_id = ANY(:ids)"),
+                {"ids": user_ids},
+            )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
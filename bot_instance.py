@@ -1,7 +1,39 @@
-from telebot import TeleBot, custom_filters
+from telebot import TeleBot, apihelper, custom_filters
 from telebot.storage import StateMemoryStorage
 from config import config
+from outbox import Outbox
 
-storage = StateMemoryStorage()
+if config.TELEGRAM_API_URL:
+    apihelper.API_URL = config.TELEGRAM_API_URL
+
+
+def create_storage():
+    """
+    Хранилище состояний по config.STATE_STORAGE
+    """
+    if config.STATE_STORAGE == "memory":
+        return StateMemoryStorage()
+    if config.STATE_STORAGE == "postgres":
+        from default_db import engine
+        from state_storage import StatePostgresStorage
+
+        return StatePostgresStorage(engine, ttl=config.STATE_TTL)
+    raise ValueError(
+        f"Неизвестное хранилище состояний: {config.STATE_STORAGE!r}. "
+        "Доступны: memory, postgres"
+    )
+
+
+storage = create_storage()
 bot = TeleBot(config.BOT_TOKEN, state_storage=storage)
 bot.add_custom_filter(custom_filters.StateFilter(bot))
+# Ответы обработчиков уходят через очередь с лимитами Telegram
+outbox = Outbox(
+    bot,
+    global_rate=config.OUTBOX_GLOBAL_RATE,
+    chat_rate=config.OUTBOX_CHAT_RATE,
+    chat_burst=config.OUTBOX_CHAT_BURST,
+    workers=config.OUTBOX_WORKERS,
+    max_retries=config.OUTBOX_MAX_RETRIES,
+    stop_timeout=config.OUTBOX_STOP_TIMEOUT,
+)
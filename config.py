@@ -15,6 +15,113 @@ class Config:
     db_name = os.getenv("DB_NAME")
 
     DSN = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
+    ASYNC_DSN = (
+        f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{db_name}"
+    )
+
+    # Пул соединений с БД (см. db_pool.py): постоянные соединения,
+    # сколько можно открыть сверх них и сколько ждать свободного (сек)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    # Проверять соединение перед выдачей и пересоздавать его через N сек
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Ограничение времени одного запроса, мс (0 — без ограничения)
+    DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "5000"))
+    # Подключение через PgBouncer в режиме transaction pooling
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+    # Режим работы бота: sync (TeleBot + потоки) | async (AsyncTeleBot) |
+    # webhook (TeleBot, апдейты принимаются HTTP-сервером, см. webhook.py)
+    BOT_MODE = os.getenv("BOT_MODE", "sync")
+    # Адрес Bot API, например локальный фейковый сервер для нагрузочных
+    # тестов: http://127.0.0.1:8081/bot{0}/{1}
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+    # Webhook: публичный адрес (регистрируется в Telegram, если задан),
+    # локальный адрес сервера и секрет из заголовка запросов Telegram
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    # Число воркеров и ёмкость очереди каждого из них
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+    # Очередь исходящих сообщений (см. outbox.py): сообщений в секунду
+    # всего и в один чат (0 — без ограничения), всплеск на чат, число
+    # отправляющих потоков, повторов после 429 и сколько секунд при
+    # остановке дописывать очередь
+    OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+    OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+    OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+    OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "8"))
+    OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "5"))
+    OUTBOX_STOP_TIMEOUT = float(os.getenv("OUTBOX_STOP_TIMEOUT", "10"))
+
+    # Карточки викторины: reply (новое сообщение с текстовыми кнопками)
+    # | inline (кнопки в сообщении, карточка правится на месте)
+    QUIZ_MODE = os.getenv("QUIZ_MODE", "reply")
+
+    # Стратегия выборки слов: array | keyset | random (см. sampler.py)
+    WORD_SAMPLER = os.getenv("WORD_SAMPLER", "array")
+    # Как часто (сек) догружать новые слова в массив id
+    WORD_SAMPLER_REFRESH = int(os.getenv("WORD_SAMPLER_REFRESH", "60"))
+
+    # Кэш соответствия tg_id -> user_id
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+
+    # Кэш текстов слов word_id -> (original, translation)
+    WORD_CACHE_SIZE = int(os.getenv("WORD_CACHE_SIZE", "100000"))
+    WORD_CACHE_TTL = int(os.getenv("WORD_CACHE_TTL", "3600"))
+
+    # Буфер готовых карточек на пользователя (см. prefetch.py): ёмкость,
+    # размер пакета пополнения, порог, при котором пакет заказывается,
+    # время жизни карточек (сек) и число потоков пополнения
+    CARD_BUFFER_SIZE = int(os.getenv("CARD_BUFFER_SIZE", "16"))
+    CARD_BATCH = int(os.getenv("CARD_BATCH", "8"))
+    CARD_BUFFER_LOW = int(os.getenv("CARD_BUFFER_LOW", "2"))
+    CARD_BUFFER_TTL = int(os.getenv("CARD_BUFFER_TTL", "600"))
+    PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+    # Показы слов и ответы пишутся в БД пакетом раз в N сек или сразу
+    # после M событий (см. batching.py)
+    SEEN_FLUSH_INTERVAL = float(os.getenv("SEEN_FLUSH_INTERVAL", "1.0"))
+    SEEN_FLUSH_MAX = int(os.getenv("SEEN_FLUSH_MAX", "1000"))
+    ANSWER_FLUSH_INTERVAL = float(os.getenv("ANSWER_FLUSH_INTERVAL", "0.2"))
+    ANSWER_FLUSH_MAX = int(os.getenv("ANSWER_FLUSH_MAX", "500"))
+    # Сколько раз подряд повторять неудавшуюся запись пакета, прежде чем
+    # отбросить накопленное (при отказе БД память не растёт без предела)
+    FLUSH_MAX_RETRIES = int(os.getenv("FLUSH_MAX_RETRIES", "100"))
+    # Журнал ответов answer_events: сколько месяцев хранить (включая
+    # текущий) и на сколько месяцев вперёд создавать секции
+    EVENT_RETENTION_MONTHS = int(os.getenv("EVENT_RETENTION_MONTHS", "12"))
+    EVENT_PARTITIONS_AHEAD = int(os.getenv("EVENT_PARTITIONS_AHEAD", "2"))
+
+    # Адрес HTTP-сервера метрик GET /metrics (формат Prometheus);
+    # METRICS_PORT=0 — не запускать
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+    # Миграции (migrations.py): сколько ждать блокировку таблицы, мс, и
+    # сколько раз повторить шаг; размер пакета backfill и пауза между
+    # пакетами, сек
+    MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "3000"))
+    MIGRATION_LOCK_RETRIES = int(os.getenv("MIGRATION_LOCK_RETRIES", "5"))
+    MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "10000"))
+    MIGRATION_BATCH_PAUSE = float(
+        os.getenv("MIGRATION_BATCH_PAUSE", "0.05")
+    )
+
+    # Сколько секунд /stats отдаёт готовый текст без запроса к БД
+    LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+
+    # Хранилище состояний: memory | postgres (см. state_storage.py)
+    STATE_STORAGE = os.getenv("STATE_STORAGE", "memory")
+    # Через сколько секунд без активности сессия викторины удаляется
+    STATE_TTL = int(os.getenv("STATE_TTL", "86400"))
 
 
 config = Config()
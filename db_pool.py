@@ -0,0 +1,153 @@
+"""
+Пул соединений с PostgreSQL: параметры из config и метрики выдачи.
+
+Оба движка (default_db и async_db) строятся с engine_options(), поэтому
+размер пула, таймауты и режим PgBouncer настраиваются в одном месте.
+
+    python db_pool.py [число потоков ...] — ожидание соединения из пула
+"""
+import sys
+import threading
+import time
+import uuid
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config import config
+from metrics import Counter, Histogram
+
+# Выдача соединения обычно занимает доли миллисекунды
+CHECKOUT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class MeteredPoolMixin:
+    """
+    Замеряет время получения соединения из пула (ожидание свободного,
+    открытие нового, pre-ping) и считает отказы по таймауту
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram(CHECKOUT_BUCKETS)
+        self.checkout_timeouts = Counter()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.checkout_timeouts.inc()
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncPool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async=False):
+    """
+    Аргументы create_engine / create_async_engine для пула из config
+    """
+    options = {
+        "poolclass": MeteredAsyncPool if is_async else MeteredQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+
+    connect_args = {}
+    timeout = config.DB_STATEMENT_TIMEOUT
+    if config.DB_PGBOUNCER:
+        # В transaction pooling соседние транзакции попадают на разные
+        # серверные соединения, поэтому подготовленные операторы asyncpg
+        # отключаются. Параметры запуска PgBouncer не передаёт серверу:
+        # statement_timeout задаётся для роли (ALTER ROLE ... SET)
+        if is_async:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=(
+                    lambda: f"__asyncpg_{uuid.uuid4()}__"
+                ),
+            )
+    elif timeout:
+        if is_async:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(timeout),
+            }
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    options["connect_args"] = connect_args
+    return options
+
+
+def pool_stats(pool):
+    """
+    Заполненность пула и время выдачи соединений для мониторинга
+    """
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkout_wait_seconds": pool.checkout_wait.snapshot(),
+        "checkout_timeouts": pool.checkout_timeouts.value,
+    }
+
+
+def benchmark(workers=(4, 8, 16, 32, 64), queries=200, query_ms=2):
+    """
+    Ожидание соединения из пула (db_pool_checkout_seconds) при разном
+    числе потоков: каждый выполняет queries запросов по query_ms мс,
+    беря соединение на каждый запрос. Пул — из config (DB_POOL_SIZE,
+    DB_MAX_OVERFLOW), для каждого числа потоков новый
+    """
+    from sqlalchemy import create_engine, text
+
+    print(
+        f"Пул {config.DB_POOL_SIZE}+{config.DB_MAX_OVERFLOW}, "
+        f"{queries} запросов по {query_ms} мс на поток"
+    )
+    for count in workers:
+        engine = create_engine(config.DSN, **engine_options())
+
+        def work():
+            for _ in range(queries):
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT pg_sleep(:s)"), {"s": query_ms / 1000},
+                    )
+
+        threads = [threading.Thread(target=work) for _ in range(count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stats = pool_stats(engine.pool)
+        engine.dispose()
+        wait = stats["checkout_wait_seconds"]
+        print(
+            f"{count:>3} потоков: {count * queries / elapsed:5.0f} "
+            f"запросов/с, ожидание avg {wait['avg'] * 1000:.2f} мс, "
+            f"p50 <= {wait['p50'] * 1000:g} мс, "
+            f"p99 <= {wait['p99'] * 1000:g} мс, "
+            f"таймаутов {stats['checkout_timeouts']}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark(tuple(int(n) for n in sys.argv[1:]) or (4, 8, 16, 32, 64))
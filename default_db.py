@@ -1,10 +1,15 @@
-from sqlalchemy import create_engine
+import sys
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from models import Base, Word
+import migrations
+import seeding
+from models import Base
 from config import config
+from db_pool import engine_options
 
 
-engine = create_engine(config.DSN, echo=False)
+engine = create_engine(config.DSN, echo=False, **engine_options())
 Session = sessionmaker(bind=engine, autocommit=False)
 
 
@@ -15,6 +20,9 @@ def create_tables(engine):
 
 def drop_tables(engine):
     Base.metadata.drop_all(engine)
+    # вместе с таблицами забываются и применённые миграции
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
     print("🗑️ Все таблицы удалены!")
 
 
@@ -22,495 +30,507 @@ def populate_words():
     """
     Заполняет базу данных начальным набором слов
     """
-    with Session() as session:
-        initial_words = [
-            # Тело человека, здоровье
-            ("head", "голова"),
-            ("face", "лицо"),
-            ("eye", "глаз"),
-            ("ear", "ухо"),
-            ("nose", "нос"),
-            ("mouth", "рот"),
-            ("hand", "рука"),
-            ("finger", "палец"),
-            ("leg", "нога"),
-            ("foot", "ступня"),
-            ("heart", "сердце"),
-            ("blood", "кровь"),
-            ("bone", "кость"),
-            ("muscle", "мышца"),
-            ("skin", "кожа"),
-            ("hair", "волос"),
-            ("brain", "мозг"),
-            ("stomach", "желудок"),
-            ("lung", "легкое"),
-            ("liver", "печень"),
-            ("kidney", "почка"),
-            # Животные
-            ("lion", "лев"),
-            ("tiger", "тигр"),
-            ("elephant", "слон"),
-            ("giraffe", "жираф"),
-            ("zebra", "зебра"),
-            ("monkey", "обезьяна"),
-            ("wolf", "волк"),
-            ("fox", "лиса"),
-            ("bear", "медведь"),
-            ("rabbit", "кролик"),
-            ("squirrel", "белка"),
-            ("deer", "олень"),
-            ("horse", "лошадь"),
-            ("cow", "корова"),
-            ("pig", "свинья"),
-            ("sheep", "овца"),
-            ("goat", "коза"),
-            ("chicken", "курица"),
-            ("duck", "утка"),
-            ("eagle", "орел"),
-            ("hawk", "ястреб"),
-            ("owl", "сова"),
-            ("crow", "ворона"),
-            ("sparrow", "воробей"),
-            ("swan", "лебедь"),
-            ("shark", "акула"),
-            ("whale", "кит"),
-            ("dolphin", "дельфин"),
-            ("octopus", "осьминог"),
-            ("jellyfish", "медуза"),
-            ("crab", "краб"),
-            ("lobster", "омар"),
-            ("frog", "лягушка"),
-            ("snake", "змея"),
-            ("turtle", "черепаха"),
-            ("crocodile", "крокодил"),
-            # Природа, погода
-            ("mountain", "гора"),
-            ("valley", "долина"),
-            ("hill", "холм"),
-            ("forest", "лес"),
-            ("river", "река"),
-            ("lake", "озеро"),
-            ("sea", "море"),
-            ("ocean", "океан"),
-            ("island", "остров"),
-            ("beach", "пляж"),
-            ("desert", "пустыня"),
-            ("cave", "пещера"),
-            ("volcano", "вулкан"),
-            ("waterfall", "водопад"),
-            ("rain", "дождь"),
-            ("snow", "снег"),
-            ("wind", "ветер"),
-            ("storm", "шторм"),
-            ("cloud", "облако"),
-            ("fog", "туман"),
-            ("ice", "лед"),
-            ("fire", "огонь"),
-            ("smoke", "дым"),
-            ("lightning", "молния"),
-            ("thunder", "гром"),
-            # Растения, деревья
-            ("tree", "дерево"),
-            ("flower", "цветок"),
-            ("grass", "трава"),
-            ("leaf", "лист"),
-            ("root", "корень"),
-            ("branch", "ветка"),
-            ("pine", "сосна"),
-            ("oak", "дуб"),
-            ("birch", "береза"),
-            ("maple", "клен"),
-            ("willow", "ива"),
-            ("rose", "роза"),
-            ("tulip", "тюльпан"),
-            ("daisy", "маргаритка"),
-            ("sunflower", "подсолнух"),
-            ("mushroom", "гриб"),
-            ("moss", "мох"),
-            ("fern", "папоротник"),
-            # Техника, электроника
-            ("computer", "компьютер"),
-            ("laptop", "ноутбук"),
-            ("keyboard", "клавиатура"),
-            ("monitor", "монитор"),
-            ("mouse", "мышь"),
-            ("printer", "принтер"),
-            ("scanner", "сканер"),
-            ("router", "роутер"),
-            ("server", "сервер"),
-            ("database", "база данных"),
-            ("network", "сеть"),
-            ("internet", "интернет"),
-            ("website", "вебсайт"),
-            ("application", "приложение"),
-            ("software", "программное обеспечение"),
-            ("hardware", "аппаратное обеспечение"),
-            ("processor", "процессор"),
-            ("memory", "память"),
-            ("storage", "хранилище"),
-            ("battery", "батарея"),
-            ("charger", "зарядное устройство"),
-            ("cable", "кабель"),
-            ("wire", "провод"),
-            ("circuit", "схема"),
-            ("transistor", "транзистор"),
-            ("resistor", "резистор"),
-            ("capacitor", "конденсатор"),
-            ("transformer", "трансформатор"),
-            ("engine", "двигатель"),
-            ("motor", "мотор"),
-            ("turbine", "турбина"),
-            ("pump", "насос"),
-            ("valve", "клапан"),
-            ("bearing", "подшипник"),
-            ("gear", "шестерня"),
-            ("spring", "пружина"),
-            ("screw", "винт"),
-            ("bolt", "болт"),
-            ("nut", "гайка"),
-            ("washer", "шайба"),
-            # Транспорт
-            ("car", "автомобиль"),
-            ("bus", "автобус"),
-            ("truck", "грузовик"),
-            ("train", "поезд"),
-            ("airplane", "самолет"),
-            ("helicopter", "вертолет"),
-            ("ship", "корабль"),
-            ("boat", "лодка"),
-            ("bicycle", "велосипед"),
-            ("motorcycle", "мотоцикл"),
-            ("subway", "метро"),
-            ("taxi", "такси"),
-            ("tram", "трамвай"),
-            ("wagon", "вагон"),
-            ("locomotive", "локомотив"),
-            ("wheel", "колесо"),
-            ("tire", "шина"),
-            ("engine", "двигатель"),
-            ("brake", "тормоз"),
-            ("accelerator", "акселератор"),
-            ("steering", "рулевое управление"),
-            ("headlight", "фара"),
-            ("windshield", "ветровое стекло"),
-            ("hood", "капот"),
-            ("trunk", "багажник"),
-            # Здания, архитектура
-            ("building", "здание"),
-            ("house", "дом"),
-            ("apartment", "квартира"),
-            ("office", "офис"),
-            ("hospital", "больница"),
-            ("school", "школа"),
-            ("university", "университет"),
-            ("factory", "фабрика"),
-            ("warehouse", "склад"),
-            ("garage", "гараж"),
-            ("bridge", "мост"),
-            ("tunnel", "тоннель"),
-            ("tower", "башня"),
-            ("wall", "стена"),
-            ("floor", "пол"),
-            ("ceiling", "потолок"),
-            ("roof", "крыша"),
-            ("window", "окно"),
-            ("door", "дверь"),
-            ("stair", "лестница"),
-            ("elevator", "лифт"),
-            ("column", "колонна"),
-            ("beam", "балка"),
-            ("foundation", "фундамент"),
-            # Еда, кухня
-            ("bread", "хлеб"),
-            ("cheese", "сыр"),
-            ("butter", "масло"),
-            ("milk", "молоко"),
-            ("meat", "мясо"),
-            ("fish", "рыба"),
-            ("egg", "яйцо"),
-            ("rice", "рис"),
-            ("pasta", "паста"),
-            ("potato", "картофель"),
-            ("tomato", "помидор"),
-            ("cucumber", "огурец"),
-            ("carrot", "морковь"),
-            ("onion", "лук"),
-            ("garlic", "чеснок"),
-            ("apple", "яблоко"),
-            ("banana", "банан"),
-            ("orange", "апельсин"),
-            ("grape", "виноград"),
-            ("strawberry", "клубника"),
-            ("watermelon", "арбуз"),
-            ("melon", "дыня"),
-            ("peach", "персик"),
-            ("pear", "груша"),
-            ("cherry", "вишня"),
-            ("plum", "слива"),
-            ("lemon", "лимон"),
-            ("salt", "соль"),
-            ("sugar", "сахар"),
-            ("pepper", "перец"),
-            ("oil", "масло"),
-            ("vinegar", "уксус"),
-            ("honey", "мед"),
-            ("coffee", "кофе"),
-            ("tea", "чай"),
-            ("juice", "сок"),
-            ("soup", "суп"),
-            ("salad", "салат"),
-            ("sandwich", "сэндвич"),
-            ("pizza", "пицца"),
-            # Одежда
-            ("shirt", "рубашка"),
-            ("pants", "брюки"),
-            ("jacket", "куртка"),
-            ("coat", "пальто"),
-            ("dress", "платье"),
-            ("skirt", "юбка"),
-            ("sweater", "свитер"),
-            ("t-shirt", "футболка"),
-            ("hat", "шляпа"),
-            ("cap", "кепка"),
-            ("scarf", "шарф"),
-            ("glove", "перчатка"),
-            ("shoe", "туфля"),
-            ("boot", "ботинок"),
-            ("sock", "носок"),
-            ("tie", "галстук"),
-            ("belt", "ремень"),
-            ("button", "пуговица"),
-            ("zipper", "молния"),
-            ("pocket", "карман"),
-            ("sleeve", "рукав"),
-            ("collar", "воротник"),
-            # Наука
-            ("science", "наука"),
-            ("mathematics", "математика"),
-            ("physics", "физика"),
-            ("chemistry", "химия"),
-            ("biology", "биология"),
-            ("geology", "геология"),
-            ("astronomy", "астрономия"),
-            ("medicine", "медицина"),
-            ("psychology", "психология"),
-            ("sociology", "социология"),
-            ("philosophy", "философия"),
-            ("history", "история"),
-            ("geography", "география"),
-            ("economy", "экономика"),
-            ("theory", "теория"),
-            ("hypothesis", "гипотеза"),
-            ("experiment", "эксперимент"),
-            ("research", "исследование"),
-            ("discovery", "открытие"),
-            ("invention", "изобретение"),
-            ("equation", "уравнение"),
-            ("formula", "формула"),
-            ("variable", "переменная"),
-            ("constant", "константа"),
-            ("function", "функция"),
-            ("derivative", "производная"),
-            ("integral", "интеграл"),
-            ("matrix", "матрица"),
-            ("vector", "вектор"),
-            ("atom", "атом"),
-            ("molecule", "молекула"),
-            ("electron", "электрон"),
-            ("proton", "протон"),
-            ("neutron", "нейтрон"),
-            ("nucleus", "ядро"),
-            ("energy", "энергия"),
-            ("mass", "масса"),
-            ("force", "сила"),
-            ("velocity", "скорость"),
-            ("acceleration", "ускорение"),
-            ("gravity", "гравитация"),
-            ("temperature", "температура"),
-            ("pressure", "давление"),
-            ("volume", "объем"),
-            ("density", "плотность"),
-            ("cell", "клетка"),
-            ("tissue", "ткань"),
-            ("organ", "орган"),
-            ("gene", "ген"),
-            ("chromosome", "хромосома"),
-            ("evolution", "эволюция"),
-            ("ecosystem", "экосистема"),
-            ("species", "вид"),
-            # Искусство, музыка
-            ("art", "искусство"),
-            ("music", "музыка"),
-            ("painting", "живопись"),
-            ("sculpture", "скульптура"),
-            ("theater", "театр"),
-            ("cinema", "кино"),
-            ("literature", "литература"),
-            ("poetry", "поэзия"),
-            ("novel", "роман"),
-            ("poem", "стихотворение"),
-            ("song", "песня"),
-            ("melody", "мелодия"),
-            ("rhythm", "ритм"),
-            ("harmony", "гармония"),
-            ("note", "нота"),
-            ("instrument", "инструмент"),
-            ("piano", "пианино"),
-            ("guitar", "гитара"),
-            ("violin", "скрипка"),
-            ("drum", "барабан"),
-            ("trumpet", "труба"),
-            ("flute", "флейта"),
-            ("orchestra", "оркестр"),
-            ("conductor", "дирижер"),
-            ("composer", "композитор"),
-            # Спорт
-            ("sport", "спорт"),
-            ("football", "футбол"),
-            ("basketball", "баскетбол"),
-            ("volleyball", "волейбол"),
-            ("tennis", "теннис"),
-            ("hockey", "хоккей"),
-            ("swimming", "плавание"),
-            ("boxing", "бокс"),
-            ("wrestling", "борьба"),
-            ("gymnastics", "гимнастика"),
-            ("athletics", "атлетика"),
-            ("marathon", "марафон"),
-            ("stadium", "стадион"),
-            ("arena", "арена"),
-            ("team", "команда"),
-            ("player", "игрок"),
-            ("coach", "тренер"),
-            ("referee", "судья"),
-            ("goal", "гол"),
-            ("score", "счет"),
-            ("victory", "победа"),
-            ("defeat", "поражение"),
-            # Технические термины
-            ("algorithm", "алгоритм"),
-            ("program", "программа"),
-            ("code", "код"),
-            ("syntax", "синтаксис"),
-            ("variable", "переменная"),
-            ("function", "функция"),
-            ("class", "класс"),
-            ("object", "объект"),
-            ("method", "метод"),
-            ("parameter", "параметр"),
-            ("argument", "аргумент"),
-            ("interface", "интерфейс"),
-            ("module", "модуль"),
-            ("library", "библиотека"),
-            ("framework", "фреймворк"),
-            ("compiler", "компилятор"),
-            ("interpreter", "интерпретатор"),
-            ("debugger", "отладчик"),
-            ("repository", "репозиторий"),
-            ("version", "версия"),
-            ("commit", "коммит"),
-            ("branch", "ветка"),
-            ("merge", "слияние"),
-            ("conflict", "конфликт"),
-            ("deployment", "развертывание"),
-            ("server", "сервер"),
-            ("client", "клиент"),
-            ("request", "запрос"),
-            ("response", "ответ"),
-            ("protocol", "протокол"),
-            ("encryption", "шифрование"),
-            ("authentication", "аутентификация"),
-            ("authorization", "авторизация"),
-            ("database", "база данных"),
-            ("query", "запрос"),
-            ("table", "таблица"),
-            ("record", "запись"),
-            ("field", "поле"),
-            ("index", "индекс"),
-            ("transaction", "транзакция"),
-            ("backup", "резервная копия"),
-            ("recovery", "восстановление"),
-            ("security", "безопасность"),
-            ("vulnerability", "уязвимость"),
-            ("patch", "патч"),
-            ("update", "обновление"),
-            ("upgrade", "обновление версии"),
-            ("downtime", "простой"),
-            ("latency", "задержка"),
-            ("bandwidth", "пропускная способность"),
-            ("throughput", "пропускная способность"),
-            ("scalability", "масштабируемость"),
-            ("reliability", "надежность"),
-            ("availability", "доступность"),
-            ("maintenance", "обслуживание"),
-            ("monitoring", "мониторинг"),
-            ("logging", "ведение журналов"),
-            ("analytics", "аналитика"),
-            ("metric", "метрика"),
-            ("dashboard", "панель управления"),
-            ("notification", "уведомление"),
-            ("automation", "автоматизация"),
-            ("integration", "интеграция"),
-            ("migration", "миграция"),
-            ("virtualization", "виртуализация"),
-            ("container", "контейнер"),
-            ("orchestration", "оркестрация"),
-            ("microservice", "микросервис"),
-            ("api", "API"),
-            ("endpoint", "конечная точка"),
-            ("middleware", "промежуточное ПО"),
-            ("gateway", "шлюз"),
-            ("loadbalancer", "балансировщик нагрузки"),
-            ("firewall", "брандмауэр"),
-            ("proxy", "прокси"),
-            ("cache", "кэш"),
-            ("session", "сессия"),
-            ("cookie", "cookie-файл"),
-            ("token", "токен"),
-            ("certificate", "сертификат"),
-            ("domain", "домен"),
-            ("hosting", "хостинг"),
-            ("cloud", "облако"),
-            ("infrastructure", "инфраструктура"),
-            ("architecture", "архитектура"),
-            ("design", "дизайн"),
-            ("development", "разработка"),
-            ("testing", "тестирование"),
-            ("deployment", "развертывание"),
-            ("production", "продакшен"),
-            ("environment", "окружение"),
-            ("configuration", "конфигурация"),
-            ("documentation", "документация"),
-            ("specification", "спецификация"),
-            ("requirement", "требование"),
-            ("feature", "функция"),
-            ("bug", "ошибка"),
-            ("issue", "проблема"),
-            ("task", "задача"),
-            ("project", "проект"),
-            ("sprint", "спринт"),
-            ("deadline", "срок"),
-            ("milestone", "веха"),
-            ("deliverable", "результат"),
-            ("stakeholder", "заинтересованное лицо"),
-            ("feedback", "обратная связь"),
-            ("iteration", "итерация"),
-            ("agile", "гибкая методология"),
-            ("waterfall", "водопадная модель"),
-        ]
-
-        # Добавляем слова в базу данных, избегая дубликатов
-        for eng, rus in initial_words:
-            existing = session.query(Word).filter_by(original=eng).first()
-            if not existing:
-                word = Word(original=eng, translation=rus)
-                session.add(word)
+    initial_words = [
+        # Тело человека, здоровье
+        ("head", "голова"),
+        ("face", "лицо"),
+        ("eye", "глаз"),
+        ("ear", "ухо"),
+        ("nose", "нос"),
+        ("mouth", "рот"),
+        ("hand", "рука"),
+        ("finger", "палец"),
+        ("leg", "нога"),
+        ("foot", "ступня"),
+        ("heart", "сердце"),
+        ("blood", "кровь"),
+        ("bone", "кость"),
+        ("muscle", "мышца"),
+        ("skin", "кожа"),
+        ("hair", "волос"),
+        ("brain", "мозг"),
+        ("stomach", "желудок"),
+        ("lung", "легкое"),
+        ("liver", "печень"),
+        ("kidney", "почка"),
+        # Животные
+        ("lion", "лев"),
+        ("tiger", "тигр"),
+        ("elephant", "слон"),
+        ("giraffe", "жираф"),
+        ("zebra", "зебра"),
+        ("monkey", "обезьяна"),
+        ("wolf", "волк"),
+        ("fox", "лиса"),
+        ("bear", "медведь"),
+        ("rabbit", "кролик"),
+        ("squirrel", "белка"),
+        ("deer", "олень"),
+        ("horse", "лошадь"),
+        ("cow", "корова"),
+        ("pig", "свинья"),
+        ("sheep", "овца"),
+        ("goat", "коза"),
+        ("chicken", "курица"),
+        ("duck", "утка"),
+        ("eagle", "орел"),
+        ("hawk", "ястреб"),
+        ("owl", "сова"),
+        ("crow", "ворона"),
+        ("sparrow", "воробей"),
+        ("swan", "лебедь"),
+        ("shark", "акула"),
+        ("whale", "кит"),
+        ("dolphin", "дельфин"),
+        ("octopus", "осьминог"),
+        ("jellyfish", "медуза"),
+        ("crab", "краб"),
+        ("lobster", "омар"),
+        ("frog", "лягушка"),
+        ("snake", "змея"),
+        ("turtle", "черепаха"),
+        ("crocodile", "крокодил"),
+        # Природа, погода
+        ("mountain", "гора"),
+        ("valley", "долина"),
+        ("hill", "холм"),
+        ("forest", "лес"),
+        ("river", "река"),
+        ("lake", "озеро"),
+        ("sea", "море"),
+        ("ocean", "океан"),
+        ("island", "остров"),
+        ("beach", "пляж"),
+        ("desert", "пустыня"),
+        ("cave", "пещера"),
+        ("volcano", "вулкан"),
+        ("waterfall", "водопад"),
+        ("rain", "дождь"),
+        ("snow", "снег"),
+        ("wind", "ветер"),
+        ("storm", "шторм"),
+        ("cloud", "облако"),
+        ("fog", "туман"),
+        ("ice", "лед"),
+        ("fire", "огонь"),
+        ("smoke", "дым"),
+        ("lightning", "молния"),
+        ("thunder", "гром"),
+        # Растения, деревья
+        ("tree", "дерево"),
+        ("flower", "цветок"),
+        ("grass", "трава"),
+        ("leaf", "лист"),
+        ("root", "корень"),
+        ("branch", "ветка"),
+        ("pine", "сосна"),
+        ("oak", "дуб"),
+        ("birch", "береза"),
+        ("maple", "клен"),
+        ("willow", "ива"),
+        ("rose", "роза"),
+        ("tulip", "тюльпан"),
+        ("daisy", "маргаритка"),
+        ("sunflower", "подсолнух"),
+        ("mushroom", "гриб"),
+        ("moss", "мох"),
+        ("fern", "папоротник"),
+        # Техника, электроника
+        ("computer", "компьютер"),
+        ("laptop", "ноутбук"),
+        ("keyboard", "клавиатура"),
+        ("monitor", "монитор"),
+        ("mouse", "мышь"),
+        ("printer", "принтер"),
+        ("scanner", "сканер"),
+        ("router", "роутер"),
+        ("server", "сервер"),
+        ("database", "база данных"),
+        ("network", "сеть"),
+        ("internet", "интернет"),
+        ("website", "вебсайт"),
+        ("application", "приложение"),
+        ("software", "программное обеспечение"),
+        ("hardware", "аппаратное обеспечение"),
+        ("processor", "процессор"),
+        ("memory", "память"),
+        ("storage", "хранилище"),
+        ("battery", "батарея"),
+        ("charger", "зарядное устройство"),
+        ("cable", "кабель"),
+        ("wire", "провод"),
+        ("circuit", "схема"),
+        ("transistor", "транзистор"),
+        ("resistor", "резистор"),
+        ("capacitor", "конденсатор"),
+        ("transformer", "трансформатор"),
+        ("engine", "двигатель"),
+        ("motor", "мотор"),
+        ("turbine", "турбина"),
+        ("pump", "насос"),
+        ("valve", "клапан"),
+        ("bearing", "подшипник"),
+        ("gear", "шестерня"),
+        ("spring", "пружина"),
+        ("screw", "винт"),
+        ("bolt", "болт"),
+        ("nut", "гайка"),
+        ("washer", "шайба"),
+        # Транспорт
+        ("car", "автомобиль"),
+        ("bus", "автобус"),
+        ("truck", "грузовик"),
+        ("train", "поезд"),
+        ("airplane", "самолет"),
+        ("helicopter", "вертолет"),
+        ("ship", "корабль"),
+        ("boat", "лодка"),
+        ("bicycle", "велосипед"),
+        ("motorcycle", "мотоцикл"),
+        ("subway", "метро"),
+        ("taxi", "такси"),
+        ("tram", "трамвай"),
+        ("wagon", "вагон"),
+        ("locomotive", "локомотив"),
+        ("wheel", "колесо"),
+        ("tire", "шина"),
+        ("engine", "двигатель"),
+        ("brake", "тормоз"),
+        ("accelerator", "акселератор"),
+        ("steering", "рулевое управление"),
+        ("headlight", "фара"),
+        ("windshield", "ветровое стекло"),
+        ("hood", "капот"),
+        ("trunk", "багажник"),
+        # Здания, архитектура
+        ("building", "здание"),
+        ("house", "дом"),
+        ("apartment", "квартира"),
+        ("office", "офис"),
+        ("hospital", "больница"),
+        ("school", "школа"),
+        ("university", "университет"),
+        ("factory", "фабрика"),
+        ("warehouse", "склад"),
+        ("garage", "гараж"),
+        ("bridge", "мост"),
+        ("tunnel", "тоннель"),
+        ("tower", "башня"),
+        ("wall", "стена"),
+        ("floor", "пол"),
+        ("ceiling", "потолок"),
+        ("roof", "крыша"),
+        ("window", "окно"),
+        ("door", "дверь"),
+        ("stair", "лестница"),
+        ("elevator", "лифт"),
+        ("column", "колонна"),
+        ("beam", "балка"),
+        ("foundation", "фундамент"),
+        # Еда, кухня
+        ("bread", "хлеб"),
+        ("cheese", "сыр"),
+        ("butter", "масло"),
+        ("milk", "молоко"),
+        ("meat", "мясо"),
+        ("fish", "рыба"),
+        ("egg", "яйцо"),
+        ("rice", "рис"),
+        ("pasta", "паста"),
+        ("potato", "картофель"),
+        ("tomato", "помидор"),
+        ("cucumber", "огурец"),
+        ("carrot", "морковь"),
+        ("onion", "лук"),
+        ("garlic", "чеснок"),
+        ("apple", "яблоко"),
+        ("banana", "банан"),
+        ("orange", "апельсин"),
+        ("grape", "виноград"),
+        ("strawberry", "клубника"),
+        ("watermelon", "арбуз"),
+        ("melon", "дыня"),
+        ("peach", "персик"),
+        ("pear", "груша"),
+        ("cherry", "вишня"),
+        ("plum", "слива"),
+        ("lemon", "лимон"),
+        ("salt", "соль"),
+        ("sugar", "сахар"),
+        ("pepper", "перец"),
+        ("oil", "масло"),
+        ("vinegar", "уксус"),
+        ("honey", "мед"),
+        ("coffee", "кофе"),
+        ("tea", "чай"),
+        ("juice", "сок"),
+        ("soup", "суп"),
+        ("salad", "салат"),
+        ("sandwich", "сэндвич"),
+        ("pizza", "пицца"),
+        # Одежда
+        ("shirt", "рубашка"),
+        ("pants", "брюки"),
+        ("jacket", "куртка"),
+        ("coat", "пальто"),
+        ("dress", "платье"),
+        ("skirt", "юбка"),
+        ("sweater", "свитер"),
+        ("t-shirt", "футболка"),
+        ("hat", "шляпа"),
+        ("cap", "кепка"),
+        ("scarf", "шарф"),
+        ("glove", "перчатка"),
+        ("shoe", "туфля"),
+        ("boot", "ботинок"),
+        ("sock", "носок"),
+        ("tie", "галстук"),
+        ("belt", "ремень"),
+        ("button", "пуговица"),
+        ("zipper", "молния"),
+        ("pocket", "карман"),
+        ("sleeve", "рукав"),
+        ("collar", "воротник"),
+        # Наука
+        ("science", "наука"),
+        ("mathematics", "математика"),
+        ("physics", "физика"),
+        ("chemistry", "химия"),
+        ("biology", "биология"),
+        ("geology", "геология"),
+        ("astronomy", "астрономия"),
+        ("medicine", "медицина"),
+        ("psychology", "психология"),
+        ("sociology", "социология"),
+        ("philosophy", "философия"),
+        ("history", "история"),
+        ("geography", "география"),
+        ("economy", "экономика"),
+        ("theory", "теория"),
+        ("hypothesis", "гипотеза"),
+        ("experiment", "эксперимент"),
+        ("research", "исследование"),
+        ("discovery", "открытие"),
+        ("invention", "изобретение"),
+        ("equation", "уравнение"),
+        ("formula", "формула"),
+        ("variable", "переменная"),
+        ("constant", "константа"),
+        ("function", "функция"),
+        ("derivative", "производная"),
+        ("integral", "интеграл"),
+        ("matrix", "матрица"),
+        ("vector", "вектор"),
+        ("atom", "атом"),
+        ("molecule", "молекула"),
+        ("electron", "электрон"),
+        ("proton", "протон"),
+        ("neutron", "нейтрон"),
+        ("nucleus", "ядро"),
+        ("energy", "энергия"),
+        ("mass", "масса"),
+        ("force", "сила"),
+        ("velocity", "скорость"),
+        ("acceleration", "ускорение"),
+        ("gravity", "гравитация"),
+        ("temperature", "температура"),
+        ("pressure", "давление"),
+        ("volume", "объем"),
+        ("density", "плотность"),
+        ("cell", "клетка"),
+        ("tissue", "ткань"),
+        ("organ", "орган"),
+        ("gene", "ген"),
+        ("chromosome", "хромосома"),
+        ("evolution", "эволюция"),
+        ("ecosystem", "экосистема"),
+        ("species", "вид"),
+        # Искусство, музыка
+        ("art", "искусство"),
+        ("music", "музыка"),
+        ("painting", "живопись"),
+        ("sculpture", "скульптура"),
+        ("theater", "театр"),
+        ("cinema", "кино"),
+        ("literature", "литература"),
+        ("poetry", "поэзия"),
+        ("novel", "роман"),
+        ("poem", "стихотворение"),
+        ("song", "песня"),
+        ("melody", "мелодия"),
+        ("rhythm", "ритм"),
+        ("harmony", "гармония"),
+        ("note", "нота"),
+        ("instrument", "инструмент"),
+        ("piano", "пианино"),
+        ("guitar", "гитара"),
+        ("violin", "скрипка"),
+        ("drum", "барабан"),
+        ("trumpet", "труба"),
+        ("flute", "флейта"),
+        ("orchestra", "оркестр"),
+        ("conductor", "дирижер"),
+        ("composer", "композитор"),
+        # Спорт
+        ("sport", "спорт"),
+        ("football", "футбол"),
+        ("basketball", "баскетбол"),
+        ("volleyball", "волейбол"),
+        ("tennis", "теннис"),
+        ("hockey", "хоккей"),
+        ("swimming", "плавание"),
+        ("boxing", "бокс"),
+        ("wrestling", "борьба"),
+        ("gymnastics", "гимнастика"),
+        ("athletics", "атлетика"),
+        ("marathon", "марафон"),
+        ("stadium", "стадион"),
+        ("arena", "арена"),
+        ("team", "команда"),
+        ("player", "игрок"),
+        ("coach", "тренер"),
+        ("referee", "судья"),
+        ("goal", "гол"),
+        ("score", "счет"),
+        ("victory", "победа"),
+        ("defeat", "поражение"),
+        # Технические термины
+        ("algorithm", "алгоритм"),
+        ("program", "программа"),
+        ("code", "код"),
+        ("syntax", "синтаксис"),
+        ("variable", "переменная"),
+        ("function", "функция"),
+        ("class", "класс"),
+        ("object", "объект"),
+        ("method", "метод"),
+        ("parameter", "параметр"),
+        ("argument", "аргумент"),
+        ("interface", "интерфейс"),
+        ("module", "модуль"),
+        ("library", "библиотека"),
+        ("framework", "фреймворк"),
+        ("compiler", "компилятор"),
+        ("interpreter", "интерпретатор"),
+        ("debugger", "отладчик"),
+        ("repository", "репозиторий"),
+        ("version", "версия"),
+        ("commit", "коммит"),
+        ("branch", "ветка"),
+        ("merge", "слияние"),
+        ("conflict", "конфликт"),
+        ("deployment", "развертывание"),
+        ("server", "сервер"),
+        ("client", "клиент"),
+        ("request", "запрос"),
+        ("response", "ответ"),
+        ("protocol", "протокол"),
+        ("encryption", "шифрование"),
+        ("authentication", "аутентификация"),
+        ("authorization", "авторизация"),
+        ("database", "база данных"),
+        ("query", "запрос"),
+        ("table", "таблица"),
+        ("record", "запись"),
+        ("field", "поле"),
+        ("index", "индекс"),
+        ("transaction", "транзакция"),
+        ("backup", "резервная копия"),
+        ("recovery", "восстановление"),
+        ("security", "безопасность"),
+        ("vulnerability", "уязвимость"),
+        ("patch", "патч"),
+        ("update", "обновление"),
+        ("upgrade", "обновление версии"),
+        ("downtime", "простой"),
+        ("latency", "задержка"),
+        ("bandwidth", "пропускная способность"),
+        ("throughput", "пропускная способность"),
+        ("scalability", "масштабируемость"),
+        ("reliability", "надежность"),
+        ("availability", "доступность"),
+        ("maintenance", "обслуживание"),
+        ("monitoring", "мониторинг"),
+        ("logging", "ведение журналов"),
+        ("analytics", "аналитика"),
+        ("metric", "метрика"),
+        ("dashboard", "панель управления"),
+        ("notification", "уведомление"),
+        ("automation", "автоматизация"),
+        ("integration", "интеграция"),
+        ("migration", "миграция"),
+        ("virtualization", "виртуализация"),
+        ("container", "контейнер"),
+        ("orchestration", "оркестрация"),
+        ("microservice", "микросервис"),
+        ("api", "API"),
+        ("endpoint", "конечная точка"),
+        ("middleware", "промежуточное ПО"),
+        ("gateway", "шлюз"),
+        ("loadbalancer", "балансировщик нагрузки"),
+        ("firewall", "брандмауэр"),
+        ("proxy", "прокси"),
+        ("cache", "кэш"),
+        ("session", "сессия"),
+        ("cookie", "cookie-файл"),
+        ("token", "токен"),
+        ("certificate", "сертификат"),
+        ("domain", "домен"),
+        ("hosting", "хостинг"),
+        ("cloud", "облако"),
+        ("infrastructure", "инфраструктура"),
+        ("architecture", "архитектура"),
+        ("design", "дизайн"),
+        ("development", "разработка"),
+        ("testing", "тестирование"),
+        ("deployment", "развертывание"),
+        ("production", "продакшен"),
+        ("environment", "окружение"),
+        ("configuration", "конфигурация"),
+        ("documentation", "документация"),
+        ("specification", "спецификация"),
+        ("requirement", "требование"),
+        ("feature", "функция"),
+        ("bug", "ошибка"),
+        ("issue", "проблема"),
+        ("task", "задача"),
+        ("project", "проект"),
+        ("sprint", "спринт"),
+        ("deadline", "срок"),
+        ("milestone", "веха"),
+        ("deliverable", "результат"),
+        ("stakeholder", "заинтересованное лицо"),
+        ("feedback", "обратная связь"),
+        ("iteration", "итерация"),
+        ("agile", "гибкая методология"),
+        ("waterfall", "водопадная модель"),
+    ]
 
-        session.commit()
-        print(f"Добавлено {len(initial_words)} слов в словарь")
+    # Пакетная загрузка пропускает повторы и слова, которые уже есть
+    stats = seeding.load_pairs(engine, initial_words, progress=None)
+    print(f"Добавлено {stats.inserted} слов в словарь")
+    if stats.invalid:
+        print(f"⚠️ Пропущено некорректных пар: {stats.invalid}")
 
 
 if __name__ == "__main__":
-    drop_tables(engine)
-    create_tables(engine)
-    populate_words()
+    # python default_db.py                 — обновить схему и добавить
+    #                                        начальные слова (данные целы)
+    # python default_db.py migrate         — только обновить схему
+    # python default_db.py migrate status  — применённые миграции
+    # python default_db.py reset           — удалить ВСЕ таблицы с данными
+    #                                        и создать заново
+    command = sys.argv[1:]
+    if command == ["migrate", "status"]:
+        migrations.status(engine)
+    elif command == ["migrate"]:
+        migrations.migrate(engine)
+    elif command == ["reset"]:
+        drop_tables(engine)
+        migrations.migrate(engine)
+        populate_words()
+    elif not command:
+        migrations.migrate(engine)
+        populate_words()
+    else:
+        sys.exit(f"Неизвестная команда: {' '.join(command)}")
@@ -0,0 +1,246 @@
+"""
+Выбор обработчика текстового сообщения одним поиском в словаре.
+
+TeleBot проверяет зарегистрированные обработчики по порядку: лямбды
+сравнения текста кнопок, а каждый фильтр state= читает хранилище
+состояний. Router заменяет эту цепочку одним обработчиком:
+  1. команда (/start, /stats) или точный текст кнопки — поиск в dict;
+  2. иначе одно чтение состояния и поиск обработчика по нему;
+  3. иначе обработчик по умолчанию (ответ на карточку).
+Стоимость выбора не зависит от числа кнопок и состояний. Нажатия
+inline-кнопок (callback_query) так же выбираются по действию — префиксу
+callback_data до ":".
+
+    python dispatch.py [число апдейтов] — микробенчмарк выбора
+"""
+import sys
+import time
+
+from telebot import util
+
+
+class Router:
+    """
+    Таблица маршрутов: команды, кнопки, состояния, обработчик
+    по умолчанию и действия inline-кнопок. Регистрация — декораторами
+    command, button, state, default, callback; в бота ставятся
+    обработчики из dispatcher() и callback_dispatcher()
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.buttons = {}
+        self.states = {}
+        self.callbacks = {}
+        self.default_handler = None
+
+    def command(self, *names):
+        def register(handler):
+            for name in names:
+                self.commands[name] = handler
+            return handler
+
+        return register
+
+    def button(self, *texts):
+        def register(handler):
+            for text in texts:
+                self.buttons[text] = handler
+            return handler
+
+        return register
+
+    def state(self, *states):
+        def register(handler):
+            for state in states:
+                self.states[state.name] = handler
+            return handler
+
+        return register
+
+    def callback(self, *actions):
+        def register(handler):
+            for action in actions:
+                self.callbacks[action] = handler
+            return handler
+
+        return register
+
+    def default(self, handler):
+        self.default_handler = handler
+        return handler
+
+    def match(self, text):
+        """
+        Обработчик команды или кнопки; None — решает состояние
+        """
+        if text and text[0] == "/":
+            handler = self.commands.get(util.extract_command(text))
+            if handler is not None:
+                return handler
+        return self.buttons.get(text)
+
+    def by_state(self, state):
+        return self.states.get(state, self.default_handler)
+
+    def by_action(self, data):
+        action, _, _ = (data or "").partition(":")
+        return self.callbacks.get(action)
+
+    def wrap(self, decorator):
+        """
+        Оборачивает все обработчики таблицы (например, замером времени)
+        """
+        tables = (self.commands, self.buttons, self.states, self.callbacks)
+        for table in tables:
+            for key, handler in table.items():
+                if not hasattr(handler, "__wrapped__"):
+                    table[key] = decorator(handler)
+        handler = self.default_handler
+        if handler is not None and not hasattr(handler, "__wrapped__"):
+            self.default_handler = decorator(handler)
+
+    def dispatcher(self, bot):
+        """
+        Единственный обработчик текстовых сообщений TeleBot
+        """
+
+        def dispatch(message):
+            handler = self.match(message.text)
+            if handler is None:
+                handler = self.by_state(
+                    bot.get_state(message.from_user.id, message.chat.id)
+                )
+            if handler is not None:
+                handler(message)
+
+        dispatch.router = self
+        return dispatch
+
+    def async_dispatcher(self, bot):
+        """
+        То же для AsyncTeleBot
+        """
+
+        async def dispatch(message):
+            handler = self.match(message.text)
+            if handler is None:
+                handler = self.by_state(
+                    await bot.get_state(message.from_user.id, message.chat.id)
+                )
+            if handler is not None:
+                await handler(message)
+
+        dispatch.router = self
+        return dispatch
+
+    def callback_dispatcher(self):
+        """
+        Единственный обработчик callback_query TeleBot
+        """
+
+        def dispatch(call):
+            handler = self.by_action(call.data)
+            if handler is not None:
+                handler(call)
+
+        dispatch.router = self
+        return dispatch
+
+    def async_callback_dispatcher(self):
+        """
+        То же для AsyncTeleBot
+        """
+
+        async def dispatch(call):
+            handler = self.by_action(call.data)
+            if handler is not None:
+                await handler(call)
+
+        dispatch.router = self
+        return dispatch
+
+
+def benchmark(updates=20000, extra_buttons=(0, 50)):
+    """
+    Время выбора обработчика на апдейт: цепочка фильтров TeleBot
+    (как раньше в handlers.py) против Router, с extra_buttons
+    дополнительными кнопками
+    """
+    from telebot import TeleBot, custom_filters, types
+    from telebot.storage import StateMemoryStorage
+
+    from quiz import Command, StateWords
+
+    def noop(message):
+        pass
+
+    def chain_bot(extra):
+        bot = TeleBot("1:bench", threaded=False,
+                      state_storage=StateMemoryStorage())
+        bot.add_custom_filter(custom_filters.StateFilter(bot))
+        bot.register_message_handler(noop, commands=["start"])
+        for text in (Command.TRAIN, Command.NEXT, Command.DELETE_WORD):
+            bot.register_message_handler(
+                noop, func=lambda m, text=text: m.text == text,
+            )
+        bot.register_message_handler(noop, state=StateWords.delete_word)
+        bot.register_message_handler(noop, commands=["stats"])
+        bot.register_message_handler(
+            noop, func=lambda m: m.text == Command.ADD_WORD,
+        )
+        for n in range(extra):
+            bot.register_message_handler(
+                noop, func=lambda m, text=f"button {n}": m.text == text,
+            )
+        bot.register_message_handler(noop, state=StateWords.add_eng_word)
+        bot.register_message_handler(noop, state=StateWords.add_rus_word)
+        bot.register_message_handler(
+            noop, func=lambda m: True, content_types=["text"],
+        )
+        return bot
+
+    def router_bot(extra):
+        bot = TeleBot("1:bench", threaded=False,
+                      state_storage=StateMemoryStorage())
+        router = Router()
+        router.command("start", "stats")(noop)
+        router.button(
+            Command.TRAIN, Command.NEXT, Command.DELETE_WORD,
+            Command.ADD_WORD, *(f"button {n}" for n in range(extra)),
+        )(noop)
+        router.state(
+            StateWords.delete_word, StateWords.add_eng_word,
+            StateWords.add_rus_word,
+        )(noop)
+        router.default(noop)
+        bot.register_message_handler(
+            router.dispatcher(bot), content_types=["text"],
+        )
+        return bot
+
+    # Типичный поток: в основном ответы на карточки и «Дальше»
+    user = types.User(1, False, "bench")
+    chat = types.Chat(1, "private")
+    texts = ["apple", "house", Command.NEXT, "river", "/start"]
+    messages = [
+        types.Message(n, user, 0, chat, "text", {"text": text}, "")
+        for n, text in enumerate(texts)
+    ]
+    batch = messages * (updates // len(messages))
+
+    for extra in extra_buttons:
+        for name, make in (("цепочка", chain_bot), ("Router", router_bot)):
+            bot = make(extra)
+            bot.set_state(1, StateWords.choose_word, 1)
+            started = time.perf_counter()
+            bot.process_new_messages(batch)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:>8}, +{extra} кнопок: "
+                f"{elapsed / len(batch) * 1e6:.1f} мкс/апдейт"
+            )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,233 @@
+"""
+Журнал ответов answer_events (append-only).
+
+Каждый ответ — отдельная строка (кто, какое слово, верно ли, когда) для
+аналитики: точность по дням, серии и т.п. Таблица секционирована по
+месяцам (RANGE по answered_at):
+  - ответы пишутся пакетом буфера answer_buffer одной командой COPY;
+  - в той же транзакции пакет сворачивается в счётчики learning_history
+    и user_stats (инкрементальный rollup), поэтому счётчики всегда
+    совпадают с журналом;
+  - старые месяцы удаляются DROP TABLE секции, без DELETE и VACUUM.
+
+Секции на месяцы вперёд создаёт maintain(): при migrate и по cron
+(python event_log.py). Секция DEFAULT принимает ответы, если
+обслуживание давно не запускалось; при создании секции месяца его
+ответы переносятся из DEFAULT, а старые ответы в DEFAULT удаляются
+по тому же сроку хранения.
+"""
+import io
+from datetime import date, datetime, timezone
+from functools import reduce
+
+from sqlalchemy import text
+
+from config import config
+from scheduler import AnswerTally
+
+TABLE = "answer_events"
+DEFAULT = f"{TABLE}_default"
+COLUMNS = ("user_id", "word_id", "is_correct", "answered_at")
+COPY_SQL = f"COPY {TABLE} ({', '.join(COLUMNS)}) FROM STDIN"
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def create_partitions(conn, months_ahead, today=None):
+    """
+    Создаёт секции текущего месяца, months_ahead следующих и месяцев,
+    ответы которых попали в секцию DEFAULT
+    """
+    month = month_start(today or date.today())
+    months = {add_months(month, n) for n in range(months_ahead + 1)}
+    months.update(default_months(conn))
+    existing = month_partitions(conn)
+    for start in sorted(months - set(existing)):
+        create_partition(conn, start)
+
+
+def create_default_partition(conn):
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT} "
+            f"PARTITION OF {TABLE} DEFAULT"
+        )
+    )
+
+
+def default_months(conn):
+    """
+    Месяцы, ответы которых лежат в секции DEFAULT
+    """
+    return conn.execute(
+        text(
+            "SELECT DISTINCT CAST(date_trunc('month', answered_at) AS date) "
+            f"FROM {DEFAULT}"
+        )
+    ).scalars().all()
+
+
+def create_partition(conn, start):
+    """
+    Секция месяца start. Если ответы этого месяца уже лежат в DEFAULT,
+    секцию не создать, пока DEFAULT присоединена (её строки нарушили
+    бы границы новой секции): DEFAULT отсоединяется, строки месяца
+    переносятся в новую секцию, DEFAULT присоединяется обратно
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    create = text(
+        f"CREATE TABLE {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    in_month = f"answered_at >= '{start}' AND answered_at < '{end}'"
+    stranded = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT} WHERE {in_month})")
+    ).scalar()
+    if not stranded:
+        conn.execute(create)
+        return
+    conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT}"))
+    conn.execute(create)
+    moved = conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT} WHERE {in_month} "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        )
+    ).rowcount
+    conn.execute(
+        text(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT} DEFAULT")
+    )
+    print(f"🗄️ Из {DEFAULT} в {name} перенесено ответов: {moved}")
+
+
+def month_partitions(conn):
+    """
+    {начало месяца: имя секции} по каталогу pg_inherits
+    """
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": TABLE},
+    ).scalars()
+    partitions = {}
+    for name in names:
+        try:
+            month = datetime.strptime(name[len(TABLE) + 1:], "%Y_%m")
+        except ValueError:
+            # секция DEFAULT
+            continue
+        partitions[month.date()] = name
+    return partitions
+
+
+def drop_old_partitions(conn, keep_months, today=None):
+    """
+    Удаляет секции месяцев старше keep_months (текущий месяц считается)
+    и такие же старые ответы из секции DEFAULT. Возвращает имена
+    удалённых секций
+    """
+    cutoff = add_months(month_start(today or date.today()), 1 - keep_months)
+    dropped = []
+    for month, name in sorted(month_partitions(conn).items()):
+        if month < cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    conn.execute(
+        text(f"DELETE FROM {DEFAULT} WHERE answered_at < '{cutoff}'")
+    )
+    return dropped
+
+
+def maintain(engine):
+    """
+    Секции вперёд и удаление вышедших за EVENT_RETENTION_MONTHS
+    """
+    with engine.begin() as conn:
+        create_default_partition(conn)
+        # Сначала удаление: старые ответы из DEFAULT не получают секций
+        dropped = drop_old_partitions(conn, config.EVENT_RETENTION_MONTHS)
+        create_partitions(conn, config.EVENT_PARTITIONS_AHEAD)
+    print(f"🗄️ Секции {TABLE} готовы, удалено старых: {len(dropped)}")
+
+
+def answer_event(is_correct):
+    """
+    Событие для буфера answer_buffer: время ответа фиксируется сразу,
+    а не при записи пакета
+    """
+    return [(datetime.now(timezone.utc), is_correct)]
+
+
+def tallies(events):
+    """
+    Свёртка пакета {(user_id, word_id): [(answered_at, is_correct)]}
+    в {(user_id, word_id): AnswerTally} для счётчиков
+    """
+    return {
+        key: reduce(
+            AnswerTally.merge,
+            (AnswerTally.of(is_correct) for _, is_correct in answers),
+        )
+        for key, answers in events.items()
+    }
+
+
+def rows(events):
+    for (user_id, word_id), answers in events.items():
+        for answered_at, is_correct in answers:
+            yield user_id, word_id, is_correct, answered_at
+
+
+def copy_events(session, events):
+    """
+    Дописывает пакет в журнал командой COPY в транзакции session
+    """
+    buffer = io.StringIO()
+    for user_id, word_id, is_correct, answered_at in rows(events):
+        flag = "t" if is_correct else "f"
+        buffer.write(
+            f"{user_id}\t{word_id}\t{flag}\t{answered_at.isoformat()}\n"
+        )
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_SQL, buffer)
+    finally:
+        cursor.close()
+
+
+async def copy_events_async(session, events):
+    """
+    То же для AsyncSession: COPY через asyncpg в транзакции session
+    """
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    if not raw.driver_connection.is_in_transaction():
+        # Адаптер asyncpg открывает транзакцию только на первом execute:
+        # COPY до него зафиксировался бы сам и не откатился бы с пакетом
+        await conn.execute(text("SELECT 1"))
+    await raw.driver_connection.copy_records_to_table(
+        TABLE, records=list(rows(events)), columns=COLUMNS,
+    )
+
+
+if __name__ == "__main__":
+    # python event_log.py — обслуживание секций (запускать по cron)
+    from default_db import engine
+
+    maintain(engine)
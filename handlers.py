@@ -1,17 +1,32 @@
 import logging
-import random
 
 from telebot import types
-from telebot.states import State, StatesGroup
-from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
-from default_db import Session
-from models import User, LearningHistory, Dictionary, Word
-from bot_instance import bot
+from bot_instance import bot, outbox
+from config import config
+from dispatch import Router
+from outbox import Priority
+from quiz import (
+    CallbackAction,
+    Command,
+    StateWords,
+    callback_answer,
+    inline_mode,
+    inline_quiz_markup,
+    quiz_markup,
+    start_markup,
+)
 from services import (
+    QuizCard,
+    add_user_word,
     create_words,
+    get_user_id,
+    get_words,
+    leaderboard_text,
+    make_card,
     new_user,
+    remove_word,
     show_hint,
     show_target,
     update_learning_history,
@@ -20,107 +35,77 @@ from validators import validate_english_word, validate_russian_text
 
 logger = logging.getLogger(__name__)
 
-
-class StateWords(StatesGroup):
-    """
-    Состояния для выбора слова
-    """
-
-    choose_word = State()
-    delete_word = State()
-    translate_word = State()
-    add_eng_word = State()
-    add_rus_word = State()
+# Команды, кнопки и состояния выбираются одним поиском (см. dispatch.py)
+router = Router()
+# Карточки с inline-кнопками вместо текстовых (QUIZ_MODE=inline)
+INLINE = inline_mode(config.QUIZ_MODE)
 
 
-class Command:
-    """
-    Названия кнопок
-    """
-
-    ADD_WORD = "Добавить слово ➕"
-    DELETE_WORD = "Удалить слово🔙"
-    NEXT = "Дальше ⏭"
-
-
-@bot.message_handler(commands=["start"])
+@router.command("start")
 def start(message):
     """
     Обработчик команды /start
-    Отправляет приветственное сообщение и отображает кнопку 'Тренька!'
+    Регистрирует пользователя, отправляет приветственное сообщение
+    и отображает кнопку 'Тренька!'
     """
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add(types.KeyboardButton("Тренька!"))
+    new_user(message)
+    markup = start_markup(inline=INLINE)
     hello = (
         f"Привет {message.from_user.username}👋 "
         "Давай попрактикуемся в английском языке. "
         "Нажми на кнопку 'Тренька!'"
     )
-    bot.send_message(
+    outbox.send_message(
         message.chat.id, hello, reply_markup=markup,
     )
 
 
-@bot.message_handler(func=lambda message: message.text == "Тренька!")
-def train(message):
+def prepare_card(user_id, tg_id, chat_id):
     """
-    Обработчик кнопки 'Тренька!' - запускает тренировку
+    Новая карточка: сохраняется в состоянии выбора слова. Возвращает
+    текст вопроса и клавиатуру или None, если слов для тренировки нет
     """
-    new_user(message)
-    pairs = create_words(message)
+    pairs = create_words(user_id)
     if not pairs:
-        bot.send_message(
-            message.chat.id, "Ошибка: не удалось получить слова для тренировки"
+        return None
+    card, options, question = make_card(pairs)
+
+    bot.set_state(tg_id, StateWords.choose_word, chat_id)
+    with bot.retrieve_data(tg_id, chat_id) as data:
+        data["card"] = card
+
+    if INLINE:
+        markup = inline_quiz_markup(
+            card.word_id, card.option_ids, options,
         )
-        return
+    else:
+        markup = quiz_markup(options)
+    return f"Тогда выбери перевод слова:\n🇷🇺 {question}", markup
 
-    # Выбираем случайное слово для тренировки
-    selected_pair = random.choice(pairs)
-    if len(selected_pair) < 3:
-        bot.send_message(message.chat.id, "Ошибка: некорректные данные слова")
-        return
 
-    # Создаем клавиатуру с вариантами ответов
-    markup = types.ReplyKeyboardMarkup(row_width=2)
-    buttons = []
-
-    # Добавляем правильный перевод
-    target_btn = types.KeyboardButton(selected_pair[0])
-    buttons.append(target_btn)
-
-    # Добавляем остальные варианты
-    others_btn = [
-        types.KeyboardButton(row[0])
-        for row in pairs
-        if row[0] != selected_pair[0]
-    ]
-    buttons.extend(others_btn)
-    random.shuffle(buttons)
-
-    # Добавляем управляющие кнопки
-    next_btn = types.KeyboardButton(Command.NEXT)
-    add_word_btn = types.KeyboardButton(Command.ADD_WORD)
-    delete_word_btn = types.KeyboardButton(Command.DELETE_WORD)
-    buttons.extend([next_btn, add_word_btn, delete_word_btn])
-    markup.add(*buttons)
-
-    # Устанавливаем состояние выбора слова
-    bot.set_state(
-        message.from_user.id,
-        StateWords.choose_word,
-        message.chat.id,
-    )
-    with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
-        data["choose_word"] = selected_pair[0]
-        data["translate_word"] = selected_pair[1]
-        data["word_id"] = selected_pair[2]
-        data["buttons"] = buttons
+@router.button(Command.TRAIN)
+def train(message):
+    """
+    Обработчик кнопки 'Тренька!' - запускает тренировку.
+    Для уже известных пользователей new_user отвечает из кэша,
+    таблица users на каждой карточке не читается
+    """
+    user_id = new_user(message)
+    if user_id is None:
+        outbox.send_message(message.chat.id, "Ошибка: пользователь не найден")
+        return
+    card = prepare_card(user_id, message.from_user.id, message.chat.id)
+    if card is None:
+        outbox.send_message(
+            message.chat.id, "Ошибка: не удалось получить слова для тренировки"
+        )
+        return
 
-    greeting = f"Тогда выбери перевод слова:\n🇷🇺 {selected_pair[1]}"
-    bot.send_message(message.chat.id, greeting, reply_markup=markup)
+    question, markup = card
+    outbox.send_message(message.chat.id, question, reply_markup=markup)
 
 
-@bot.message_handler(func=lambda message: message.text == Command.NEXT)
+@router.button(Command.NEXT)
 def next_cards(message):
     """
     Обработчик кнопки 'Дальше' - запускает тренировку с новым словом
@@ -128,12 +113,12 @@ def next_cards(message):
     train(message)
 
 
-@bot.message_handler(func=lambda message: message.text == Command.DELETE_WORD)
+@router.button(Command.DELETE_WORD)
 def delete_word(message):
     """
     Обработчик кнопки 'Удалить слово' - запрашивает слово для удаления
     """
-    bot.send_message(
+    outbox.send_message(
         message.chat.id,
         "Введите слово на английском для удаления:",
     )
@@ -144,67 +129,36 @@ def delete_word(message):
     )
 
 
-@bot.message_handler(state=StateWords.delete_word)
+@router.state(StateWords.delete_word)
 def input_delete_word(message):
     """
-    Обработчик удаления слова из базы данных.
-    Удаляет слово из таблицы Word (для всех) или из Dictionary
-    (добавленные пользователем).
+    Обработчик удаления слова у пользователя.
+    Слово общего словаря скрывается только для него (hidden_words),
+    добавленное пользователем удаляется из Dictionary.
     """
     eng_word = (message.text or "").strip()
     tg_id = message.from_user.id
 
     ok, err = validate_english_word(eng_word)
     if not ok:
-        bot.send_message(message.chat.id, err)
+        outbox.send_message(message.chat.id, err)
         train(message)
         return
 
     try:
         bot.delete_state(message.from_user.id, message.chat.id)
 
-        with Session() as session:
-            user = session.query(User).filter(User.tg_id == tg_id).first()
-            if not user:
-                bot.send_message(message.chat.id, "Пользователь не найден!")
-                return
-
-            deleted = False
+        user_id = get_user_id(tg_id)
+        if user_id is None:
+            outbox.send_message(message.chat.id, "Пользователь не найден!")
+            return
 
-            # Сначала ищем в таблице Word (без учёта регистра)
-            word_row = (
-                session.query(Word)
-                .filter(
-                    func.lower(Word.original) == eng_word.lower(),
-                )
-                .first()
+        if remove_word(user_id, eng_word):
+            outbox.send_message(
+                message.chat.id, f"Слово '{eng_word}' успешно удалено!"
             )
-            if word_row:
-                session.delete(word_row)
-                deleted = True
-
-            # Если не в Word — ищем в словаре пользователя
-            if not deleted:
-                dict_row = (
-                    session.query(Dictionary)
-                    .filter(
-                        func.lower(Dictionary.added_eng_word)
-                        == eng_word.lower(),
-                        Dictionary.user_id == user.user_id,
-                    )
-                    .first()
-                )
-                if dict_row:
-                    session.delete(dict_row)
-                    deleted = True
-
-            if deleted:
-                session.commit()
-                bot.send_message(
-                    message.chat.id, f"Слово '{eng_word}' успешно удалено!"
-                )
-            else:
-                bot.send_message(message.chat.id, "Слово не найдено.")
+        else:
+            outbox.send_message(message.chat.id, "Слово не найдено.")
 
         train(message)
     except SQLAlchemyError as e:
@@ -212,97 +166,65 @@ def input_delete_word(message):
             "Ошибка БД при удалении слова (tg_id=%s, слово=%s): %s",
             tg_id, eng_word, e,
         )
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Произошла ошибка при удалении слова. Попробуйте позже.",
         )
         train(message)
     except Exception as e:
         logger.exception("Неожиданная ошибка в input_delete_word: %s", e)
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Произошла ошибка при удалении слова.",
         )
         train(message)
 
 
-@bot.message_handler(commands=["stats"])
+@router.command("stats")
 def show_stats(message):
     """
     Обработчик команды /stats - показывает статистику пользователей
     """
     try:
-        with Session() as session:
-            # Получаем топ-3 пользователей по количеству правильных ответов
-            stats = (
-                session.query(
-                    User.username,
-                    func.sum(LearningHistory.correct_count).label(
-                        "total_correct",
-                    ),
-                    func.sum(LearningHistory.fail_count).label(
-                        "total_errors",
-                    ),
-                )
-                .join(LearningHistory, User.user_id == LearningHistory.user_id)
-                .group_by(User.user_id, User.username)
-                .having(func.sum(LearningHistory.correct_count) > 0)
-                .order_by(
-                    func.sum(LearningHistory.correct_count).desc(),
-                )
-                .limit(3)
-                .all()
+        # Топ-3 пользователей по количеству правильных ответов
+        text = leaderboard_text()
+
+        if text is None:
+            outbox.send_message(
+                message.chat.id,
+                "Статистика пока пуста. "
+                "Начните тренироваться, чтобы попасть в рейтинг!",
             )
+            return
 
-            if not stats:
-                bot.send_message(
-                    message.chat.id,
-                    "Статистика пока пуста. "
-                    "Начните тренироваться, чтобы попасть в рейтинг!",
-                )
-                return
-
-            # Формируем сообщение со статистикой
-            message_text = "ЛИДЕРЫ:\n\n"
-            medals = ["🥇", "🥈", "🥉"]
-
-            for idx, (username, total_correct, total_errors) in enumerate(
-                stats, 1,
-            ):
-                medal = medals[idx - 1]
-                message_text += (
-                    f"{medal} {username}\n"
-                    f"   Правильных: {total_correct or 0}\n"
-                    f"   Ошибок: {total_errors or 0}\n\n"
-                )
-
-            bot.send_message(message.chat.id, message_text)
+        # Таблица лидеров подождёт ответов викторины
+        outbox.send_message(message.chat.id, text, priority=Priority.BULK)
     except SQLAlchemyError as e:
         logger.exception("Ошибка БД в show_stats: %s", e)
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Не удалось загрузить статистику. Попробуйте позже.",
         )
     except Exception as e:
         logger.exception("Неожиданная ошибка в show_stats: %s", e)
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Произошла ошибка при получении статистики.",
         )
 
 
-@bot.message_handler(func=lambda message: message.text == Command.ADD_WORD)
+@router.button(Command.ADD_WORD)
 def add_word(message):
     """
     Обработчик кнопки 'Добавить слово' - запрашивает английское слово
     """
-    bot.send_message(message.chat.id, "Введите английское слово:")
+    outbox.send_message(message.chat.id, "Введите английское слово:")
     bot.set_state(
         message.from_user.id, StateWords.add_eng_word, message.chat.id,
     )
 
 
-@bot.message_handler(state=StateWords.add_eng_word)
+@router.state(StateWords.add_eng_word)
 def get_add_eng_word(message):
     """
     Обработчик ввода английского слова
@@ -310,14 +232,14 @@ def get_add_eng_word(message):
     text = (message.text or "").strip()
     ok, err = validate_english_word(text)
     if not ok:
-        bot.send_message(message.chat.id, err)
+        outbox.send_message(message.chat.id, err)
         return
 
     try:
         with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
             data["add_eng_word"] = text
             data["word_id"] = message.from_user.id
-        bot.send_message(message.chat.id, "Введите перевод слова:")
+        outbox.send_message(message.chat.id, "Введите перевод слова:")
         bot.set_state(
             message.from_user.id,
             StateWords.add_rus_word,
@@ -328,13 +250,13 @@ def get_add_eng_word(message):
             "Ошибка при сохранении английского слова (tg_id=%s): %s",
             message.from_user.id, e,
         )
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Произошла ошибка при сохранении слова. Попробуйте снова.",
         )
 
 
-@bot.message_handler(state=StateWords.add_rus_word)
+@router.state(StateWords.add_rus_word)
 def get_add_rus_word(message):
     """
     Обработчик ввода перевода слова - добавляет слово в базу данных
@@ -342,7 +264,7 @@ def get_add_rus_word(message):
     rus_text = (message.text or "").strip()
     ok, err = validate_russian_text(rus_text)
     if not ok:
-        bot.send_message(message.chat.id, err)
+        outbox.send_message(message.chat.id, err)
         return
 
     try:
@@ -350,7 +272,7 @@ def get_add_rus_word(message):
             eng_word = (data.get("add_eng_word") or "").strip()
             ok_eng, err_eng = validate_english_word(eng_word)
             if not ok_eng:
-                bot.send_message(
+                outbox.send_message(
                     message.chat.id,
                     "Английское слово некорректно. "
                     "Начните заново: кнопка «Добавить слово».",
@@ -359,28 +281,17 @@ def get_add_rus_word(message):
                 return
             data["add_rus_word"] = rus_text
 
-            with Session() as session:
-                user = (
-                    session.query(User)
-                    .filter(User.tg_id == message.from_user.id)
-                    .first()
-                )
-                if not user:
-                    bot.send_message(
-                        message.chat.id,
-                        "Пользователь не найден в базе данных!",
-                    )
-                    bot.delete_state(message.from_user.id, message.chat.id)
-                    return
-
-                word = Dictionary(
-                    user_id=user.user_id,
-                    added_eng_word=eng_word,
-                    added_rus_word=rus_text,
+            user_id = get_user_id(message.from_user.id)
+            if user_id is None:
+                outbox.send_message(
+                    message.chat.id,
+                    "Пользователь не найден в базе данных!",
                 )
-                session.add(word)
-                session.commit()
-        bot.send_message(message.chat.id, "Слово успешно добавлено!")
+                bot.delete_state(message.from_user.id, message.chat.id)
+                return
+
+            add_user_word(user_id, eng_word, rus_text)
+        outbox.send_message(message.chat.id, "Слово успешно добавлено!")
         bot.delete_state(message.from_user.id, message.chat.id)
         train(message)
     except IntegrityError as e:
@@ -388,7 +299,7 @@ def get_add_rus_word(message):
             "Ошибка целостности при добавлении слова (tg_id=%s): %s",
             message.from_user.id, e,
         )
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Такое слово уже есть в словаре или ошибка данных.",
         )
@@ -398,73 +309,87 @@ def get_add_rus_word(message):
             "Ошибка БД при добавлении слова (tg_id=%s): %s",
             message.from_user.id, e,
         )
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Не удалось добавить слово. Попробуйте позже.",
         )
         bot.delete_state(message.from_user.id, message.chat.id)
     except Exception as e:
         logger.exception("Неожиданная ошибка в get_add_rus_word: %s", e)
-        bot.send_message(
+        outbox.send_message(
             message.chat.id,
             "Произошла ошибка при добавлении слова.",
         )
         bot.delete_state(message.from_user.id, message.chat.id)
 
 
-@bot.message_handler(func=lambda message: True, content_types=["text"])
+@router.default
 def message_reply(message):
     """
     Обработчик ответа пользователя
     """
     text = message.text
-    # Игнорируем команды, которые обрабатываются отдельно
-    if text in [
-        Command.NEXT, Command.ADD_WORD, Command.DELETE_WORD, "Тренька!",
-    ]:
-        return
 
     # Инициализируем переменные для хранения данных о текущем слове
     choose_word = None
     translate_word = None
     word_id = None
-    buttons = []
+    options = []
 
     # Получаем сохраненные данные о текущем состоянии пользователя
     with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
-        choose_word = data.get("choose_word")
-        translate_word = data.get("translate_word")
-        word_id = data.get("word_id")
-        buttons = data.get("buttons", [])
+        card = QuizCard.from_state(data.get("card"))
+
+    # В inline-режиме отвечают кнопками карточки: набранный текст не
+    # проверяется, чтобы не слать reply-клавиатуру и новые карточки
+    if INLINE:
+        if card is None:
+            train(message)
+        else:
+            outbox.send_message(
+                message.chat.id, "Выбери ответ кнопкой под карточкой 👆",
+            )
+        return
+
+    # Тексты слов восстанавливаем по id из кэша
+    if card:
+        words = get_words(card.option_ids)
+        if card.word_id in words:
+            word_id = card.word_id
+            choose_word, translate_word = words[word_id]
+            options = [
+                words[option_id][0]
+                for option_id in card.option_ids
+                if option_id in words
+            ]
+
+    user_id = get_user_id(message.from_user.id) if word_id else None
 
     # Проверяем правильность ответа пользователя
     if text == choose_word:
         # Обработка правильного ответа
-        if word_id:
-            update_learning_history(
-                message.from_user.id, word_id, is_correct=True,
-            )
+        if user_id:
+            update_learning_history(user_id, word_id, is_correct=True)
         hint = show_target(
             {"choose_word": choose_word, "translate_word": translate_word}
         )
         hint_text = ["Отлично!❤", hint]
         hint = show_hint(*hint_text)
-        bot.send_message(message.chat.id, hint)
+        outbox.send_message(message.chat.id, hint)
     else:
         # Обработка неправильного ответа
-        if word_id:
-            update_learning_history(
-                message.from_user.id, word_id, is_correct=False,
-            )
+        if user_id:
+            update_learning_history(user_id, word_id, is_correct=False)
         hint = show_hint(
             "Допущена ошибка!",
             f"Попробуй ещё раз - 🇷🇺{translate_word}",
         )
         # Отправляем сообщение с подсказкой и клавиатурой
-        markup = types.ReplyKeyboardMarkup(row_width=2)
-        if buttons:
-            markup.add(*buttons)
-        bot.send_message(message.chat.id, hint, reply_markup=markup)
+        if options:
+            markup = quiz_markup(options)
+        else:
+            markup = types.ReplyKeyboardMarkup(row_width=2)
+        outbox.send_message(message.chat.id, hint, reply_markup=markup)
         return
 
     # Переход к следующему слову или начало новой тренировки
@@ -473,3 +398,90 @@ def message_reply(message):
     else:
         bot.delete_state(message.from_user.id, message.chat.id)
         train(message)
+
+
+def edit_card(call, header=None):
+    """
+    Следующая карточка в том же сообщении (inline-режим): чат не
+    растёт на два сообщения за каждый ответ
+    """
+    chat_id = call.message.chat.id
+    user_id = get_user_id(call.from_user.id)
+    card = None
+    if user_id is not None:
+        card = prepare_card(user_id, call.from_user.id, chat_id)
+    if card is None:
+        outbox.send_message(
+            chat_id, "Ошибка: не удалось получить слова для тренировки"
+        )
+        return
+    question, markup = card
+    if header:
+        question = f"{header}\n\n{question}"
+    outbox.edit_message_text(
+        chat_id, call.message.message_id, question, reply_markup=markup,
+    )
+
+
+@router.callback(CallbackAction.ANSWER)
+def inline_answer(call):
+    """
+    Ответ кнопкой inline-карточки: id загаданного слова и варианта из
+    callback_data сверяются с карточкой в состоянии, текст не
+    сравнивается; нажатие на старой карточке отклоняется. Верный
+    ответ правит сообщение на следующую карточку, ошибка — подсказка
+    во всплывающем уведомлении
+    """
+    chat_id = call.message.chat.id
+    with bot.retrieve_data(call.from_user.id, chat_id) as data:
+        card = QuizCard.from_state(data.get("card"))
+    answer = callback_answer(call.data)
+    if (
+        card is None
+        or answer is None
+        or answer[0] != card.word_id
+        or answer[1] not in card.option_ids
+    ):
+        # Кнопка старой карточки
+        outbox.answer_callback_query(
+            chat_id, call.id, text="Эта карточка уже закрыта",
+        )
+        return
+
+    is_correct = answer[1] == card.word_id
+    user_id = get_user_id(call.from_user.id)
+    if user_id:
+        update_learning_history(user_id, card.word_id, is_correct)
+    words = get_words([card.word_id])
+    choose_word, translate_word = words.get(card.word_id, ("", ""))
+
+    if not is_correct:
+        outbox.answer_callback_query(
+            chat_id, call.id,
+            text=show_hint(
+                "Допущена ошибка!",
+                f"Попробуй ещё раз - 🇷🇺{translate_word}",
+            ),
+        )
+        return
+
+    outbox.answer_callback_query(chat_id, call.id, text="Отлично!❤")
+    hint = show_target(
+        {"choose_word": choose_word, "translate_word": translate_word}
+    )
+    edit_card(call, header=show_hint("Отлично!❤", hint))
+
+
+@router.callback(CallbackAction.NEXT)
+def inline_next(call):
+    """
+    Кнопка 'Дальше' inline-карточки
+    """
+    outbox.answer_callback_query(call.message.chat.id, call.id)
+    edit_card(call)
+
+
+bot.register_message_handler(
+    router.dispatcher(bot), content_types=["text"],
+)
+bot.register_callback_query_handler(router.callback_dispatcher(), func=None)
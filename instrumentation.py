@@ -0,0 +1,264 @@
+"""
+Замеры времени обработчиков, запросов к БД и вызовов Bot API.
+
+  - каждый зарегистрированный обработчик оборачивается: время и ошибки
+    по имени обработчика, а также сколько запросов к БД и сколько
+    времени в БД ушло на один апдейт;
+  - события before/after_cursor_execute движка считают все запросы;
+  - вызовы Bot API замеряются по имени метода (кроме getUpdates —
+    long polling ждёт апдейты, а не отвечает).
+
+Запросы относятся к апдейту через contextvars: фоновая работа
+(пополнение буфера карточек, запись пакетов) в счёт апдейта не идёт.
+Замер — два вызова perf_counter и observe() под коротким lock,
+поэтому включён всегда.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+
+from sqlalchemy import event
+
+import metrics
+from config import config
+from db_pool import CHECKOUT_BUCKETS, pool_stats
+
+# Запросов к БД на апдейт
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_seconds", "Время обработчика апдейта", ("handler",),
+)
+HANDLER_ERRORS = metrics.counter(
+    "bot_handler_errors", "Исключения, вышедшие из обработчика",
+    ("handler",),
+)
+UPDATE_DB_QUERIES = metrics.histogram(
+    "bot_update_db_queries", "Запросов к БД за один апдейт", ("handler",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+UPDATE_DB_SECONDS = metrics.histogram(
+    "bot_update_db_seconds", "Время в БД за один апдейт", ("handler",),
+    buckets=CHECKOUT_BUCKETS,
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_seconds", "Время выполнения запроса к БД", ("engine",),
+    buckets=CHECKOUT_BUCKETS,
+)
+TELEGRAM_SECONDS = metrics.histogram(
+    "telegram_api_seconds", "Время вызова Bot API", ("method",),
+)
+TELEGRAM_ERRORS = metrics.counter(
+    "telegram_api_errors", "Ошибки вызова Bot API", ("method",),
+)
+POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "db_pool_checkout_seconds", "Ожидание соединения из пула", ("engine",),
+    buckets=CHECKOUT_BUCKETS,
+)
+
+# Пулы инструментированных движков: имя движка -> pool
+_pools = {}
+metrics.callback(
+    "db_pool_connections", "Соединения пула: size, checked_out, overflow",
+    lambda: _pool_connections(), ("engine", "state"),
+)
+
+# Кэши процесса: имя -> TTLCache (см. setup)
+_caches = {}
+metrics.callback(
+    "cache_requests", "Обращения к кэшам процесса: hit, miss",
+    lambda: _cache_requests(), ("cache", "result"), kind="counter",
+)
+metrics.callback(
+    "cache_entries", "Записей в кэше", lambda: _cache_entries(), ("cache",),
+)
+
+# Запросы к БД текущего апдейта: [число, секунд]
+_update_db = contextvars.ContextVar("update_db", default=None)
+
+
+def _finish(name, started, usage):
+    HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+    UPDATE_DB_QUERIES.labels(name).observe(usage[0])
+    UPDATE_DB_SECONDS.labels(name).observe(usage[1])
+
+
+def timed_handler(handler):
+    """
+    Оборачивает обработчик (функцию или корутину) замером времени
+    """
+    name = handler.__name__
+
+    if asyncio.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(*args, **kwargs):
+            usage = [0, 0.0]
+            token = _update_db.set(usage)
+            started = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.labels(name).inc()
+                raise
+            finally:
+                _update_db.reset(token)
+                _finish(name, started, usage)
+
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        usage = [0, 0.0]
+        token = _update_db.set(usage)
+        started = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            _update_db.reset(token)
+            _finish(name, started, usage)
+
+    return wrapper
+
+
+def instrument_handlers(bot):
+    """
+    Оборачивает все обработчики, уже зарегистрированные в bot
+    """
+    for handlers in (bot.message_handlers, bot.callback_query_handlers):
+        for handler in handlers:
+            function = handler["function"]
+            router = getattr(function, "router", None)
+            if router is not None:
+                # Диспетчер Router: замеряем обработчики его таблицы
+                router.wrap(timed_handler)
+            elif not hasattr(function, "__wrapped__"):
+                handler["function"] = timed_handler(function)
+
+
+def instrument_engine(engine, name):
+    """
+    Счётчики запросов движка (для AsyncEngine — его sync_engine)
+    и метрики его пула
+    """
+    histogram = DB_QUERY_SECONDS.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        histogram.observe(elapsed)
+        usage = _update_db.get()
+        if usage is not None:
+            usage[0] += 1
+            usage[1] += elapsed
+
+    POOL_CHECKOUT_SECONDS.bind((name,), engine.pool.checkout_wait)
+    _pools[name] = engine.pool
+
+
+def _pool_connections():
+    values = {}
+    for name, pool in list(_pools.items()):
+        stats = pool_stats(pool)
+        values[(name, "size")] = stats["size"]
+        values[(name, "checked_out")] = stats["checked_out"]
+        # QueuePool.overflow() отрицателен, пока пул не заполнен
+        values[(name, "overflow")] = max(stats["overflow"], 0)
+    return values
+
+
+def _cache_requests():
+    values = {}
+    for name, cache in list(_caches.items()):
+        stats = cache.stats()
+        values[(name, "hit")] = stats["hits"]
+        values[(name, "miss")] = stats["misses"]
+    return values
+
+
+def _cache_entries():
+    return {
+        (name,): cache.stats()["size"]
+        for name, cache in list(_caches.items())
+    }
+
+
+def _observe_api(method, started, failed):
+    if method == "getUpdates":
+        return
+    TELEGRAM_SECONDS.labels(method).observe(time.perf_counter() - started)
+    if failed:
+        TELEGRAM_ERRORS.labels(method).inc()
+
+
+def instrument_telegram():
+    """
+    Замер вызовов Bot API для TeleBot (apihelper._make_request)
+    """
+    from telebot import apihelper
+
+    make_request = apihelper._make_request
+    if hasattr(make_request, "__wrapped__"):
+        return
+
+    @functools.wraps(make_request)
+    def timed_request(token, method_name, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = make_request(token, method_name, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _observe_api(method_name, started, failed)
+
+    apihelper._make_request = timed_request
+
+
+def instrument_telegram_async():
+    """
+    То же для AsyncTeleBot (asyncio_helper._process_request)
+    """
+    from telebot import asyncio_helper
+
+    process_request = asyncio_helper._process_request
+    if hasattr(process_request, "__wrapped__"):
+        return
+
+    @functools.wraps(process_request)
+    async def timed_request(token, url, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await process_request(token, url, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _observe_api(url, started, failed)
+
+    asyncio_helper._process_request = timed_request
+
+
+def setup(bot, engines, caches=None, is_async=False):
+    """
+    Включает все замеры; engines — {имя: Engine}, caches — {имя:
+    TTLCache} для счётчиков попаданий. Если задан METRICS_PORT,
+    запускает сервер GET /metrics
+    """
+    instrument_handlers(bot)
+    for name, engine in engines.items():
+        instrument_engine(engine, name)
+    _caches.update(caches or {})
+    if is_async:
+        instrument_telegram_async()
+    else:
+        instrument_telegram()
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_HOST, config.METRICS_PORT)
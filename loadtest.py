@@ -0,0 +1,549 @@
+"""
+Нагрузочный тест бота: фейковый Bot API и виртуальные ученики.
+
+Фейковый сервер отвечает на getMe, getUpdates, sendMessage,
+editMessageText и answerCallbackQuery (остальные методы — просто ok);
+с --flood доля sendMessage получает 429 с retry_after, как при
+превышении лимитов Telegram. Каждый ученик проходит /start →
+«Тренька!» → ответ → «Дальше» (после ошибки), отвечая случайным
+вариантом: текстом или, с --quiz inline, нажатием inline-кнопки. Бот
+запускается дочерним процессом (main.py) с TELEGRAM_API_URL на фейковый
+сервер; в режиме webhook апдейты отправляются ему POST-запросами.
+
+Отчёт: апдейтов в секунду, задержка ответа p50/p99 (от апдейта до
+первого ответа бота), вызовов Bot API и новых сообщений на один ответ
+ученика; время обработчиков p50/p99 и число запросов к БД на апдейт —
+по /metrics бота (см. instrumentation.py), разница снимков до и после
+прогона. Ответы уходят через очередь outbox.py
+с лимитами Telegram; чтобы мерить только обработчики, снимите их:
+OUTBOX_GLOBAL_RATE=0 OUTBOX_CHAT_RATE=0.
+
+    python loadtest.py --mode sync --users 50 --save base.json
+    python loadtest.py --mode sync --users 50 --compare base.json
+
+Нужна рабочая БД (python default_db.py); ученики — пользователи
+с tg_id от 100000, повторные прогоны используют их же.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from aiohttp import ClientSession, web
+
+from config import config
+from quiz import QUIZ_MODES, CallbackAction, Command
+
+FIRST_TG_ID = 100000
+BOT_ID = 123456
+# Сколько ждать ответа бота на апдейт, сек
+REPLY_TIMEOUT = 30
+# Сколько ждать, пока бот начнёт принимать апдейты, сек
+START_TIMEOUT = 30
+# retry_after в ответах 429 при --flood, сек
+FLOOD_RETRY_AFTER = 1
+
+QUESTION = "выбери перевод"
+MISTAKE = "Допущена ошибка"
+
+# Параметры прогона: в сравнении с базовым отчётом не участвуют
+PARAMETERS = ("mode", "quiz", "users", "rounds")
+# Служебные методы, не связанные с ответами ученикам
+SERVICE_METHODS = ("getMe", "getUpdates")
+
+SAMPLE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class FakeBotAPI:
+    """
+    Фейковый Bot API: апдейты выдаются через getUpdates (или POST на
+    webhook бота), ответы бота раскладываются по чатам
+    """
+
+    def __init__(self, webhook_url=None, webhook_secret=None, flood=0.0):
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.flood = flood
+        self.flooded = 0
+        self.updates = asyncio.Queue()
+        self.inbox = defaultdict(asyncio.Queue)
+        self.polling = asyncio.Event()
+        self.calls = defaultdict(int)
+        self._update_id = 0
+        self._message_id = 0
+        self._session = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        data = dict(request.query)
+        if request.content_type == "application/json":
+            data.update(await request.json())
+        elif request.can_read_body:
+            data.update(await request.post())
+
+        if method == "getMe":
+            return ok({
+                "id": BOT_ID, "is_bot": True,
+                "first_name": "loadtest", "username": "loadtest_bot",
+            })
+        if method == "getUpdates":
+            self.polling.set()
+            timeout = float(data.get("timeout") or 0)
+            return ok(await self.next_updates(timeout))
+        if method == "sendMessage" and random.random() < self.flood:
+            self.flooded += 1
+            return too_many_requests(FLOOD_RETRY_AFTER)
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(data["chat_id"])
+            markup = data.get("reply_markup")
+            if isinstance(markup, str):
+                markup = json.loads(markup)
+            if method == "sendMessage":
+                message = self.message(chat_id, data.get("text", ""))
+            else:
+                message = self.message(
+                    chat_id, data.get("text", ""), int(data["message_id"]),
+                )
+            self.inbox[chat_id].put_nowait(
+                (message["text"], markup, message["message_id"])
+            )
+            return ok(message)
+        if method == "answerCallbackQuery":
+            # Уведомление приходит ученику, чей id в callback_query_id
+            chat_id = int(data["callback_query_id"].split(":")[0])
+            self.inbox[chat_id].put_nowait((data.get("text", ""), None, None))
+        return ok(True)
+
+    async def next_updates(self, timeout):
+        """
+        Long polling: ждёт первый апдейт не дольше timeout
+        и добирает уже готовые (до 100)
+        """
+        try:
+            first = await asyncio.wait_for(
+                self.updates.get(), timeout=max(timeout, 0.05),
+            )
+        except asyncio.TimeoutError:
+            return []
+        items = [first]
+        while not self.updates.empty() and len(items) < 100:
+            items.append(self.updates.get_nowait())
+        return items
+
+    def message(self, chat_id, text, message_id=None):
+        if message_id is None:
+            self._message_id += 1
+            message_id = self._message_id
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        }
+        if chat_id != BOT_ID:
+            message["from"] = user(chat_id)
+        return message
+
+    def text_update(self, chat_id, text):
+        self._update_id += 1
+        message = self.message(chat_id, text)
+        if text.startswith("/"):
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(text)}
+            ]
+        return {"update_id": self._update_id, "message": message}
+
+    def callback_update(self, chat_id, message_id, data):
+        """
+        Нажатие inline-кнопки под сообщением бота message_id
+        """
+        self._update_id += 1
+        message = self.message(BOT_ID, "", message_id)
+        message["chat"]["id"] = chat_id
+        return {
+            "update_id": self._update_id,
+            "callback_query": {
+                "id": f"{chat_id}:{self._update_id}",
+                "from": user(chat_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": message,
+            },
+        }
+
+    async def deliver(self, update):
+        if self.webhook_url is None:
+            self.updates.put_nowait(update)
+            return
+        if self._session is None:
+            self._session = ClientSession()
+        headers = {}
+        if self.webhook_secret:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook_secret
+        async with self._session.post(
+            self.webhook_url, json=update, headers=headers,
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"webhook ответил {response.status}")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+def user(chat_id):
+    return {
+        "id": chat_id, "is_bot": False,
+        "first_name": f"u{chat_id}", "username": f"u{chat_id}",
+    }
+
+
+def ok(result):
+    return web.json_response({"ok": True, "result": result})
+
+
+def too_many_requests(retry_after):
+    return web.json_response(
+        {
+            "ok": False,
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry_after}",
+            "parameters": {"retry_after": retry_after},
+        },
+        status=429,
+    )
+
+
+class Learner:
+    """
+    Виртуальный ученик: отправляет апдейт и ждёт первый ответ бота
+    """
+
+    def __init__(self, api, chat_id, latencies):
+        self.api = api
+        self.chat_id = chat_id
+        self.latencies = latencies
+        self.answers = 0
+
+    async def send(self, text):
+        return await self.deliver(self.api.text_update(self.chat_id, text))
+
+    async def tap(self, message_id, data):
+        return await self.deliver(
+            self.api.callback_update(self.chat_id, message_id, data)
+        )
+
+    async def deliver(self, update):
+        started = time.perf_counter()
+        await self.api.deliver(update)
+        reply = await self.reply()
+        self.latencies.append(time.perf_counter() - started)
+        return reply
+
+    async def reply(self):
+        return await asyncio.wait_for(
+            self.api.inbox[self.chat_id].get(), REPLY_TIMEOUT,
+        )
+
+    async def run(self, rounds):
+        await self.send("/start")
+        text, markup, card_id = await self.send(Command.TRAIN)
+        while self.answers < rounds:
+            if QUESTION not in text:
+                # После «Отлично!» следом приходит новая карточка
+                # (в inline-режиме — правка того же сообщения)
+                text, markup, card_id = await self.reply()
+                continue
+            inline = "inline_keyboard" in markup
+            if inline:
+                answer = random.choice(inline_options(markup))
+                text, markup, _ = await self.tap(card_id, answer)
+            else:
+                answer = random.choice(options(markup))
+                text, markup, _ = await self.send(answer)
+            self.answers += 1
+            if not text.startswith(MISTAKE):
+                continue
+            if inline:
+                text, markup, _ = await self.tap(card_id, CallbackAction.NEXT)
+            else:
+                text, markup, card_id = await self.send(Command.NEXT)
+
+
+def options(markup):
+    """
+    Варианты ответа из клавиатуры карточки (без управляющих кнопок)
+    """
+    commands = {Command.NEXT, Command.ADD_WORD, Command.DELETE_WORD}
+    return [
+        button["text"]
+        for row in markup["keyboard"]
+        for button in row
+        if button["text"] not in commands
+    ]
+
+
+def inline_options(markup):
+    """
+    callback_data вариантов ответа inline-карточки
+    """
+    prefix = f"{CallbackAction.ANSWER}:"
+    return [
+        button["callback_data"]
+        for row in markup["inline_keyboard"]
+        for button in row
+        if button["callback_data"].startswith(prefix)
+    ]
+
+
+def parse_metrics(text):
+    """
+    Текстовый формат Prometheus -> {(имя, метки): значение}
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        key = tuple(sorted(LABEL.findall(labels or "")))
+        samples[(name, key)] = float(value)
+    return samples
+
+
+def delta(after, before):
+    return {key: value - before.get(key, 0.0) for key, value in after.items()}
+
+
+def total(samples, name):
+    return sum(value for (key, _), value in samples.items() if key == name)
+
+
+def bucket_quantile(samples, name, q):
+    """
+    Оценка квантиля по корзинам гистограммы name, сложенным по всем
+    меткам: верхняя граница корзины, как Histogram.quantile
+    """
+    buckets = defaultdict(float)
+    for (key, labels), value in samples.items():
+        if key == f"{name}_bucket":
+            buckets[float(dict(labels)["le"])] += value
+    if not buckets:
+        return 0.0
+    bounds = sorted(buckets)
+    count = buckets[bounds[-1]]
+    if not count:
+        return 0.0
+    for bound in bounds:
+        if buckets[bound] >= q * count:
+            return bound
+    return float("inf")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def scrape(url):
+    async with ClientSession() as session:
+        async with session.get(url) as response:
+            return parse_metrics(await response.text())
+
+
+def summarize(args, api, elapsed, latencies, answers, samples):
+    updates = len(latencies)
+    handled = total(samples, "bot_handler_seconds_count")
+    calls = sum(
+        count for method, count in api.calls.items()
+        if method not in SERVICE_METHODS
+    )
+    report = {
+        "mode": args.mode,
+        "quiz": args.quiz,
+        "users": args.users,
+        "rounds": args.rounds,
+        "updates": updates,
+        "seconds": round(elapsed, 2),
+        "updates_per_second": round(updates / elapsed, 1),
+        "reply_p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "reply_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "api_429": api.flooded,
+        # С /start и первой карточкой; 429 тоже считаются вызовами
+        "api_calls_per_answer": round(calls / max(answers, 1), 2),
+        "messages_per_answer": round(
+            api.calls["sendMessage"] / max(answers, 1), 2,
+        ),
+    }
+    if samples:
+        queries = total(samples, "bot_update_db_queries_sum")
+        report.update({
+            "handler_p50_ms": bucket_quantile(
+                samples, "bot_handler_seconds", 0.5) * 1000,
+            "handler_p99_ms": bucket_quantile(
+                samples, "bot_handler_seconds", 0.99) * 1000,
+            "handler_errors": total(samples, "bot_handler_errors_total"),
+            "db_queries_per_update": round(queries / max(handled, 1), 2),
+            # Вместе с фоновой записью пакетов и пополнением карточек
+            "db_queries_total_per_update": round(
+                total(samples, "db_query_seconds_count") / max(updates, 1),
+                2,
+            ),
+            "api_calls_per_update": round(
+                total(samples, "telegram_api_seconds_count")
+                / max(updates, 1),
+                2,
+            ),
+            "outbox_delay_p99_ms": bucket_quantile(
+                samples, "outbox_delay_seconds", 0.99) * 1000,
+            "outbox_retried": samples.get(
+                ("outbox_messages_total", (("result", "retried"),)), 0.0,
+            ),
+        })
+    return report
+
+
+def print_report(report, baseline=None):
+    for key, value in report.items():
+        line = f"{key:>28}: {value}"
+        base = (baseline or {}).get(key)
+        numbers = (int, float)
+        if (
+            key not in PARAMETERS
+            and isinstance(value, numbers)
+            and isinstance(base, numbers)
+        ):
+            change = (value - base) / base * 100 if base else 0.0
+            line += f"  (было {base}, {change:+.1f}%)"
+        print(line)
+
+
+def start_bot(mode, quiz, api_port):
+    env = dict(
+        os.environ,
+        BOT_MODE=mode,
+        QUIZ_MODE=quiz,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}/bot{{0}}/{{1}}",
+        WEBHOOK_URL="",
+    )
+    return subprocess.Popen([sys.executable, "main.py"], env=env)
+
+
+async def wait_ready(api, mode):
+    """
+    Бот готов, когда начал long polling (или слушает webhook)
+    """
+    deadline = time.monotonic() + START_TIMEOUT
+    if mode != "webhook":
+        await asyncio.wait_for(api.polling.wait(), START_TIMEOUT)
+        return
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(
+                "127.0.0.1", config.WEBHOOK_PORT,
+            )
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    webhook_url = None
+    if args.mode == "webhook":
+        webhook_url = (
+            f"http://127.0.0.1:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}"
+        )
+    api = FakeBotAPI(webhook_url, config.WEBHOOK_SECRET, args.flood)
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+
+    bot = None
+    if not args.attach:
+        bot = start_bot(args.mode, args.quiz, args.api_port)
+    metrics_url = f"http://127.0.0.1:{config.METRICS_PORT}/metrics"
+    try:
+        await wait_ready(api, args.mode)
+        before = await scrape(metrics_url) if config.METRICS_PORT else {}
+        latencies = []
+        learners = [
+            Learner(api, FIRST_TG_ID + n, latencies)
+            for n in range(args.users)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            learner.run(args.rounds) for learner in learners
+        ))
+        elapsed = time.perf_counter() - started
+        samples = {}
+        if config.METRICS_PORT:
+            samples = delta(await scrape(metrics_url), before)
+    finally:
+        if bot is not None:
+            bot.terminate()
+            await asyncio.to_thread(bot.wait)
+        await api.close()
+        await runner.cleanup()
+    answers = sum(learner.answers for learner in learners)
+    return summarize(args, api, elapsed, latencies, answers, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--mode", default=config.BOT_MODE,
+        choices=("sync", "async", "webhook"),
+    )
+    parser.add_argument(
+        "--quiz", default=config.QUIZ_MODE, choices=QUIZ_MODES,
+        help="вид карточек бота (QUIZ_MODE)",
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument(
+        "--flood", type=float, default=0.0,
+        help="доля sendMessage, на которую отвечать 429",
+    )
+    parser.add_argument(
+        "--attach", action="store_true",
+        help="не запускать бота: он уже работает с TELEGRAM_API_URL "
+             "на этот сервер",
+    )
+    parser.add_argument("--save", help="сохранить отчёт в JSON")
+    parser.add_argument("--compare", help="сравнить с отчётом из JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
+import asyncio
 import logging
+import signal
+import sys
 
-from bot_instance import bot
-import handlers
+from config import config
 
 logging.basicConfig(
     level=logging.INFO,
@@ -9,6 +11,105 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-if __name__ == "__main__":
-    logging.info("Бот запущен...")
+
+def run_sync():
+    """
+    TeleBot: каждый апдейт обрабатывается в пуле потоков
+    """
+    from bot_instance import bot, outbox
+    from default_db import engine
+    import handlers  # noqa: F401 — регистрирует обработчики
+    import instrumentation
+    from outbox import register_metrics
+    from services import CACHES
+
+    instrumentation.setup(bot, {"sync": engine}, CACHES)
+    register_metrics(outbox)
     bot.polling(none_stop=True, interval=0)
+
+
+def run_webhook():
+    """
+    TeleBot за webhook: апдейты ставятся в очереди по чатам
+    и разбираются пулом воркеров
+    """
+    from bot_instance import bot, outbox
+    from db_pool import pool_stats
+    from default_db import engine
+    import handlers  # noqa: F401 — регистрирует обработчики
+    import instrumentation
+    from outbox import register_metrics
+    from services import CACHES
+    import webhook
+
+    instrumentation.setup(bot, {"sync": engine}, CACHES)
+    register_metrics(outbox)
+    webhook.serve(
+        bot,
+        config.WEBHOOK_HOST,
+        config.WEBHOOK_PORT,
+        config.WEBHOOK_PATH,
+        url=config.WEBHOOK_URL,
+        secret=config.WEBHOOK_SECRET,
+        workers=config.WEBHOOK_WORKERS,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+        stats=lambda: {
+            "db_pool": pool_stats(engine.pool),
+            "outbox": outbox.stats(),
+        },
+    )
+
+
+def run_async():
+    """
+    AsyncTeleBot: апдейты обрабатываются корутинами в одном event loop
+    """
+    from async_bot_instance import bot, outbox
+    from async_db import engine
+    import async_handlers  # noqa: F401 — регистрирует обработчики
+    from async_services import answer_buffer, seen_counter
+    import instrumentation
+    from outbox import register_metrics
+    from services import CACHES
+
+    instrumentation.setup(
+        bot, {"async": engine.sync_engine}, CACHES, is_async=True,
+    )
+    register_metrics(outbox)
+
+    async def serve():
+        try:
+            await bot.polling(non_stop=True, interval=0)
+        finally:
+            # Отправляем поставленные в очередь сообщения и дописываем
+            # накопленные ответы и показы слов
+            await outbox.stop()
+            await answer_buffer.stop()
+            await seen_counter.stop()
+
+    asyncio.run(serve())
+
+
+def exit_on_sigterm(signum, frame):
+    """
+    SIGTERM (docker stop, systemd) завершает бота так же, как Ctrl+C:
+    finally и atexit отправляют очередь сообщений и дописывают в БД
+    накопленные ответы и показы
+    """
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+    logging.info("Бот запущен (режим %s)...", config.BOT_MODE)
+    if config.BOT_MODE == "async":
+        run_async()
+    elif config.BOT_MODE == "sync":
+        run_sync()
+    elif config.BOT_MODE == "webhook":
+        run_webhook()
+    else:
+        raise ValueError(
+            f"Неизвестный режим бота: {config.BOT_MODE!r}. "
+            "Доступны: sync, async, webhook"
+        )
@@ -0,0 +1,266 @@
+"""
+Простые потокобезопасные метрики в памяти процесса.
+
+Метрики, зарегистрированные в REGISTRY (histogram, counter, callback),
+отдаются в текстовом формате Prometheus по GET /metrics (serve).
+"""
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами: observe() — O(log n),
+    квантили оцениваются по верхней границе корзины
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def quantile(self, q):
+        """
+        Оценка квантиля q (0..1): граница корзины, в которую он попал
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for idx, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                if idx < len(self.buckets):
+                    return self.buckets[idx]
+                return float("inf")
+        return float("inf")
+
+    def collect(self):
+        """
+        Накопительные счётчики по корзинам [(le, count)], сумма и число
+        наблюдений — как в гистограмме Prometheus
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),),
+                                       counts):
+            seen += bucket_count
+            cumulative.append((bound, seen))
+        return cumulative, total, count
+
+    def snapshot(self):
+        """
+        Накопленные значения для мониторинга
+        """
+        with self._lock:
+            count, total = self._count, self._sum
+        return {
+            "count": count,
+            "avg": total / count if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Counter:
+    """
+    Монотонный счётчик событий
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Family:
+    """
+    Метрика с метками: labels(*значения) возвращает дочерний Histogram
+    или Counter, создавая его при первом обращении
+    """
+
+    def __init__(self, kind, name, help, labelnames, factory):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def bind(self, values, child):
+        """
+        Выставляет уже существующую метрику (например, гистограмму пула)
+        """
+        with self._lock:
+            self._children[tuple(values)] = child
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            if self.kind == "counter":
+                yield self.name + "_total", labels, child.value
+                continue
+            buckets, total, count = child.collect()
+            for bound, seen in buckets:
+                yield (
+                    self.name + "_bucket",
+                    {**labels, "le": format_bound(bound)},
+                    seen,
+                )
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+
+class Callback:
+    """
+    Значения, которые вычисляются при чтении /metrics: fn() возвращает
+    число или {(значения меток): число}
+    """
+
+    def __init__(self, kind, name, help, labelnames, fn):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        suffix = "_total" if self.kind == "counter" else ""
+        for label_values, value in values.items():
+            labels = dict(zip(self.labelnames, label_values))
+            yield self.name + suffix, labels, value
+
+
+# name -> Family | Callback; повторная регистрация заменяет метрику
+REGISTRY = {}
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    family = Family(
+        "histogram", name, help, labelnames, lambda: Histogram(buckets),
+    )
+    REGISTRY[name] = family
+    return family
+
+
+def counter(name, help, labelnames=()):
+    family = Family("counter", name, help, labelnames, Counter)
+    REGISTRY[name] = family
+    return family
+
+
+def callback(name, help, fn, labelnames=(), kind="gauge"):
+    REGISTRY[name] = Callback(kind, name, help, labelnames, fn)
+
+
+def format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def escape_label(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{escape_label(value)}"' for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def render():
+    """
+    Все метрики REGISTRY в текстовом формате Prometheus
+    """
+    lines = []
+    for metric in list(REGISTRY.values()):
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            logger.warning("Метрика %s недоступна: %s", metric.name, e)
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in samples:
+            lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        payload = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve(host, port):
+    """
+    Запускает HTTP-сервер /metrics в фоновом потоке
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True,
+    ).start()
+    logger.info("Метрики: http://%s:%s/metrics", host, port)
+    return server
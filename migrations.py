@@ -0,0 +1,436 @@
+"""
+Миграции схемы БД без пересоздания таблиц.
+
+Каждая миграция — функция apply(engine) с номером версии; применённые
+версии записываются в schema_migrations, и при запуске выполняются
+только новые. Миграции идемпотентны: прерванную можно запустить снова.
+
+Чтобы не останавливать работающего бота:
+  - соединения миграций ждут блокировку не дольше MIGRATION_LOCK_TIMEOUT,
+    при отказе шаг повторяется с паузой (бот успевает отработать);
+  - индексы моделей создаются CREATE INDEX CONCURRENTLY;
+  - заполнение новых колонок (backfill) идёт пакетами по первичному
+    ключу, каждый пакет — короткая отдельная транзакция.
+
+    python default_db.py migrate          — применить новые миграции
+    python default_db.py migrate status   — список миграций
+"""
+import logging
+import time
+from typing import Callable, NamedTuple
+
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex
+
+import event_log
+from config import config
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock ("mig"): миграции не выполняются двумя
+# процессами сразу
+ADVISORY_LOCK_KEY = 0x6D6967
+
+# Сколько раз чистить повторы и строить уникальный индекс заново, если
+# бот успел добавить повтор во время построения
+UNIQUE_BUILD_ATTEMPTS = 5
+
+CREATE_VERSIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version text PRIMARY KEY,
+        description text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+class Migration(NamedTuple):
+    version: str
+    description: str
+    apply: Callable
+
+
+def migration_engine(engine):
+    """
+    Отдельный движок без пула: без statement_timeout бота (обслуживание
+    больших таблиц идёт дольше) и с ограниченным ожиданием блокировок
+    """
+    migrations = create_engine(engine.url, poolclass=NullPool)
+
+    @event.listens_for(migrations, "connect")
+    def set_timeouts(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SET statement_timeout = 0")
+        cursor.execute(
+            f"SET lock_timeout = {int(config.MIGRATION_LOCK_TIMEOUT)}"
+        )
+        cursor.close()
+
+    return migrations
+
+
+def is_lock_timeout(error):
+    return getattr(error.orig, "pgcode", None) == "55P03"
+
+
+def retry_on_lock_timeout(step, *args):
+    """
+    Выполняет step(*args); если блокировку не дали за lock_timeout,
+    повторяет с растущей паузой MIGRATION_LOCK_RETRIES раз
+    """
+    for attempt in range(config.MIGRATION_LOCK_RETRIES + 1):
+        try:
+            return step(*args)
+        except exc.OperationalError as e:
+            if not is_lock_timeout(e) or (
+                attempt == config.MIGRATION_LOCK_RETRIES
+            ):
+                raise
+            delay = min(2 ** attempt, 30)
+            logger.warning(
+                "Блокировка занята (%s), повтор через %s с",
+                str(e.orig).splitlines()[0], delay,
+            )
+            time.sleep(delay)
+
+
+def backfill(engine, table, key, update_sql):
+    """
+    Выполняет update_sql пакетами по диапазонам первичного ключа key:
+    в запросе параметры :lo и :hi (lo <= key < hi). Возвращает число
+    изменённых строк
+    """
+    with engine.connect() as conn:
+        low, high = conn.execute(
+            text(f"SELECT min({key}), max({key}) FROM {table}")
+        ).one()
+    if low is None:
+        return 0
+
+    def run_batch(lo, hi):
+        with engine.begin() as conn:
+            return conn.execute(
+                text(update_sql), {"lo": lo, "hi": hi},
+            ).rowcount
+
+    size = config.MIGRATION_BATCH_SIZE
+    total = 0
+    for lo in range(low, high + 1, size):
+        total += retry_on_lock_timeout(run_batch, lo, lo + size)
+        time.sleep(config.MIGRATION_BATCH_PAUSE)
+    return total
+
+
+def create_index_concurrently(engine, index, cleanup=None):
+    """
+    CREATE INDEX CONCURRENTLY: таблица остаётся доступной для записи.
+    Невалидный индекс, оставшийся от прерванного запуска, пересоздаётся.
+    cleanup(engine) удаляет повторы перед построением уникального
+    индекса; если бот добавил повтор во время построения, невалидный
+    индекс удаляется, и чистка с построением повторяются
+    """
+    for attempt in range(UNIQUE_BUILD_ATTEMPTS):
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            valid = conn.execute(
+                text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": index.name},
+            ).scalar()
+            if valid:
+                return False
+            if valid is not None:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY {index.name}"))
+            if cleanup is not None:
+                cleanup(engine)
+            options = index.dialect_options["postgresql"]
+            options["concurrently"] = True
+            try:
+                conn.execute(CreateIndex(index))
+                return True
+            except exc.IntegrityError:
+                if cleanup is None or attempt == UNIQUE_BUILD_ATTEMPTS - 1:
+                    raise
+                logger.warning(
+                    "Повтор в %s во время построения индекса %s, "
+                    "чистка повторяется", index.table.name, index.name,
+                )
+            finally:
+                options["concurrently"] = False
+
+
+def create_missing_indexes(engine):
+    """
+    Создаёт индексы моделей, которых ещё нет в БД: create_all добавляет
+    индексы только вместе с новыми таблицами. Секционированные таблицы
+    CONCURRENTLY не поддерживают — их индексы создаются обычным образом
+    """
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        partitioned = table.dialect_options["postgresql"]["partition_by"]
+        for index in table.indexes:
+            if partitioned:
+                with engine.begin() as conn:
+                    index.create(conn, checkfirst=True)
+            elif retry_on_lock_timeout(
+                create_index_concurrently, engine, index,
+                INDEX_CLEANUP.get(index.name),
+            ):
+                created += 1
+                print(f"🔧 Создан индекс {index.name}")
+    return created
+
+
+def create_tables(engine):
+    """
+    Создаёт отсутствующие таблицы (create_all не трогает существующие)
+    """
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+
+
+def dedupe_learning_history(engine):
+    """
+    Схлопывает дубли learning_history (user_id, word_id) в одну запись
+    с суммой счётчиков и добавляет уникальное ограничение.
+    Нужна для баз, созданных до появления uq_learning_history_user_word.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text(
+                "SELECT 1 FROM pg_constraint "
+                "WHERE conname = 'uq_learning_history_user_word'"
+            )
+        ).scalar()
+        if exists:
+            print("Ограничение уже есть, миграция не нужна")
+            return
+
+        # Таблица блокируется до конца транзакции, чтобы бот не успел
+        # вставить новый дубль между чисткой и созданием ограничения
+        conn.execute(text("LOCK TABLE learning_history IN EXCLUSIVE MODE"))
+        conn.execute(
+            text(
+                """
+                UPDATE learning_history AS lh
+                SET correct_count = d.correct_count,
+                    fail_count = d.fail_count,
+                    seen_count = d.seen_count
+                FROM (
+                    SELECT min(learning_history_id) AS keep_id,
+                           sum(correct_count) AS correct_count,
+                           sum(fail_count) AS fail_count,
+                           sum(seen_count) AS seen_count
+                    FROM learning_history
+                    GROUP BY user_id, word_id
+                    HAVING count(*) > 1
+                ) AS d
+                WHERE lh.learning_history_id = d.keep_id
+                """
+            )
+        )
+        removed = conn.execute(
+            text(
+                """
+                DELETE FROM learning_history AS lh
+                USING learning_history AS keep
+                WHERE lh.user_id = keep.user_id
+                  AND lh.word_id = keep.word_id
+                  AND lh.learning_history_id > keep.learning_history_id
+                """
+            )
+        ).rowcount
+        conn.execute(
+            text(
+                "ALTER TABLE learning_history "
+                "ADD CONSTRAINT uq_learning_history_user_word "
+                "UNIQUE (user_id, word_id)"
+            )
+        )
+    print(f"🔧 Удалено дублей learning_history: {removed}")
+
+
+def add_review_columns(engine):
+    """
+    Добавляет в learning_history колонки интервального повторения
+    (индекс очереди создаёт create_missing_indexes). Уже отвеченные
+    слова попадают в очередь пакетным backfill
+    """
+    with engine.begin() as conn:
+        # Колонки с константным DEFAULT добавляются без перезаписи
+        # таблицы: ACCESS EXCLUSIVE держится мгновения
+        conn.execute(
+            text(
+                """
+                ALTER TABLE learning_history
+                ADD COLUMN IF NOT EXISTS ease_factor double precision
+                    NOT NULL DEFAULT 2.5,
+                ADD COLUMN IF NOT EXISTS interval_days double precision
+                    NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS streak integer NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS due_at timestamp with time zone
+                """
+            )
+        )
+    scheduled = backfill(
+        engine,
+        "learning_history",
+        "learning_history_id",
+        """
+        UPDATE learning_history SET due_at = now()
+        WHERE learning_history_id >= :lo AND learning_history_id < :hi
+          AND due_at IS NULL
+          AND correct_count + fail_count > 0
+        """,
+    )
+    print(f"🗓️ Добавлено в очередь повторений: {scheduled}")
+
+
+def rebuild_user_stats(engine):
+    """
+    Пересчитывает user_stats по learning_history. Нужна для баз, созданных
+    до появления user_stats; повторный запуск безопасен
+    """
+    with engine.begin() as conn:
+        # Блокировка запрещает запись ответов, пока идёт пересчёт,
+        # иначе инкремент мог бы потеряться или учесться дважды
+        conn.execute(text("LOCK TABLE learning_history IN SHARE MODE"))
+        rows = conn.execute(
+            text(
+                """
+                INSERT INTO user_stats (user_id, total_correct, total_errors)
+                SELECT user_id, sum(correct_count), sum(fail_count)
+                FROM learning_history
+                GROUP BY user_id
+                ON CONFLICT (user_id) DO UPDATE
+                SET total_correct = excluded.total_correct,
+                    total_errors = excluded.total_errors
+                """
+            )
+        ).rowcount
+    print(f"📊 Пересчитаны итоги пользователей: {rows}")
+
+
+def remove_user_word_duplicates(engine):
+    """
+    Удаляет повторы слова в словаре пользователя (без учёта регистра),
+    оставляя первое добавленное, — иначе не создать уникальный индекс
+    uq_dictionaries_user_word
+    """
+    with engine.begin() as conn:
+        # Пока идёт чистка, новый повтор не добавится
+        conn.execute(text("LOCK TABLE dictionaries IN SHARE MODE"))
+        removed = conn.execute(
+            text(
+                """
+                DELETE FROM dictionaries AS d
+                USING dictionaries AS keep
+                WHERE d.user_id = keep.user_id
+                  AND lower(d.added_eng_word) = lower(keep.added_eng_word)
+                  AND d.dictionary_id > keep.dictionary_id
+                """
+            )
+        ).rowcount
+    print(f"🔧 Удалено повторов в словарях пользователей: {removed}")
+
+
+# Уникальные индексы моделей -> чистка повторов перед их построением
+# (create_index_concurrently): индекс, пропавший или оставшийся
+# невалидным, строится заново вместе с чисткой
+INDEX_CLEANUP = {
+    "uq_dictionaries_user_word": remove_user_word_duplicates,
+}
+
+
+def dedupe_user_words(engine):
+    """
+    Строит уникальный индекс uq_dictionaries_user_word, удаляя повторы
+    слов в словарях пользователей. Заменённый им индекс по user_id
+    удаляется только после того, как уникальный индекс готов.
+    Повторный запуск безопасен
+    """
+    index = next(
+        index
+        for index in Base.metadata.tables["dictionaries"].indexes
+        if index.name == "uq_dictionaries_user_word"
+    )
+    create_index_concurrently(engine, index, INDEX_CLEANUP[index.name])
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_dictionaries_user_id"))
+
+
+# Порядок важен; новые миграции добавляются в конец со следующим номером.
+# Индексы моделей создаются после всех миграций (create_missing_indexes)
+MIGRATIONS = [
+    Migration("0001", "таблицы моделей", create_tables),
+    Migration(
+        "0002", "уникальность learning_history", dedupe_learning_history,
+    ),
+    Migration("0003", "колонки интервального повторения", add_review_columns),
+    Migration("0004", "итоги пользователей user_stats", rebuild_user_stats),
+    Migration(
+        "0005", "слово уникально в словаре пользователя", dedupe_user_words,
+    ),
+    Migration("0006", "скрытые слова пользователей", create_tables),
+]
+
+
+def applied_versions(conn):
+    conn.execute(text(CREATE_VERSIONS))
+    return set(
+        conn.execute(text("SELECT version FROM schema_migrations")).scalars()
+    )
+
+
+def pending(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in done]
+
+
+def migrate(engine):
+    """
+    Применяет новые миграции, создаёт недостающие индексы и секции
+    журнала ответов. Повторный запуск ничего не меняет
+    """
+    engine = migration_engine(engine)
+    with engine.connect() as lock:
+        # Без открытой транзакции: CREATE INDEX CONCURRENTLY ждёт
+        # завершения всех транзакций, включая эту
+        lock = lock.execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(
+            text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY},
+        )
+        try:
+            for migration in pending(engine):
+                print(f"▶️ {migration.version}: {migration.description}")
+                retry_on_lock_timeout(migration.apply, engine)
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            "INSERT INTO schema_migrations "
+                            "(version, description) VALUES (:v, :d)"
+                        ),
+                        {"v": migration.version, "d": migration.description},
+                    )
+            create_missing_indexes(engine)
+            retry_on_lock_timeout(event_log.maintain, engine)
+        finally:
+            lock.execute(
+                text("SELECT pg_advisory_unlock(:key)"),
+                {"key": ADVISORY_LOCK_KEY},
+            )
+    engine.dispose()
+
+
+def status(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    for migration in MIGRATIONS:
+        mark = "✅" if migration.version in done else "⏳"
+        print(f"{mark} {migration.version}: {migration.description}")
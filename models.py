@@ -4,19 +4,29 @@
 Схема:
   users            — пользователи (tg_id, username).
   words            — общий словарь: original, translation.
-  dictionaries     — слова пользователя: added_eng_word, added_rus_word.
-  learning_history — по user+word: correct_count, fail_count, seen_count.
+  dictionaries     — слова пользователя: added_eng_word, added_rus_word;
+                     слово уникально у пользователя без учёта регистра.
+  hidden_words     — слова общего словаря, скрытые пользователем.
+  learning_history — по user+word: correct_count, fail_count, seen_count
+                     и расписание повторений (см. scheduler).
+  user_stats       — итоги пользователя для /stats (сумма по его истории).
+  answer_events    — журнал всех ответов, секции по месяцам (event_log).
+  bot_states       — состояния диалогов бота (UNLOGGED, см. state_storage).
 
 Связи: User 1─* Dictionary, User 1─* LearningHistory, Word 1─* LearningHistory.
+User *─* Word через hidden_words.
 Длина строк слов задаётся в validators.MAX_WORD_LENGTH.
 """
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import (
     Column, Integer, String, ForeignKey, TIMESTAMP, BigInteger,
+    UniqueConstraint, Index, Float, Boolean, Identity, func,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, backref
 from datetime import datetime
 
+from scheduler import DEFAULT_EASE
 from validators import MAX_WORD_LENGTH
 
 USERNAME_STRING_LENGTH = 100
@@ -69,6 +79,8 @@ class Dictionary(Base):
     __tablename__ = "dictionaries"
 
     dictionary_id = Column(Integer, primary_key=True)
+    # слова пользователя читаются по user_id — префиксу индекса
+    # uq_dictionaries_user_word (см. ниже)
     user_id = Column(
         Integer,
         ForeignKey("users.user_id", ondelete="CASCADE"),
@@ -78,7 +90,10 @@ class Dictionary(Base):
     added_rus_word = Column(String(MAX_WORD_LENGTH), nullable=True)
     removed_word = Column(String(MAX_WORD_LENGTH), nullable=True)
 
-    user = relationship("User", backref="dictionaries")
+    user = relationship(
+        "User",
+        backref=backref("dictionaries", passive_deletes=True),
+    )
 
     def __repr__(self):
         return (
@@ -88,12 +103,63 @@ class Dictionary(Base):
         )
 
 
+# Поиск слова для удаления идёт без учёта регистра (queries.hide_word,
+# find_user_word) — индексы по lower(). В словаре пользователя слово
+# уникально без учёта регистра: повторное добавление даёт IntegrityError
+Index("ix_words_original_lower", func.lower(Word.original))
+Index(
+    "uq_dictionaries_user_word",
+    Dictionary.user_id,
+    func.lower(Dictionary.added_eng_word),
+    unique=True,
+)
+
+
+class HiddenWord(Base):
+    """
+    Слова общего словаря, которые пользователь удалил у себя. Строка
+    words остаётся для остальных, история ответов не трогается.
+    Первичный ключ (user_id, word_id) — чтение скрытых слов
+    пользователя и проверка слова одним поиском по индексу
+    """
+
+    __tablename__ = "hidden_words"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    word_id = Column(
+        Integer,
+        ForeignKey("words.word_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    hidden_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=func.now(),
+    )
+
+    def __repr__(self):
+        return (
+            f"HiddenWord(user_id={self.user_id}, word_id={self.word_id}, "
+            f"hidden_at={self.hidden_at})"
+        )
+
+
 class LearningHistory(Base):
     """
     Таблица для хранения истории изучения слов пользователя
     """
 
     __tablename__ = "learning_history"
+    # одна запись на пару user+word — по ней работает upsert счётчиков
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "word_id", name="uq_learning_history_user_word",
+        ),
+        # очередь повторений пользователя: ближайшее слово — первое
+        Index("ix_learning_history_due", "user_id", "due_at"),
+    )
 
     learning_history_id = Column(Integer, primary_key=True)
     user_id = Column(
@@ -110,8 +176,22 @@ class LearningHistory(Base):
     fail_count = Column(Integer, nullable=False, default=0)
     # сколько раз слово показывалось пользователю
     seen_count = Column(Integer, nullable=False, default=0)
+    # интервальное повторение; due_at пуст, пока на слово не ответили
+    ease_factor = Column(
+        Float, nullable=False, default=DEFAULT_EASE,
+        server_default=str(DEFAULT_EASE),
+    )
+    interval_days = Column(
+        Float, nullable=False, default=0, server_default="0",
+    )
+    streak = Column(Integer, nullable=False, default=0, server_default="0")
+    due_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
-    user = relationship("User", backref="learning_history")
+    # passive_deletes=True: при удалении User БД сама удалит записи
+    user = relationship(
+        "User",
+        backref=backref("learning_history", passive_deletes=True),
+    )
     # passive_deletes=True: при удалении Word БД сама удалит записи (ON DELETE CASCADE)
     word = relationship(
         "Word",
@@ -124,5 +204,89 @@ class LearningHistory(Base):
             f"user_id={self.user_id}, word_id={self.word_id}, "
             f"correct_count={self.correct_count}, "
             f"fail_count={self.fail_count}, "
-            f"seen_count={self.seen_count})"
+            f"seen_count={self.seen_count}, due_at={self.due_at})"
+        )
+
+
+class UserStats(Base):
+    """
+    Итоги ответов пользователя. Увеличиваются в той же транзакции, что
+    и learning_history, поэтому /stats читает top-N по индексу вместо
+    GROUP BY по всей истории
+    """
+
+    __tablename__ = "user_stats"
+    # обратный проход индекса отдаёт ORDER BY total_correct DESC, user_id DESC
+    __table_args__ = (
+        Index("ix_user_stats_top", "total_correct", "user_id"),
+    )
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    total_correct = Column(Integer, nullable=False, default=0)
+    total_errors = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"UserStats(user_id={self.user_id}, "
+            f"total_correct={self.total_correct}, "
+            f"total_errors={self.total_errors})"
+        )
+
+
+class AnswerEvent(Base):
+    """
+    Журнал ответов (append-only), секционирован по месяцам answered_at.
+    Секции создаёт и удаляет event_log; внешних ключей нет, чтобы
+    удаление слов и пользователей не переписывало журнал
+    """
+
+    __tablename__ = "answer_events"
+    __table_args__ = (
+        # ответы пользователя за период
+        Index("ix_answer_events_user_time", "user_id", "answered_at"),
+        {"postgresql_partition_by": "RANGE (answered_at)"},
+    )
+
+    event_id = Column(BigInteger, Identity(), primary_key=True)
+    # ключ секционирования обязан входить в первичный ключ
+    answered_at = Column(
+        TIMESTAMP(timezone=True), primary_key=True,
+        server_default=func.now(),
+    )
+    user_id = Column(Integer, nullable=False)
+    # как id карточки: < 0 — слово из словаря пользователя
+    word_id = Column(Integer, nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"AnswerEvent(id={self.event_id}, user_id={self.user_id}, "
+            f"word_id={self.word_id}, is_correct={self.is_correct}, "
+            f"answered_at={self.answered_at})"
+        )
+
+
+class BotState(Base):
+    """
+    Таблица состояний диалогов (хранилище для StatePostgresStorage).
+    UNLOGGED: не пишется в WAL — быстрее, а потеря при сбое БД
+    для незавершённых викторин допустима
+    """
+
+    __tablename__ = "bot_states"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(200), primary_key=True)
+    state = Column(String(100), nullable=True)
+    data = Column(JSONB, nullable=False, default=dict)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return (
+            f"BotState(key={self.key}, state={self.state}, "
+            f"expires_at={self.expires_at})"
         )
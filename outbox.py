@@ -0,0 +1,500 @@
+"""
+Очередь исходящих сообщений Bot API.
+
+Обработчик ставит сообщение в очередь и сразу возвращается, отправляют
+фоновые потоки (в асинхронном режиме — задачи event loop). Соблюдаются
+лимиты Telegram:
+  - общий token bucket: OUTBOX_GLOBAL_RATE сообщений в секунду;
+  - token bucket на чат: OUTBOX_CHAT_RATE в секунду, всплеск до
+    OUTBOX_CHAT_BURST (ответ на карточку — это два сообщения подряд);
+  - сообщения одного чата уходят по одному и строго по порядку;
+  - ответ на нажатие inline-кнопки (answerCallbackQuery) сообщением
+    в чат не является: он идёт в своей очереди и только под общий
+    лимит, не дожидаясь очереди и лимита чата;
+  - на 429 чат откладывается на retry_after, сообщение повторяется;
+  - из готовых к отправке чатов первым идёт тот, чьё сообщение
+    срочнее: ответы викторины (QUIZ) раньше таблицы лидеров (BULK).
+
+Лимит 0 — без ограничения (например, для нагрузочного теста).
+"""
+import asyncio
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority:
+    """
+    Срочность сообщения: меньше — раньше
+    """
+
+    QUIZ = 0
+    BULK = 1
+
+
+class OutMessage(NamedTuple):
+    method: str
+    args: tuple
+    kwargs: dict
+    priority: int
+    queued_at: float
+    attempts: int = 0
+
+
+class CallbackKey(NamedTuple):
+    """
+    Очередь ответа на нажатие inline-кнопки вместо очереди чата:
+    у каждого ответа своя, лимит чата на неё не расходуется
+    """
+
+    callback_query_id: str
+
+
+# Погрешность счёта токенов: без неё ожидание может выйти столь малым,
+# что не сдвинет время
+EPSILON = 1e-9
+
+
+class TokenBucket:
+    """
+    rate токенов в секунду, не больше burst про запас; rate <= 0 —
+    без ограничения
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        # Время последнего пересчёта; часы берутся из первого вызова
+        self.updated = None
+
+    def _refill(self, now):
+        if self.updated is None:
+            self.updated = now
+        elif now > self.updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate,
+            )
+            self.updated = now
+
+    def wait(self, now):
+        """
+        Сколько секунд до свободного токена (0 — есть сейчас)
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1 - EPSILON:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+    def full(self, now):
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.burst - EPSILON
+
+
+class SendScheduler:
+    """
+    Очереди по чатам и выбор следующего сообщения с учётом лимитов.
+    Без блокировок: вызывается под lock владельца (Outbox)
+    """
+
+    def __init__(self, global_rate, chat_rate, chat_burst):
+        # Без запаса: в любую секунду уходит не больше global_rate + 1
+        self.global_bucket = TokenBucket(global_rate, 1)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        # chat_id -> deque сообщений; чат без записи — пуст и не в полёте
+        self._chats = {}
+        self._buckets = {}
+        # Чаты, готовые к отправке: (priority, seq, chat_id)
+        self._ready = []
+        # Чаты, ждущие свой лимит или retry_after: (когда, seq, chat_id)
+        self._delayed = []
+        self._seq = itertools.count()
+        self._pending = 0
+
+    def put(self, chat_id, message, now):
+        queue = self._chats.get(chat_id)
+        self._pending += 1
+        if queue is not None:
+            # Чат уже стоит в расписании или отправляется
+            queue.append(message)
+            return
+        self._chats[chat_id] = deque([message])
+        self._schedule(chat_id, now)
+
+    def _schedule(self, chat_id, now, not_before=0.0):
+        if not_before > now:
+            heapq.heappush(
+                self._delayed, (not_before, next(self._seq), chat_id),
+            )
+            return
+        priority = self._chats[chat_id][0].priority
+        heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+
+    def take(self, now):
+        """
+        (chat_id, message) следующего сообщения или (None, секунд до
+        следующей попытки; None — очередь пуста)
+        """
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._delayed)
+            self._schedule(chat_id, now)
+        while self._ready:
+            wait = self.global_bucket.wait(now)
+            if wait > 0:
+                return None, wait
+            _, _, chat_id = heapq.heappop(self._ready)
+            bucket = self._bucket(chat_id)
+            wait = bucket.wait(now) if bucket is not None else 0.0
+            if wait > 0:
+                self._schedule(chat_id, now, now + wait)
+                continue
+            self.global_bucket.take(now)
+            if bucket is not None:
+                bucket.take(now)
+            return chat_id, self._chats[chat_id].popleft()
+        if self._delayed:
+            return None, self._delayed[0][0] - now
+        return None, None
+
+    def _bucket(self, chat_id):
+        if isinstance(chat_id, CallbackKey):
+            return None
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst,
+            )
+        return bucket
+
+    def done(self, chat_id, now):
+        """
+        Сообщение чата отправлено (или отброшено)
+        """
+        self._pending -= 1
+        if self._chats[chat_id]:
+            self._schedule(chat_id, now)
+            return
+        del self._chats[chat_id]
+        if len(self._buckets) > 2 * len(self._chats) + 1000:
+            self._prune(now)
+
+    def retry(self, chat_id, message, delay, now):
+        """
+        Вернуть сообщение в начало очереди чата и отложить чат на delay
+        """
+        self._chats[chat_id].appendleft(message)
+        self._schedule(chat_id, now, now + delay)
+
+    def _prune(self, now):
+        # Ведро без очереди и полное ничем не отличается от нового
+        for chat_id in list(self._buckets):
+            if chat_id not in self._chats and self._buckets[chat_id].full(now):
+                del self._buckets[chat_id]
+
+    def pending(self):
+        """
+        Сообщений в очередях и в отправке
+        """
+        return self._pending
+
+    def idle(self):
+        return self._pending == 0
+
+
+def retry_after(error):
+    """
+    Пауза из ответа 429 (parameters.retry_after), сек; None — не 429.
+    У apihelper и asyncio_helper свои классы ApiTelegramException,
+    поэтому проверяется код ошибки
+    """
+    if getattr(error, "error_code", None) != 429:
+        return None
+    parameters = (error.result_json or {}).get("parameters") or {}
+    return float(parameters.get("retry_after", 1))
+
+
+class Outbox:
+    """
+    Очередь отправки для TeleBot: send_message() ставит сообщение
+    в очередь, workers потоков отправляют. Потоки запускаются при первом
+    сообщении
+    """
+
+    def __init__(self, bot, global_rate=30, chat_rate=1, chat_burst=3,
+                 workers=8, max_retries=5, stop_timeout=10.0):
+        self.bot = bot
+        self.workers = workers
+        self.max_retries = max_retries
+        self.stop_timeout = stop_timeout
+        self.scheduler = SendScheduler(global_rate, chat_rate, chat_burst)
+        self.sent = metrics.Counter()
+        self.failed = metrics.Counter()
+        self.retried = metrics.Counter()
+        self.dropped = metrics.Counter()
+        self.latency = metrics.Histogram()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stopped = False
+        self._runners = []
+
+    def send_message(self, chat_id, text, priority=Priority.QUIZ, **kwargs):
+        """
+        Как bot.send_message, но возвращается сразу (без Message)
+        """
+        self.call(
+            chat_id, "send_message", chat_id, text, priority=priority,
+            **kwargs,
+        )
+
+    def edit_message_text(self, chat_id, message_id, text,
+                          priority=Priority.QUIZ, **kwargs):
+        self.call(
+            chat_id, "edit_message_text", text, chat_id, message_id,
+            priority=priority, **kwargs,
+        )
+
+    def answer_callback_query(self, chat_id, callback_query_id,
+                              priority=Priority.QUIZ, **kwargs):
+        """
+        Ответ на нажатие кнопки в чате chat_id: не ждёт сообщений чата
+        и не расходует его лимит (см. CallbackKey)
+        """
+        self.call(
+            CallbackKey(callback_query_id), "answer_callback_query",
+            callback_query_id, priority=priority, **kwargs,
+        )
+
+    def call(self, chat_id, method, *args, priority=Priority.QUIZ,
+             **kwargs):
+        """
+        Вызов bot.method(*args, **kwargs) через очередь чата chat_id
+        """
+        now = time.monotonic()
+        message = OutMessage(method, args, kwargs, priority, now)
+        with self._lock:
+            if self._stopped:
+                self.dropped.inc()
+                logger.warning("Очередь отправки остановлена, %s", method)
+                return
+            self.scheduler.put(chat_id, message, now)
+            self._wake.notify()
+        self._ensure_started()
+
+    def pending(self):
+        with self._lock:
+            return self.scheduler.pending()
+
+    def _ensure_started(self):
+        if self._runners:
+            return
+        with self._lock:
+            if self._runners:
+                return
+            for n in range(self.workers):
+                runner = threading.Thread(
+                    target=self._run, name=f"outbox-{n}", daemon=True,
+                )
+                runner.start()
+                self._runners.append(runner)
+        atexit.register(self.stop)
+
+    def _take(self):
+        """
+        Следующее сообщение; None — очередь остановлена и пуста
+        """
+        with self._lock:
+            while True:
+                if self._stopped and self.scheduler.idle():
+                    return None
+                chat_id, item = self.scheduler.take(time.monotonic())
+                if chat_id is not None:
+                    return chat_id, item
+                self._wake.wait(item)
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            chat_id, message = taken
+            try:
+                getattr(self.bot, message.method)(
+                    *message.args, **message.kwargs
+                )
+            except Exception as e:
+                self._finish(chat_id, message, e)
+            else:
+                self._finish(chat_id, message)
+
+    def _complete(self, chat_id, message, error=None):
+        """
+        Итог отправки: done, повтор после 429 или отказ.
+        Вызывается под lock
+        """
+        now = time.monotonic()
+        if error is None:
+            self.sent.inc()
+            self.latency.observe(now - message.queued_at)
+            self.scheduler.done(chat_id, now)
+            return
+        delay = retry_after(error)
+        if delay is not None and message.attempts < self.max_retries:
+            self.retried.inc()
+            self.scheduler.retry(
+                chat_id, message._replace(attempts=message.attempts + 1),
+                delay, now,
+            )
+            return
+        self.failed.inc()
+        logger.error(
+            "Не удалось отправить %s в чат %s: %s",
+            message.method, chat_id, error,
+        )
+        self.scheduler.done(chat_id, now)
+
+    def _finish(self, chat_id, message, error=None):
+        with self._lock:
+            self._complete(chat_id, message, error)
+            self._wake.notify_all()
+
+    def stop(self):
+        """
+        Дожидается отправки очереди (не дольше stop_timeout)
+        """
+        with self._lock:
+            self._stopped = True
+            self._wake.notify_all()
+        deadline = time.monotonic() + self.stop_timeout
+        for runner in self._runners:
+            runner.join(max(deadline - time.monotonic(), 0))
+        left = self.pending()
+        if left:
+            logger.warning("Очередь отправки: не отправлено %s", left)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "sent": self.sent.value,
+            "retried": self.retried.value,
+            "failed": self.failed.value,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class AsyncOutbox(Outbox):
+    """
+    То же для AsyncTeleBot: отправляют задачи event loop
+    """
+
+    def __init__(self, bot, **kwargs):
+        super().__init__(bot, **kwargs)
+        self._event = None
+
+    def call(self, chat_id, method, *args, priority=Priority.QUIZ,
+             **kwargs):
+        now = time.monotonic()
+        message = OutMessage(method, args, kwargs, priority, now)
+        if self._stopped:
+            self.dropped.inc()
+            logger.warning("Очередь отправки остановлена, %s", method)
+            return
+        self.scheduler.put(chat_id, message, now)
+        self._ensure_started()
+        self._event.set()
+
+    def pending(self):
+        return self.scheduler.pending()
+
+    def _ensure_started(self):
+        if self._runners:
+            return
+        self._event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._runners = [
+            loop.create_task(self._run()) for _ in range(self.workers)
+        ]
+
+    async def _take(self):
+        while True:
+            if self._stopped and self.scheduler.idle():
+                return None
+            chat_id, item = self.scheduler.take(time.monotonic())
+            if chat_id is not None:
+                return chat_id, item
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), item)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        while True:
+            taken = await self._take()
+            if taken is None:
+                return
+            chat_id, message = taken
+            try:
+                await getattr(self.bot, message.method)(
+                    *message.args, **message.kwargs
+                )
+            except Exception as e:
+                self._finish(chat_id, message, e)
+            else:
+                self._finish(chat_id, message)
+
+    def _finish(self, chat_id, message, error=None):
+        self._complete(chat_id, message, error)
+        self._event.set()
+
+    async def stop(self):
+        self._stopped = True
+        if not self._runners:
+            return
+        self._event.set()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*self._runners), self.stop_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Очередь отправки: не отправлено %s", self.pending(),
+            )
+
+
+def register_metrics(outbox):
+    """
+    Метрики очереди отправки для GET /metrics
+    """
+    metrics.callback(
+        "outbox_pending", "Сообщений в очереди отправки", outbox.pending,
+    )
+    results = metrics.counter(
+        "outbox_messages", "Отправленные, повторённые после 429, "
+        "неотправленные и отброшенные после остановки", ("result",),
+    )
+    results.bind(("sent",), outbox.sent)
+    results.bind(("retried",), outbox.retried)
+    results.bind(("failed",), outbox.failed)
+    results.bind(("dropped",), outbox.dropped)
+    metrics.histogram(
+        "outbox_delay_seconds", "От постановки в очередь до отправки",
+    ).bind((), outbox.latency)
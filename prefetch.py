@@ -0,0 +1,127 @@
+"""
+Буфер заранее подготовленных карточек пользователя.
+
+Карточка — список пар (original, translation, word_id), загаданное слово
+первым (как возвращает services.create_words). Пока пользователь отвечает,
+фоновая задача готовит следующие карточки пакетом, и «Дальше» берёт
+готовую карточку из памяти без обращения к БД.
+
+Пакет, собранный до изменения словаря пользователя, в буфер не
+попадает: drop() забывает поколение буфера, и push() со старым
+поколением отбрасывается.
+"""
+import itertools
+import threading
+from collections import deque
+
+from cache import TTLCache
+
+
+class CardBuffer:
+    """
+    Кольцевой буфер карточек на пользователя. Пополнение заказывает
+    вызывающий код: claim_refill() разрешает не больше одного пополнения
+    на пользователя одновременно и возвращает поколение, с которым
+    пакет передаётся в push()
+    """
+
+    def __init__(self, capacity=16, low_water=2, max_users=10000, ttl=600):
+        self.capacity = capacity
+        self.low_water = low_water
+        # Буферы давно не заходивших пользователей вытесняются, а карточки
+        # не живут дольше ttl после последнего пополнения
+        self._buffers = TTLCache(maxsize=max_users, ttl=ttl)
+        self._filling = set()
+        # Поколения: значения счётчика не повторяются, а снимок совпадает
+        # только с записью, из которой взят. drop() и clear() удаляют
+        # записи; вытесненная или просроченная запись тоже не совпадёт,
+        # и пакет будет отброшен, а не принят по ошибке
+        self._counter = itertools.count(1)
+        self._generations = TTLCache(maxsize=max_users, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def pop(self, user_id):
+        """
+        Следующая карточка или None, если буфер пуст
+        """
+        with self._lock:
+            cards = self._buffers.get(user_id)
+            if cards:
+                return cards.popleft()
+        return None
+
+    def generation(self, user_id):
+        """
+        Текущее поколение буфера пользователя
+        """
+        with self._lock:
+            return self._generation(user_id)
+
+    def _generation(self, user_id):
+        generation = self._generations.get(user_id)
+        if generation is None:
+            generation = next(self._counter)
+            self._generations.set(user_id, generation)
+        return generation
+
+    def push(self, user_id, new_cards, generation=None):
+        """
+        Добавляет карточки. С generation пакет отбрасывается, если после
+        снимка поколения буфер сбрасывали. Возвращает False, если отброшен
+        """
+        with self._lock:
+            if (
+                generation is not None
+                and generation != self._generations.get(user_id)
+            ):
+                return False
+            cards = self._buffers.get(user_id)
+            if cards is None:
+                cards = deque(maxlen=self.capacity)
+            cards.extend(new_cards)
+            self._buffers.set(user_id, cards)
+        return True
+
+    def claim_refill(self, user_id):
+        """
+        Поколение буфера, если карточек мало и пополнение поручено
+        вызывающему (по окончании он вызывает release), иначе None
+        """
+        with self._lock:
+            cards = self._buffers.get(user_id)
+            if cards is not None and len(cards) >= self.low_water:
+                return None
+            if user_id in self._filling:
+                return None
+            self._filling.add(user_id)
+            return self._generation(user_id)
+
+    def release(self, user_id):
+        with self._lock:
+            self._filling.discard(user_id)
+
+    def queued_word_ids(self, user_id):
+        """
+        Загаданные слова уже готовых карточек: их не нужно брать
+        из очереди повторений повторно
+        """
+        with self._lock:
+            cards = self._buffers.get(user_id)
+            return [card[0][2] for card in cards] if cards else []
+
+    def drop(self, user_id):
+        """
+        Сбрасывает карточки пользователя (изменился его словарь);
+        идущее пополнение свои карточки уже не добавит
+        """
+        with self._lock:
+            self._generations.pop(user_id)
+            self._buffers.pop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._generations.clear()
+            self._buffers.clear()
+
+    def stats(self):
+        return self._buffers.stats()
@@ -0,0 +1,263 @@
+"""
+SQL-запросы бота. Общие для синхронного (services) и асинхронного
+(async_services) режимов: здесь только построение запросов, выполнение —
+в соответствующем слое.
+"""
+from sqlalchemy import exists, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+
+import scheduler
+from models import (
+    Dictionary, HiddenWord, LearningHistory, User, UserStats, Word,
+)
+
+
+def register_user(tg_id, username):
+    """
+    Insert-if-absent пользователя; RETURNING пуст, если он уже есть
+    """
+    return (
+        insert(User)
+        .values(username=username, tg_id=tg_id)
+        .on_conflict_do_nothing(index_elements=["tg_id"])
+        .returning(User.user_id)
+    )
+
+
+def user_id_by_tg(tg_id):
+    """
+    user_id по Telegram ID
+    """
+    return select(User.user_id).where(User.tg_id == tg_id)
+
+
+def words_by_ids(word_ids):
+    """
+    Тексты слов по списку id
+    """
+    return select(Word.word_id, Word.original, Word.translation).where(
+        Word.word_id.in_(word_ids)
+    )
+
+
+def user_words(user_id):
+    """
+    Слова из словаря пользователя в том же виде, что words_by_ids:
+    id карточки — минус dictionary_id (см. services.card_id)
+    """
+    return select(
+        (-Dictionary.dictionary_id).label("word_id"),
+        Dictionary.added_eng_word.label("original"),
+        Dictionary.added_rus_word.label("translation"),
+    ).where(
+        Dictionary.user_id == user_id,
+        Dictionary.added_eng_word.is_not(None),
+        Dictionary.added_rus_word.is_not(None),
+    )
+
+
+def cards_by_ids(card_ids):
+    """
+    Тексты карточек обоих видов. UNION ALL двух поисков по первичному
+    ключу — только если среди карточек есть слова пользователя
+    """
+    word_ids = [card_id for card_id in card_ids if card_id > 0]
+    dictionary_ids = [-card_id for card_id in card_ids if card_id < 0]
+    if not dictionary_ids:
+        return words_by_ids(word_ids)
+    own = select(
+        (-Dictionary.dictionary_id).label("word_id"),
+        Dictionary.added_eng_word.label("original"),
+        Dictionary.added_rus_word.label("translation"),
+    ).where(Dictionary.dictionary_id.in_(dictionary_ids))
+    if not word_ids:
+        return own
+    return union_all(words_by_ids(word_ids), own)
+
+
+def seen_upsert(counts):
+    """
+    Один upsert, увеличивающий счётчики показов на накопленные значения:
+    counts — {(user_id, word_id): показов}. Сортировка по ключу —
+    единый порядок блокировок строк
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "word_id": word_id,
+            "correct_count": 0,
+            "fail_count": 0,
+            "seen_count": seen,
+        }
+        for (user_id, word_id), seen in sorted(counts.items())
+    ]
+    stmt = insert(LearningHistory).values(rows)
+    return stmt.on_conflict_do_update(
+        constraint="uq_learning_history_user_word",
+        set_={
+            "seen_count": (
+                LearningHistory.seen_count + stmt.excluded.seen_count
+            ),
+        },
+    )
+
+
+def answers_upsert(tallies):
+    """
+    Один upsert пакета ответов: tallies — {(user_id, word_id):
+    scheduler.AnswerTally}. Счётчики увеличиваются атомарно, расписание
+    повторений пересчитывается в SQL (scheduler.next_review)
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "word_id": word_id,
+            "correct_count": tally.correct,
+            "fail_count": tally.fail,
+            "seen_count": 0,
+            **scheduler.initial_review(tally),
+        }
+        for (user_id, word_id), tally in sorted(tallies.items())
+    ]
+    stmt = insert(LearningHistory).values(rows)
+    return stmt.on_conflict_do_update(
+        constraint="uq_learning_history_user_word",
+        set_={
+            "correct_count": (
+                LearningHistory.correct_count + stmt.excluded.correct_count
+            ),
+            "fail_count": (
+                LearningHistory.fail_count + stmt.excluded.fail_count
+            ),
+            **scheduler.next_review(LearningHistory, stmt.excluded),
+        },
+    )
+
+
+def due_words(user_id, limit, exclude=()):
+    """
+    Слова, повторение которых наступило, начиная с самых давних:
+    поиск по индексу ix_learning_history_due. exclude — слова, которые
+    сейчас загадывать не нужно (см. services.fill_cards). Скрытые
+    пользователем слова отсекаются поиском по первичному ключу
+    hidden_words
+    """
+    hidden = exists().where(
+        HiddenWord.user_id == LearningHistory.user_id,
+        HiddenWord.word_id == LearningHistory.word_id,
+    )
+    stmt = (
+        select(LearningHistory.word_id)
+        .where(
+            LearningHistory.user_id == user_id,
+            LearningHistory.due_at <= func.now(),
+            ~hidden,
+        )
+        .order_by(LearningHistory.due_at)
+        .limit(limit)
+    )
+    if exclude:
+        stmt = stmt.where(LearningHistory.word_id.not_in(exclude))
+    return stmt
+
+
+def stats_upsert(totals):
+    """
+    Атомарное увеличение итогов пользователей для /stats:
+    totals — {user_id: (правильных, ошибок)}
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "total_correct": correct,
+            "total_errors": errors,
+        }
+        for user_id, (correct, errors) in sorted(totals.items())
+    ]
+    stmt = insert(UserStats).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "total_correct": (
+                UserStats.total_correct + stmt.excluded.total_correct
+            ),
+            "total_errors": (
+                UserStats.total_errors + stmt.excluded.total_errors
+            ),
+        },
+    )
+
+
+def answer_statements(tallies):
+    """
+    Запись пакета ответов: история повторений для слов общего словаря
+    и итоги пользователей. Ответы на слова из словаря пользователя
+    (id < 0) истории не имеют и идут только в итоги
+    """
+    statements = []
+    history = {key: tally for key, tally in tallies.items() if key[1] > 0}
+    if history:
+        statements.append(answers_upsert(history))
+    totals = {}
+    for (user_id, _), tally in tallies.items():
+        correct, errors = totals.get(user_id, (0, 0))
+        totals[user_id] = (correct + tally.correct, errors + tally.fail)
+    statements.append(stats_upsert(totals))
+    return statements
+
+
+def hide_word(user_id, eng_word):
+    """
+    Скрывает слово общего словаря от пользователя одним INSERT ... SELECT
+    (поиск по ix_words_original_lower). RETURNING — word_id, пусто, если
+    слова нет; повторное скрытие только обновляет hidden_at
+    """
+    found = (
+        select(literal(user_id), Word.word_id)
+        .where(func.lower(Word.original) == eng_word.lower())
+        .limit(1)
+    )
+    stmt = insert(HiddenWord).from_select(["user_id", "word_id"], found)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "word_id"],
+        set_={"hidden_at": func.now()},
+    ).returning(HiddenWord.word_id)
+
+
+def hidden_word_ids(user_id):
+    """
+    Скрытые пользователем слова: префикс первичного ключа hidden_words
+    """
+    return select(HiddenWord.word_id).where(HiddenWord.user_id == user_id)
+
+
+def find_user_word(user_id, eng_word):
+    """
+    Слово из словаря пользователя без учёта регистра
+    """
+    return (
+        select(Dictionary)
+        .where(
+            func.lower(Dictionary.added_eng_word) == eng_word.lower(),
+            Dictionary.user_id == user_id,
+        )
+        .limit(1)
+    )
+
+
+def top_users(limit=3):
+    """
+    Лидеры по количеству правильных ответов: обратный проход
+    индекса ix_user_stats_top, читается только limit строк
+    """
+    return (
+        select(
+            User.username,
+            UserStats.total_correct,
+            UserStats.total_errors,
+        )
+        .join(User, User.user_id == UserStats.user_id)
+        .where(UserStats.total_correct > 0)
+        .order_by(UserStats.total_correct.desc(), UserStats.user_id.desc())
+        .limit(limit)
+    )
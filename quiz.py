@@ -0,0 +1,190 @@
+"""
+Общие для синхронного (handlers) и асинхронного (async_handlers)
+режимов элементы диалога: состояния, кнопки и клавиатуры.
+
+    python quiz.py [число сессий] — память на состояние карточки
+"""
+import json
+import pickle
+import sys
+import tracemalloc
+
+from telebot import types
+from telebot.states import State, StatesGroup
+
+
+class StateWords(StatesGroup):
+    """
+    Состояния для выбора слова
+    """
+
+    choose_word = State()
+    delete_word = State()
+    translate_word = State()
+    add_eng_word = State()
+    add_rus_word = State()
+
+
+class Command:
+    """
+    Названия кнопок
+    """
+
+    ADD_WORD = "Добавить слово ➕"
+    DELETE_WORD = "Удалить слово🔙"
+    NEXT = "Дальше ⏭"
+    TRAIN = "Тренька!"
+
+
+# Вид карточки: reply — текстовые кнопки, inline — кнопки в сообщении
+QUIZ_MODES = ("reply", "inline")
+
+
+def inline_mode(quiz_mode):
+    """
+    True для QUIZ_MODE=inline; неизвестный режим — ошибка конфигурации
+    """
+    if quiz_mode not in QUIZ_MODES:
+        raise ValueError(
+            f"Неизвестный режим карточек: {quiz_mode!r}. "
+            "Доступны: reply, inline"
+        )
+    return quiz_mode == "inline"
+
+
+class CallbackAction:
+    """
+    Действия кнопок inline-карточки (QUIZ_MODE=inline): callback_data —
+    "a:<id загаданного слова>:<id варианта>" или "n". Лимит Telegram —
+    64 байта
+    """
+
+    ANSWER = "a"
+    NEXT = "n"
+
+
+def quiz_markup(options):
+    """
+    Клавиатура карточки: варианты ответа и управляющие кнопки
+    """
+    markup = types.ReplyKeyboardMarkup(row_width=2)
+    buttons = [types.KeyboardButton(text) for text in options]
+    buttons.extend([
+        types.KeyboardButton(Command.NEXT),
+        types.KeyboardButton(Command.ADD_WORD),
+        types.KeyboardButton(Command.DELETE_WORD),
+    ])
+    markup.add(*buttons)
+    return markup
+
+
+def inline_quiz_markup(word_id, option_ids, options):
+    """
+    Inline-клавиатура карточки: в callback_data варианта id загаданного
+    слова и id варианта — ответ проверяется без сравнения текста, а
+    нажатие на старой карточке отличается от нажатия на текущей
+    """
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(*[
+        types.InlineKeyboardButton(
+            text,
+            callback_data=f"{CallbackAction.ANSWER}:{word_id}:{option_id}",
+        )
+        for option_id, text in zip(option_ids, options)
+    ])
+    markup.add(
+        types.InlineKeyboardButton(
+            Command.NEXT, callback_data=CallbackAction.NEXT,
+        )
+    )
+    return markup
+
+
+def callback_answer(data):
+    """
+    (id загаданного слова, id варианта) из callback_data
+    "a:<id>:<id>"; None — данные повреждены
+    """
+    parts = (data or "").split(":")
+    if len(parts) != 3:
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+def start_markup(inline=False):
+    """
+    Клавиатура с кнопкой 'Тренька!'. С inline-карточками в ней же
+    кнопки словаря: в карточке их нет
+    """
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(types.KeyboardButton(Command.TRAIN))
+    if inline:
+        markup.add(
+            types.KeyboardButton(Command.ADD_WORD),
+            types.KeyboardButton(Command.DELETE_WORD),
+        )
+    return markup
+
+
+def benchmark(sessions=100_000):
+    """
+    Память StateMemoryStorage на sessions открытых карточек (вместе
+    с ключом и обёрткой состояния): прежнее состояние — слова и кнопки
+    KeyboardButton — против services.QuizCard с id слов
+    """
+    from services import QuizCard
+
+    words = [(f"word{n}", f"слово {n}") for n in range(1000)]
+
+    def buttons(n):
+        return {
+            "choose_word": words[n % 1000][0],
+            "translate_word": words[n % 1000][1],
+            "word_id": 1000 + n % 1000,
+            "buttons": [
+                types.KeyboardButton(words[(n + k) % 1000][0])
+                for k in range(4)
+            ] + [
+                types.KeyboardButton(text)
+                for text in (
+                    Command.NEXT, Command.ADD_WORD, Command.DELETE_WORD,
+                )
+            ],
+        }
+
+    def card(n):
+        return {
+            "card": QuizCard(
+                1000 + n % 1000,
+                tuple(1000 + (n + k) % 1000 for k in range(4)),
+            ),
+        }
+
+    for name, make in (("кнопки", buttons), ("QuizCard", card)):
+        tracemalloc.start()
+        store = {
+            f"telebot:{n}:{n}": {
+                "state": "StateWords:choose_word", "data": make(n),
+            }
+            for n in range(sessions)
+        }
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        data = store["telebot:0:0"]["data"]
+        try:
+            as_json = f"{len(json.dumps(data))} Б в JSON"
+        except TypeError:
+            as_json = "в JSON не сериализуется"
+        print(
+            f"{name:>8}: {size / sessions:.0f} Б на сессию, "
+            f"{size / 2 ** 20:.1f} МиБ всего; "
+            f"{len(pickle.dumps(data))} Б в pickle, {as_json}"
+        )
+        del store
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
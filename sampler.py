@@ -0,0 +1,282 @@
+"""
+Выборка случайных слов для тренировки.
+
+Стратегии (выбирается через config.WORD_SAMPLER):
+  array  — плотный массив word_id в памяти процесса; выборка k слов
+           за O(k), массив догружается инкрементально (новые id > max).
+  keyset — k поисков по первичному ключу: WHERE word_id >= random
+           ORDER BY word_id LIMIT 1; ничего не держит в памяти.
+  random — прежний ORDER BY random() LIMIT k (полная сортировка таблицы).
+
+Все стратегии возвращают только id; сами слова подгружает вызывающий код.
+
+    python sampler.py [число слов ...] — бенчмарк стратегий
+"""
+import logging
+import random
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from sqlalchemy import func
+
+from config import config
+from models import Word
+
+logger = logging.getLogger(__name__)
+
+
+class WordSampler(ABC):
+    """
+    Базовый класс стратегии выборки слов
+    """
+
+    @abstractmethod
+    def sample(self, session, k):
+        """
+        Возвращает до k различных word_id
+        """
+
+    def count(self, session):
+        """
+        Число слов, из которых идёт выборка
+        """
+        return session.query(func.count(Word.word_id)).scalar()
+
+    def add(self, word_id):
+        """
+        Сообщает о новом слове (по умолчанию ничего не делает)
+        """
+
+    def discard(self, word_id):
+        """
+        Сообщает об удалённом слове (по умолчанию ничего не делает)
+        """
+
+
+class RandomOrderSampler(WordSampler):
+    """
+    Прежняя стратегия: сортировка всей таблицы по random()
+    """
+
+    def sample(self, session, k):
+        rows = (
+            session.query(Word.word_id).order_by(func.random()).limit(k).all()
+        )
+        return [word_id for (word_id,) in rows]
+
+
+class KeysetSampler(WordSampler):
+    """
+    Случайные точки в диапазоне [min(word_id), max(word_id)],
+    каждая разрешается одним поиском по индексу первичного ключа
+    """
+
+    # Сколько лишних попыток даём на совпадения и «дыры» в id
+    MAX_ATTEMPTS_FACTOR = 4
+
+    def count(self, session):
+        # Оценка сверху без полного подсчёта: id почти без пропусков
+        low, high = session.query(
+            func.min(Word.word_id), func.max(Word.word_id),
+        ).one()
+        return 0 if low is None else high - low + 1
+
+    def sample(self, session, k):
+        low, high = session.query(
+            func.min(Word.word_id), func.max(Word.word_id),
+        ).one()
+        if low is None:
+            return []
+
+        ids = []
+        seen = set()
+        for _ in range(k * self.MAX_ATTEMPTS_FACTOR):
+            if len(ids) == k:
+                break
+            point = random.randint(low, high)
+            word_id = (
+                session.query(Word.word_id)
+                .filter(Word.word_id >= point)
+                .order_by(Word.word_id)
+                .limit(1)
+                .scalar()
+            )
+            if word_id is not None and word_id not in seen:
+                seen.add(word_id)
+                ids.append(word_id)
+        return ids
+
+
+class IdArraySampler(WordSampler):
+    """
+    Плотный массив word_id в памяти.
+
+    Удаление — swap-with-last за O(1) через индекс позиций.
+    Раз в refresh_seconds догружаются слова с id больше известного
+    максимума; раз в full_reload_seconds массив перечитывается целиком,
+    чтобы подхватить удаления из других процессов.
+    """
+
+    def __init__(self, refresh_seconds=60, full_reload_seconds=3600):
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._ids = []
+        self._positions = {}
+        self._max_id = 0
+        self._synced_at = None
+        self._reloaded_at = None
+        self._syncing = False
+        self._lock = threading.Lock()
+
+    def _append(self, word_id):
+        if word_id in self._positions:
+            return
+        self._positions[word_id] = len(self._ids)
+        self._ids.append(word_id)
+        self._max_id = max(self._max_id, word_id)
+
+    def _remove(self, word_id):
+        pos = self._positions.pop(word_id, None)
+        if pos is None:
+            return
+        last = self._ids.pop()
+        if last != word_id:
+            self._ids[pos] = last
+            self._positions[last] = pos
+
+    def _sync(self, session):
+        """
+        Догружает id из БД. Блокировка не держится во время запроса:
+        в асинхронном режиме запрос уступает event loop, и другая
+        корутина не должна упереться в занятый threading.Lock
+        """
+        now = time.monotonic()
+        with self._lock:
+            reload = (
+                self._reloaded_at is None
+                or now - self._reloaded_at >= self.full_reload_seconds
+            )
+            if not reload and now - self._synced_at < self.refresh_seconds:
+                return
+            # Пока один поток обновляет массив, остальные берут текущий;
+            # до первой загрузки массив пуст, и грузят все желающие
+            if self._syncing and self._reloaded_at is not None:
+                return
+            self._syncing = True
+            after_id = 0 if reload else self._max_id
+
+        try:
+            rows = (
+                session.query(Word.word_id)
+                .filter(Word.word_id > after_id)
+                .all()
+            )
+        finally:
+            with self._lock:
+                self._syncing = False
+
+        with self._lock:
+            if reload:
+                self._ids = []
+                self._positions = {}
+                self._max_id = 0
+                self._reloaded_at = now
+            for (word_id,) in rows:
+                self._append(word_id)
+            self._synced_at = now
+        if reload:
+            logger.info("Загружено %s id слов для выборки", len(rows))
+
+    def count(self, session):
+        self._sync(session)
+        return len(self._ids)
+
+    def sample(self, session, k):
+        self._sync(session)
+        with self._lock:
+            return random.sample(self._ids, min(k, len(self._ids)))
+
+    def add(self, word_id):
+        with self._lock:
+            self._append(word_id)
+
+    def discard(self, word_id):
+        with self._lock:
+            self._remove(word_id)
+
+
+SAMPLERS = {
+    "array": lambda: IdArraySampler(
+        refresh_seconds=config.WORD_SAMPLER_REFRESH,
+    ),
+    "keyset": KeysetSampler,
+    "random": RandomOrderSampler,
+}
+
+
+def get_sampler(name):
+    """
+    Создаёт стратегию выборки по имени из конфигурации
+    """
+    try:
+        return SAMPLERS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Неизвестная стратегия выборки слов: {name!r}. "
+            f"Доступны: {', '.join(SAMPLERS)}"
+        ) from None
+
+
+word_sampler = get_sampler(config.WORD_SAMPLER)
+
+
+def benchmark(sizes=(100_000, 1_000_000), k=4):
+    """
+    Время выборки k слов каждой стратегией при n словах. Слова — во
+    временной таблице words: в пределах соединения она заслоняет
+    настоящую, данные БД не меняются
+    """
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    from default_db import engine
+
+    for n in sizes:
+        with engine.connect() as conn:
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(
+                text(
+                    "CREATE TEMP TABLE words (word_id serial PRIMARY KEY, "
+                    "original varchar NOT NULL, translation varchar NOT NULL)"
+                )
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO words (original, translation) "
+                    "SELECT 'w' || g, 'т' || g FROM generate_series(1, :n) g"
+                ),
+                {"n": n},
+            )
+            conn.execute(text("ANALYZE words"))
+            session = Session(bind=conn)
+            for name, make in SAMPLERS.items():
+                strategy = make()
+                # прогрев: массив загружается при первой выборке
+                strategy.sample(session, k)
+                repeats = 20 if name == "random" else 500
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    strategy.sample(session, k)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{n:>9} слов, {name:>6}: "
+                    f"{elapsed / repeats * 1000:.3f} мс на выборку"
+                )
+            session.close()
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    benchmark(tuple(int(n) for n in sys.argv[1:]) or (100_000, 1_000_000))
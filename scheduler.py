@@ -0,0 +1,204 @@
+"""
+Интервальное повторение слов (упрощённый SM-2).
+
+Для каждой пары user+word learning_history хранит коэффициент лёгкости
+ease_factor, текущий интервал interval_days, число правильных ответов
+подряд streak и due_at — момент следующего повторения. Правильный ответ
+отодвигает повторение на 1 день, затем на 6, затем на interval * ease;
+ошибка сбрасывает серию и возвращает слово через RELEARN_DELAY.
+
+Очередь повторений пользователя — индекс (user_id, due_at): следующее
+слово выбирается одним поиском по индексу (queries.due_words).
+Значения вычисляются в SQL внутри upsert пакета ответов, поэтому
+одновременные записи не перезаписывают расписание друг друга.
+
+    python scheduler.py [строк истории] — выбор слов к повторению
+"""
+import random
+import sys
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+from sqlalchemy import case, func
+
+# Начальный коэффициент лёгкости и его нижняя граница (SM-2)
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Оценка ответа по шкале SM-2 (0..5): кнопка либо верная, либо нет
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+# Интервалы после первого и второго правильного ответа подряд, дни
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+# Через сколько показать слово снова после ошибки
+RELEARN_DELAY = timedelta(minutes=10)
+
+DAY = timedelta(days=1)
+
+
+def ease_delta(quality):
+    """
+    Изменение ease_factor по формуле SM-2
+    """
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+
+class AnswerTally(NamedTuple):
+    """
+    Свёртка ответов на одно слово из пакета журнала (см. event_log)
+    """
+
+    correct: int
+    fail: int
+    last_correct: bool
+
+    @classmethod
+    def of(cls, is_correct):
+        return cls(int(is_correct), int(not is_correct), is_correct)
+
+    def merge(self, later):
+        """
+        Схлопывает с более поздними ответами на то же слово
+        """
+        return AnswerTally(
+            self.correct + later.correct,
+            self.fail + later.fail,
+            later.last_correct,
+        )
+
+
+def initial_review(tally):
+    """
+    Расписание для первых ответов на слово (ветка INSERT).
+    streak — серия в пределах пакета: 1, если последний ответ верный;
+    next_review читает её из excluded
+    """
+    ease = DEFAULT_EASE + tally.fail * ease_delta(QUALITY_WRONG)
+    if tally.last_correct:
+        return {
+            "ease_factor": max(
+                MIN_EASE, ease + ease_delta(QUALITY_CORRECT),
+            ),
+            "interval_days": FIRST_INTERVAL,
+            "streak": 1,
+            "due_at": func.now() + FIRST_INTERVAL * DAY,
+        }
+    return {
+        "ease_factor": max(MIN_EASE, ease),
+        "interval_days": 0,
+        "streak": 0,
+        "due_at": func.now() + RELEARN_DELAY,
+    }
+
+
+def next_review(table, excluded):
+    """
+    Выражения ON CONFLICT DO UPDATE: новое расписание из текущей строки
+    и пакета ответов в excluded. Пакет ответов на одно слово считается
+    одним повторением; каждая ошибка в нём снижает ease_factor;
+    если пакет закончился ошибкой — слово вернётся через RELEARN_DELAY,
+    если верным ответом после ошибок — серия начнётся заново
+    """
+    ends_correct = excluded.streak > 0
+    lapsed = excluded.fail_count > 0
+    interval = case(
+        (~ends_correct, 0),
+        (lapsed, FIRST_INTERVAL),
+        (table.streak == 0, FIRST_INTERVAL),
+        (table.streak == 1, SECOND_INTERVAL),
+        else_=table.interval_days * table.ease_factor,
+    )
+    return {
+        "ease_factor": func.greatest(
+            MIN_EASE,
+            table.ease_factor
+            + excluded.fail_count * ease_delta(QUALITY_WRONG)
+            + case((ends_correct, ease_delta(QUALITY_CORRECT)), else_=0),
+        ),
+        "interval_days": interval,
+        "streak": case(
+            (~ends_correct, 0),
+            (lapsed, 1),
+            else_=table.streak + 1,
+        ),
+        "due_at": case(
+            (~ends_correct, func.now() + RELEARN_DELAY),
+            else_=func.now() + interval * DAY,
+        ),
+    }
+
+
+def benchmark(rows=1_000_000, users=20_000, repeats=200):
+    """
+    Время queries.due_words на пользователя при rows строках истории:
+    поиск по ix_learning_history_due против того же запроса
+    с выключенными индексами. История и скрытые слова — во временных
+    таблицах: в пределах соединения они заслоняют настоящие
+    """
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    import queries
+    from config import config
+    from default_db import engine
+
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        conn.execute(
+            text(
+                "CREATE TEMP TABLE learning_history ("
+                "learning_history_id serial PRIMARY KEY, "
+                "user_id integer NOT NULL, word_id integer NOT NULL, "
+                "due_at timestamptz)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX ix_learning_history_due "
+                "ON learning_history (user_id, due_at)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TEMP TABLE hidden_words (user_id integer, "
+                "word_id integer, PRIMARY KEY (user_id, word_id))"
+            )
+        )
+        # половина слов уже ждёт повторения, половина — в будущем
+        conn.execute(
+            text(
+                "INSERT INTO learning_history (user_id, word_id, due_at) "
+                "SELECT g % :users, g, "
+                "now() + (random() - 0.5) * interval '30 days' "
+                "FROM generate_series(1, :rows) g"
+            ),
+            {"rows": rows, "users": users},
+        )
+        conn.execute(text("ANALYZE learning_history"))
+        session = Session(bind=conn)
+        for name, settings in (
+            ("индекс", ()),
+            ("без индекса", ("enable_indexscan", "enable_bitmapscan")),
+        ):
+            for setting in settings:
+                conn.execute(text(f"SET LOCAL {setting} = off"))
+            count = repeats if not settings else max(repeats // 10, 1)
+            started = time.perf_counter()
+            for _ in range(count):
+                session.execute(
+                    queries.due_words(
+                        random.randrange(users), config.CARD_BATCH,
+                    )
+                ).all()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:>11}: {elapsed / count * 1000:.2f} мс "
+                f"на пользователя ({rows} строк истории)"
+            )
+        session.close()
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,188 @@
+"""
+Массовая загрузка слов в общий словарь (words).
+
+Пары (original, translation) читаются потоком из CSV, TSV или JSONL,
+original проверяется validators, перевод — только на пустоту и длину
+колонки, повторы (без учёта регистра) отбрасываются в памяти. В БД пары уходят пакетами: COPY во временную таблицу и один
+INSERT ... SELECT только тех слов, которых ещё нет в words (поиск по
+индексу ix_words_original_lower). Каждый пакет — своя транзакция,
+поэтому прерванную загрузку можно просто запустить заново.
+
+    python seeding.py words.csv [ещё файлы ...]
+
+CSV/TSV: две колонки original, translation (строка заголовка
+original,translation необязательна). JSONL: по объекту на строку
+с ключами original и translation.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from validators import MAX_WORD_LENGTH, validate_english_word
+
+CHUNK_SIZE = 5000
+
+STAGING = "seed_words"
+CREATE_STAGING = (
+    f"CREATE TEMP TABLE IF NOT EXISTS {STAGING} "
+    "(original text, translation text) ON COMMIT DELETE ROWS"
+)
+COPY_SQL = f"COPY {STAGING} (original, translation) FROM STDIN"
+INSERT_NEW = f"""
+    INSERT INTO words (original, translation)
+    SELECT s.original, s.translation
+    FROM {STAGING} AS s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM words AS w
+        WHERE lower(w.original) = lower(s.original)
+    )
+"""
+
+# Экранирование для текстового формата COPY
+COPY_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def read_pairs(path):
+    """
+    Пары (original, translation) из файла; формат — по расширению
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with path.open(encoding="utf-8", newline="") as f:
+        if suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.get("original"), item.get("translation")
+            return
+        if suffix not in (".csv", ".tsv"):
+            raise ValueError(f"Неизвестный формат файла: {path}")
+        delimiter = "\t" if suffix == ".tsv" else ","
+        for number, row in enumerate(csv.reader(f, delimiter=delimiter)):
+            if len(row) < 2:
+                continue
+            if number == 0 and row[0].strip().lower() == "original":
+                continue
+            yield row[0], row[1]
+
+
+class SeedStats:
+    """
+    Счётчики загрузки для отчёта о ходе
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.inserted = 0
+        self.started = time.perf_counter()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"прочитано {self.read}, добавлено {self.inserted}, "
+            f"повторов {self.duplicates}, некорректных {self.invalid} "
+            f"({self.rate():.0f} строк/с)"
+        )
+
+
+def valid_translation(translation):
+    """
+    Перевод в словаре может содержать латиницу (термины вроде API),
+    поэтому проверяются только пустота и длина колонки
+    """
+    return 0 < len(translation) <= MAX_WORD_LENGTH
+
+
+def clean_pairs(pairs, stats):
+    """
+    Отбрасывает некорректные пары и повторы original без учёта регистра
+    """
+    seen = set()
+    for original, translation in pairs:
+        stats.read += 1
+        original = (original or "").strip()
+        translation = (translation or "").strip()
+        if not (
+            validate_english_word(original)[0]
+            and valid_translation(translation)
+        ):
+            stats.invalid += 1
+            continue
+        key = original.lower()
+        if key in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(key)
+        yield original, translation
+
+
+def chunks(pairs, size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def copy_chunk(conn, chunk):
+    buffer = io.StringIO()
+    for original, translation in chunk:
+        buffer.write(
+            f"{original.translate(COPY_ESCAPES)}\t"
+            f"{translation.translate(COPY_ESCAPES)}\n"
+        )
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(COPY_SQL, buffer)
+    finally:
+        cursor.close()
+
+
+def load_pairs(engine, pairs, chunk_size=CHUNK_SIZE, progress=print):
+    """
+    Загружает пары в words пакетами по chunk_size. Слова, которые уже
+    есть в словаре, пропускаются (они считаются в повторах).
+    progress(stats) вызывается после каждого пакета
+    """
+    stats = SeedStats()
+    with engine.connect() as conn:
+        conn.execute(text(CREATE_STAGING))
+        conn.commit()
+        for chunk in chunks(clean_pairs(pairs, stats), chunk_size):
+            with conn.begin():
+                copy_chunk(conn, chunk)
+                inserted = conn.execute(text(INSERT_NEW)).rowcount
+            stats.inserted += inserted
+            stats.duplicates += len(chunk) - inserted
+            if progress is not None:
+                progress(stats)
+    return stats
+
+
+if __name__ == "__main__":
+    from default_db import engine
+
+    if len(sys.argv) < 2:
+        sys.exit("Использование: python seeding.py файл [файл ...]")
+    for name in sys.argv[1:]:
+        print(f"📥 {name}")
+        total = load_pairs(
+            engine, read_pairs(name), progress=lambda s: print(f"  {s}"),
+        )
+        print(f"✅ {name}: {total}")
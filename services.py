@@ -1,126 +1,557 @@
+"""
+Работа с БД для обработчиков бота: пользователи, карточки, ответы.
+
+    python services.py [число карточек] — запросы к БД на карточку
+"""
 import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 
+import event_log
+import queries
+from batching import WriteBehindBuffer
+from cache import TTLCache
+from config import config
 from default_db import Session
-from models import Word, User, LearningHistory
-from sqlalchemy import func
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from models import User, Dictionary
+from prefetch import CardBuffer
+from sampler import word_sampler
+from sqlalchemy import event
+from sqlalchemy.exc import (
+    DataError, IntegrityError, ProgrammingError, SQLAlchemyError,
+)
 
 logger = logging.getLogger(__name__)
 
+# tg_id -> user_id: один SELECT users на пользователя вместо одного
+# на каждый обработчик. Счётчики попаданий — user_ids.stats()
+user_ids = TTLCache(
+    maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL,
+)
+
+# word_id -> (original, translation): состояние викторины хранит только
+# id, тексты для клавиатуры и проверки ответа берутся отсюда
+word_texts = TTLCache(
+    maxsize=config.WORD_CACHE_SIZE, ttl=config.WORD_CACHE_TTL,
+)
+
+# user_id -> id карточек из словаря пользователя (Dictionary).
+# Сбрасывается при добавлении и удалении слова пользователем
+user_cards = TTLCache(
+    maxsize=config.USER_CACHE_SIZE, ttl=config.WORD_CACHE_TTL,
+)
+
+# user_id -> frozenset скрытых пользователем слов (HiddenWord): выборка
+# карточек отбрасывает их проверкой «in» без обращения к БД
+hidden_words = TTLCache(
+    maxsize=config.USER_CACHE_SIZE, ttl=config.WORD_CACHE_TTL,
+)
+# Кэши, попадания и промахи которых отдаются в /metrics
+CACHES = {
+    "user_ids": user_ids,
+    "word_texts": word_texts,
+    "user_cards": user_cards,
+    "hidden_words": hidden_words,
+}
+# Сколько раз добирать выборку, если в неё попали скрытые слова
+HIDDEN_SAMPLE_ATTEMPTS = 4
+
+# Готовые карточки пользователей и пул потоков, который их пополняет
+card_buffer = CardBuffer(
+    capacity=config.CARD_BUFFER_SIZE,
+    low_water=config.CARD_BUFFER_LOW,
+    max_users=config.USER_CACHE_SIZE,
+    ttl=config.CARD_BUFFER_TTL,
+)
+prefetch_pool = ThreadPoolExecutor(
+    max_workers=config.PREFETCH_WORKERS, thread_name_prefix="prefetch",
+)
+
+# Готовый текст /stats: при частых запросах рейтинг читается из БД
+# не чаще раза в LEADERBOARD_CACHE_TTL секунд
+leaderboard = TTLCache(maxsize=1, ttl=config.LEADERBOARD_CACHE_TTL)
+LEADERBOARD_KEY = "top"
+
+
+class QuizCard(NamedTuple):
+    """
+    Состояние карточки викторины: id загаданного слова и id вариантов
+    в порядке кнопок. В хранилище попадает как [word_id, [id, ...]]
+    """
+
+    word_id: int
+    option_ids: tuple
+
+    @classmethod
+    def from_state(cls, value):
+        """
+        Восстанавливает карточку из данных состояния (tuple или list)
+        """
+        if not value:
+            return None
+        word_id, option_ids = value
+        return cls(word_id, tuple(option_ids))
+
+
+def make_card(pairs):
+    """
+    Собирает карточку из пар (original, translation, word_id), первая
+    пара — загаданное слово. Возвращает QuizCard, подписи вариантов
+    в порядке кнопок и русское слово для вопроса
+    """
+    # Первая пара — загаданное слово (его выбрал create_words)
+    original, translation, word_id = pairs[0]
+
+    # Варианты ответов: правильный перевод и остальные слова
+    option_ids = [word_id] + [
+        row[2] for row in pairs if row[0] != original
+    ]
+    random.shuffle(option_ids)
+    texts = {row[2]: row[0] for row in pairs}
+    options = [texts[option_id] for option_id in option_ids]
+    return QuizCard(word_id, tuple(option_ids)), options, translation
+
+
+def username_for(from_user):
+    """
+    Имя пользователя на основе доступных данных
+    """
+    return (
+        from_user.username
+        or from_user.first_name
+        or f"user_{from_user.id}"
+    )
+
+
+def remember_words(rows):
+    """
+    Кладёт тексты слов (word_id, original, translation) в word_texts
+    """
+    for word_id, original, translation in rows:
+        word_texts.set(word_id, (original, translation))
+
+
+def card_id(dictionary_id):
+    """
+    Id карточки для слова из Dictionary: отрицательный, чтобы не
+    пересекаться с word_id общего словаря
+    """
+    return -dictionary_id
+
+
+def user_card_ids(session, user_id):
+    """
+    Id карточек из словаря пользователя: из кэша user_cards или одним
+    SELECT по индексу dictionaries.user_id. Тексты кладутся в word_texts
+    """
+    ids = user_cards.get(user_id)
+    if ids is None:
+        rows = session.execute(queries.user_words(user_id)).all()
+        remember_words(rows)
+        ids = tuple(row.word_id for row in rows)
+        user_cards.set(user_id, ids)
+    return ids
+
+
+def user_hidden_ids(session, user_id):
+    """
+    Скрытые пользователем слова: из кэша hidden_words или одним SELECT
+    по первичному ключу hidden_words
+    """
+    ids = hidden_words.get(user_id)
+    if ids is None:
+        ids = frozenset(
+            session.execute(queries.hidden_word_ids(user_id)).scalars()
+        )
+        hidden_words.set(user_id, ids)
+    return ids
+
+
+def remember_hidden(user_id, word_id):
+    """
+    Добавляет только что скрытое слово в кэш hidden_words (если набор
+    пользователя уже загружен) и сбрасывает его готовые карточки
+    """
+    ids = hidden_words.get(user_id)
+    if ids is not None:
+        hidden_words.set(user_id, ids | {word_id})
+    card_buffer.drop(user_id)
+
+
+def sample_visible(session, k, hidden):
+    """
+    До k различных слов общего словаря без скрытых: скрытые
+    отбрасываются, недостающие добираются новой выборкой
+    """
+    ids = word_sampler.sample(session, k)
+    if not hidden:
+        return ids
+    picked = []
+    for _ in range(HIDDEN_SAMPLE_ATTEMPTS):
+        for word_id in ids:
+            if word_id not in hidden and word_id not in picked:
+                picked.append(word_id)
+        if len(picked) >= k:
+            break
+        ids = word_sampler.sample(session, k)
+    return picked[:k]
+
+
+def split_draws(k, global_count, own_count):
+    """
+    Сколько из k различных карточек, выбранных равновероятно из
+    объединения двух словарей, придётся на словарь пользователя
+    """
+    picked = 0
+    for _ in range(k):
+        total = global_count + own_count
+        if total <= 0:
+            break
+        if random.randrange(total) < own_count:
+            own_count -= 1
+            picked += 1
+        else:
+            global_count -= 1
+    return picked
+
+
+def sample_card_ids(session, user_id, k):
+    """
+    k случайных карточек из общего словаря и словаря пользователя.
+    Объединение не строится ни в БД, ни в памяти: сначала решается,
+    сколько карточек взять из каждого источника, затем каждый
+    выбирается своим дешёвым способом
+    """
+    own = user_card_ids(session, user_id)
+    hidden = user_hidden_ids(session, user_id)
+    visible = max(word_sampler.count(session) - len(hidden), 0)
+    from_own = split_draws(k, visible, len(own))
+    ids = sample_visible(session, k - from_own, hidden)
+    ids += random.sample(own, from_own)
+    random.shuffle(ids)
+    return ids
+
+
+def forget_missing(user_id, card_ids, found):
+    """
+    Забывает карточки, которых уже нет в БД (удалены другим процессом)
+    """
+    for missing in set(card_ids) - set(found):
+        if missing > 0:
+            word_sampler.discard(missing)
+        else:
+            user_cards.pop(user_id)
+
+
+@event.listens_for(User, "after_delete")
+def _forget_deleted_user(mapper, connection, target):
+    """
+    Инвалидирует кэш при удалении пользователя через ORM
+    """
+    user_ids.pop(target.tg_id)
+
+
+def get_user_id(tg_id):
+    """
+    Возвращает user_id по Telegram ID: из кэша или одним SELECT.
+    None — пользователь не зарегистрирован
+    """
+    user_id = user_ids.get(tg_id)
+    if user_id is not None:
+        return user_id
+
+    try:
+        with Session() as session:
+            user_id = session.execute(
+                queries.user_id_by_tg(tg_id)
+            ).scalar()
+    except SQLAlchemyError as e:
+        logger.exception("Ошибка БД в get_user_id (tg_id=%s): %s", tg_id, e)
+        return None
+
+    if user_id is not None:
+        user_ids.set(tg_id, user_id)
+    return user_id
+
 
 def new_user(message):
     """
-    Запись нового пользователя в базу данных или проверка существующего
+    Регистрирует пользователя при первом обращении (insert-if-absent).
+    Возвращает user_id; известные процессу пользователи берутся из кэша
+    user_ids без обращения к таблице users
     """
+    tg_id = message.from_user.id
+    user_id = user_ids.get(tg_id)
+    if user_id is not None:
+        return user_id
+
+    stmt = queries.register_user(tg_id, username_for(message.from_user))
     try:
         with Session() as session:
-            tg_id = message.from_user.id
-            user = session.query(User).filter_by(tg_id=tg_id).first()
-            username = None
-
-            if user is None:
-                # Создаем имя пользователя на основе доступных данных
-                username = (
-                    message.from_user.username
-                    or message.from_user.first_name
-                    or f"user_{tg_id}"
-                )
-                user = User(username=username, tg_id=tg_id)
-                session.add(user)
-                try:
-                    session.commit()
-                except IntegrityError as e:
-                    session.rollback()
-                    logger.warning(
-                        "Ошибка целостности при создании пользователя "
-                        "tg_id=%s: %s",
-                        tg_id, e,
-                    )
-                    return None
-                except SQLAlchemyError as e:
-                    session.rollback()
-                    logger.exception(
-                        "Ошибка БД при создании пользователя tg_id=%s: %s",
-                        tg_id, e,
-                    )
-                    return None
-
-            return user
+            user_id = session.execute(stmt).scalar()
+            if user_id is None:
+                # Пользователь уже зарегистрирован
+                user_id = session.execute(
+                    queries.user_id_by_tg(tg_id)
+                ).scalar()
+            session.commit()
     except SQLAlchemyError as e:
         logger.exception(
-            "Ошибка БД в new_user (tg_id=%s): %s",
-            message.from_user.id, e,
+            "Ошибка БД в new_user (tg_id=%s): %s", tg_id, e,
         )
         return None
     except Exception as e:
         logger.exception("Неожиданная ошибка в new_user: %s", e)
         return None
 
+    user_ids.set(tg_id, user_id)
+    return user_id
+
+
+def pick_word_ids(due_id, sampled):
+    """
+    Слова карточки: слово из очереди повторений (если есть) первым,
+    остальные — случайные варианты ответа
+    """
+    if due_id is None:
+        return sampled
+    return [due_id] + [word_id for word_id in sampled if word_id != due_id]
+
+
+def order_pairs(word_ids, rows):
+    """
+    Пары (original, translation, word_id) в порядке word_ids
+    """
+    by_id = {row.word_id: row for row in rows}
+    return [
+        (by_id[word_id].original, by_id[word_id].translation, word_id)
+        for word_id in word_ids
+        if word_id in by_id
+    ]
+
 
-def create_words(message):
+def build_cards(session, user_id, n, exclude=()):
     """
-    Создает набор слов для тренировки и обновляет статистику пользователя
+    Готовит до n карточек. Слова из очереди повторений (scheduler)
+    загадываются по одному на карточку, остальные карточки — случайные;
+    варианты ответа берутся из общего словаря и словаря пользователя
+    (sample_card_ids). Тексты всех карточек читаются одним запросом.
+    Работает и внутри AsyncSession.run_sync
     """
+    due_ids = session.execute(
+        queries.due_words(user_id, n, exclude)
+    ).scalars().all()
+    card_ids = []
+    for idx in range(n):
+        due_id = due_ids[idx] if idx < len(due_ids) else None
+        ids = pick_word_ids(due_id, sample_card_ids(session, user_id, 4))
+        if ids:
+            card_ids.append(ids[:4])
+    wanted = {word_id for ids in card_ids for word_id in ids}
+    if not wanted:
+        return []
+
+    rows = session.execute(queries.cards_by_ids(wanted)).all()
+    # Слово могли удалить в другом процессе — забываем его id
+    forget_missing(user_id, wanted, {row.word_id for row in rows})
+    remember_words(rows)
+    cards = [order_pairs(ids, rows) for ids in card_ids]
+    return [pairs for pairs in cards if pairs]
+
+
+def unsaved_answer_ids(buffer, user_id):
+    """
+    Слова с ответами пользователя, ещё не записанными из buffer:
+    due_words видит у них прежний due_at
+    """
+    return [
+        word_id for key_user, word_id in buffer.pending_keys()
+        if key_user == user_id
+    ]
+
+
+def fill_cards(user_id, n, exclude=()):
+    """
+    Пакет из n новых карточек пользователя ([] при ошибке БД). Не
+    загадываются цели готовых карточек, слова exclude (карточка на
+    экране) и слова с ещё не записанными ответами
+    """
+    exclude = [
+        *card_buffer.queued_word_ids(user_id),
+        *exclude,
+        *unsaved_answer_ids(answer_buffer, user_id),
+    ]
     try:
         with Session() as session:
-            user = (
-                session.query(User)
-                .filter_by(tg_id=message.from_user.id)
-                .first()
-            )
-            if not user:
-                print(f"Юзер {message.from_user.username} вне игры!")
-                return []
-
-            # Получаем 4 случайных слова из базы данных
-            word_pairs = (
-                session.query(Word).order_by(func.random()).limit(4).all()
-            )
-            if not word_pairs:
-                return []
-
-            # Формируем список пар слов
-            pairs = [
-                (w.original, w.translation, w.word_id) for w in word_pairs
-            ]
-
-            # Обновляем счётчик показов в LearningHistory
-            # для каждого показанного слова
-            for _, _, word_id in pairs:
-                if not word_id:
-                    continue
-                word = session.query(Word).filter_by(word_id=word_id).first()
-                if not word:
-                    continue
-
-                history = (
-                    session.query(LearningHistory)
-                    .filter_by(user_id=user.user_id, word_id=word_id)
-                    .first()
-                )
-                if history:
-                    history.seen_count += 1
-                else:
-                    session.add(
-                        LearningHistory(
-                            user_id=user.user_id,
-                            word_id=word_id,
-                            correct_count=0,
-                            fail_count=0,
-                            seen_count=1,
-                        )
-                    )
-            session.commit()
-        return pairs
+            return build_cards(session, user_id, n, exclude)
     except SQLAlchemyError as e:
         logger.exception(
-            "Ошибка БД в create_words (tg_id=%s): %s",
-            message.from_user.id, e,
+            "Ошибка БД в fill_cards (user_id=%s): %s", user_id, e,
         )
-        return []
     except Exception as e:
-        logger.exception("Неожиданная ошибка в create_words: %s", e)
-        return []
+        logger.exception("Неожиданная ошибка в fill_cards: %s", e)
+    return []
+
+
+def refill_cards(user_id, generation, exclude=()):
+    """
+    Фоновое пополнение буфера карточек. Если за это время словарь
+    пользователя изменился (card_buffer.drop), пакет отбрасывается
+    """
+    try:
+        card_buffer.push(
+            user_id, fill_cards(user_id, config.CARD_BATCH, exclude),
+            generation,
+        )
+    finally:
+        card_buffer.release(user_id)
+
+
+def record_seen(user_id, pairs):
+    """
+    Учитывает показ слов карточки; в БД счётчики уходят пакетом
+    """
+    for _, _, word_id in pairs:
+        # история ведётся только для слов общего словаря
+        if word_id > 0:
+            seen_counter.add((user_id, word_id))
+
+
+def create_words(user_id):
+    """
+    Возвращает карточку для тренировки: [(original, translation,
+    word_id), ...], загаданное слово первым. Карточка берётся из буфера
+    готовых, и только при пустом буфере готовится пакет синхронно.
+    Пополнение буфера и запись показов идут в фоне
+    """
+    pairs = card_buffer.pop(user_id)
+    if pairs is None:
+        generation = card_buffer.generation(user_id)
+        cards = fill_cards(user_id, config.CARD_BATCH)
+        if not cards:
+            return []
+        pairs = cards[0]
+        card_buffer.push(user_id, cards[1:], generation)
+    generation = card_buffer.claim_refill(user_id)
+    if generation is not None:
+        # Загаданное слово этой карточки ещё в очереди повторений
+        prefetch_pool.submit(
+            refill_cards, user_id, generation, (pairs[0][2],),
+        )
+    record_seen(user_id, pairs)
+    return pairs
+
+
+def write_batch(items, write):
+    """
+    Записывает пакет буфера одной транзакцией: write(session, items).
+    Если слово или пользователя успели удалить, пакет записывается
+    построчно в savepoint'ах без них
+    """
+    with Session() as session:
+        try:
+            write(session, items)
+            session.commit()
+            return
+        except IntegrityError:
+            session.rollback()
+
+        for key, value in items.items():
+            try:
+                with session.begin_nested():
+                    write(session, {key: value})
+            except IntegrityError:
+                logger.warning("Запись удалённого слова пропущена: %s", key)
+        session.commit()
+
+
+def permanent_write_error(error):
+    """
+    Ошибка записи пакета, которую повтор не исправит: данные (SQLSTATE
+    класса 22) или сам запрос (42). COPY идёт мимо SQLAlchemy, поэтому
+    проверяется и код исключения драйвера
+    """
+    if isinstance(error, (DataError, ProgrammingError)):
+        return True
+    error = getattr(error, "orig", error)
+    code = getattr(error, "pgcode", None) or getattr(error, "sqlstate", None)
+    return bool(code) and code[:2] in ("22", "42")
+
+
+def write_seen(session, counts):
+    session.execute(queries.seen_upsert(counts))
+
+
+def write_answers(session, events):
+    """
+    Пакет ответов: строки журнала answer_events (COPY) и свёртка
+    пакета в счётчики learning_history и user_stats
+    """
+    event_log.copy_events(session, events)
+    for stmt in queries.answer_statements(event_log.tallies(events)):
+        session.execute(stmt)
+
+
+def flush_seen(counts):
+    write_batch(counts, write_seen)
+
+
+def flush_answers(events):
+    write_batch(events, write_answers)
+
+
+# (user_id, word_id) -> показы, ещё не записанные в learning_history
+seen_counter = WriteBehindBuffer(
+    flush_seen,
+    interval=config.SEEN_FLUSH_INTERVAL,
+    max_events=config.SEEN_FLUSH_MAX,
+    max_retries=config.FLUSH_MAX_RETRIES,
+    permanent=permanent_write_error,
+)
+
+# (user_id, word_id) -> [(answered_at, is_correct)]: ответы, ещё не
+# записанные в БД (merge по умолчанию склеивает списки)
+answer_buffer = WriteBehindBuffer(
+    flush_answers,
+    interval=config.ANSWER_FLUSH_INTERVAL,
+    max_events=config.ANSWER_FLUSH_MAX,
+    max_retries=config.FLUSH_MAX_RETRIES,
+    permanent=permanent_write_error,
+)
+
+
+def get_words(word_ids):
+    """
+    Возвращает {word_id: (original, translation)} для карточек обоих
+    видов: из кэша word_texts, недостающие — одним SELECT.
+    Удалённых слов в ответе нет
+    """
+    words = {}
+    missing = []
+    for word_id in word_ids:
+        cached = word_texts.get(word_id)
+        if cached is None:
+            missing.append(word_id)
+        else:
+            words[word_id] = cached
+    if not missing:
+        return words
+
+    try:
+        with Session() as session:
+            rows = session.execute(queries.cards_by_ids(missing)).all()
+    except SQLAlchemyError as e:
+        logger.exception("Ошибка БД в get_words (word_ids=%s): %s", missing, e)
+        return words
+
+    remember_words(rows)
+    for word_id, original, translation in rows:
+        words[word_id] = (original, translation)
+    return words
 
 
 def show_target(data):
@@ -139,61 +570,173 @@ def show_hint(*lines):
 
 def update_learning_history(user_id, word_id, is_correct):
     """
-    Обновляет историю изучения слов пользователя
+    Учитывает ответ в журнале, истории изучения и итогах пользователя.
+    Ответы копятся в answer_buffer и пишутся пакетом раз в
+    ANSWER_FLUSH_INTERVAL секунд: COPY в answer_events и один
+    INSERT ... ON CONFLICT на всех пользователей, счётчики
+    увеличиваются атомарно в БД
     """
     # Если ID слова не указан, прекращаем выполнение
     if not word_id:
         return
+    answer_buffer.add((user_id, word_id), event_log.answer_event(is_correct))
 
-    try:
-        with Session() as session:
-            # Получаем пользователя по Telegram ID
-            user = session.query(User).filter_by(tg_id=user_id).first()
-            if not user:
-                return
-
-            # Получаем слово по ID
-            word = session.query(Word).filter_by(word_id=word_id).first()
-            if not word:
-                return
-
-            # Проверяем существование записи в истории изучения
-            history = (
-                session.query(LearningHistory)
-                .filter_by(user_id=user.user_id, word_id=word_id)
-                .first()
-            )
 
-            # Обновляем или создаем запись в истории изучения
-            if history:
-                # Обновляем существующую запись
-                if is_correct:
-                    history.correct_count += 1
-                else:
-                    history.fail_count += 1
-            else:
-                # Создаем новую запись
-                if is_correct:
-                    history = LearningHistory(
-                        user_id=user.user_id,
-                        word_id=word_id,
-                        correct_count=1,
-                        fail_count=0,
-                    )
-                else:
-                    history = LearningHistory(
-                        user_id=user.user_id,
-                        word_id=word_id,
-                        correct_count=0,
-                        fail_count=1,
-                    )
-                session.add(history)
+def remove_word(user_id, eng_word):
+    """
+    Убирает слово у пользователя: слово общего словаря скрывается
+    (одна вставка в hidden_words, у других пользователей оно остаётся),
+    добавленное пользователем удаляется из Dictionary. Возвращает True,
+    если слово найдено. Ошибки БД пробрасываются обработчику
+    """
+    with Session() as session:
+        # Сначала ищем в таблице Word (без учёта регистра)
+        word_id = session.execute(
+            queries.hide_word(user_id, eng_word)
+        ).scalar()
+        if word_id is not None:
+            session.commit()
+            remember_hidden(user_id, word_id)
+            return True
 
+        # Если не в Word — ищем в словаре пользователя
+        dict_row = session.scalars(
+            queries.find_user_word(user_id, eng_word)
+        ).first()
+        if dict_row:
+            session.delete(dict_row)
             session.commit()
-    except SQLAlchemyError as e:
-        logger.exception(
-            "Ошибка БД в update_learning_history (user_id=%s, word_id=%s): %s",
-            user_id, word_id, e,
+            user_cards.pop(user_id)
+            card_buffer.drop(user_id)
+            word_texts.pop(card_id(dict_row.dictionary_id))
+            return True
+
+    return False
+
+
+def add_user_word(user_id, eng_word, rus_word):
+    """
+    Добавляет слово в словарь пользователя.
+    Ошибки БД пробрасываются обработчику
+    """
+    with Session() as session:
+        session.add(
+            Dictionary(
+                user_id=user_id,
+                added_eng_word=eng_word,
+                added_rus_word=rus_word,
+            )
         )
-    except Exception as e:
-        logger.exception("Неожиданная ошибка в update_learning_history: %s", e)
+        session.commit()
+    # Новое слово попадёт в тренировку со следующего пакета карточек
+    user_cards.pop(user_id)
+    card_buffer.drop(user_id)
+
+
+def top_users():
+    """
+    Топ-3 пользователей: [(username, total_correct, total_errors)].
+    Ошибки БД пробрасываются обработчику
+    """
+    with Session() as session:
+        return session.execute(queries.top_users(3)).all()
+
+
+def leaderboard_text():
+    """
+    Текст /stats из кэша или по свежему top-3. None — рейтинг пуст.
+    Ошибки БД пробрасываются обработчику
+    """
+    text = leaderboard.get(LEADERBOARD_KEY)
+    if text is None:
+        stats = top_users()
+        text = format_leaderboard(stats) if stats else ""
+        leaderboard.set(LEADERBOARD_KEY, text)
+    return text or None
+
+
+def format_leaderboard(stats):
+    """
+    Текст сообщения со статистикой лидеров
+    """
+    message_text = "ЛИДЕРЫ:\n\n"
+    medals = ["🥇", "🥈", "🥉"]
+
+    for idx, (username, total_correct, total_errors) in enumerate(
+        stats, 1,
+    ):
+        medal = medals[idx - 1]
+        message_text += (
+            f"{medal} {username}\n"
+            f"   Правильных: {total_correct or 0}\n"
+            f"   Ошибок: {total_errors or 0}\n\n"
+        )
+    return message_text
+
+
+def benchmark(cards=50, users=20):
+    """
+    Запросы к БД и время на карточку, как в handlers.train: new_user
+    и create_words. «В обработчике» — запросы потока обработчика,
+    «всего» — вместе с фоновым пополнением буфера и записью показов.
+    Для сравнения — прогон с пустым кэшем user_ids, когда пользователь
+    ищется в таблице users на каждой карточке. Пользователи бенчмарка
+    удаляются после прогона
+    """
+    from types import SimpleNamespace
+
+    from sqlalchemy import text
+    from telebot import types
+
+    from default_db import engine
+
+    counts = {"handler": 0, "total": 0}
+    handler_thread = threading.get_ident()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts["total"] += 1
+        if threading.get_ident() == handler_thread:
+            counts["handler"] += 1
+
+    # отрицательный tg_id не совпадёт с настоящим пользователем
+    messages = [
+        SimpleNamespace(
+            from_user=types.User(-1_000_000 - n, False, f"bench{n}"),
+        )
+        for n in range(users)
+    ]
+    for message in messages:
+        new_user(message)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for name, cached in (("с кэшем", True), ("без кэша", False)):
+            seen_counter.flush_once()
+            counts.update(handler=0, total=0)
+            started = time.perf_counter()
+            for _ in range(cards):
+                for message in messages:
+                    if not cached:
+                        user_ids.clear()
+                    create_words(new_user(message))
+            elapsed = time.perf_counter() - started
+            seen_counter.flush_once()
+            n = cards * users
+            print(
+                f"{name:>8}: {counts['handler'] / n:.2f} запросов "
+                f"в обработчике, {counts['total'] / n:.2f} всего, "
+                f"{elapsed / n * 1000:.2f} мс на карточку"
+            )
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        prefetch_pool.shutdown(wait=True)
+        seen_counter.stop()
+        with engine.begin() as conn:
+            conn.execute(
+                text("DELETE FROM users WHERE tg_id = ANY(:ids)"),
+                {"ids": [m.from_user.id for m in messages]},
+            )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
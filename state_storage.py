@@ -0,0 +1,261 @@
+"""
+Хранилище состояний бота в PostgreSQL (таблица bot_states).
+
+В отличие от StateMemoryStorage состояние викторины переживает
+перезапуск и доступно нескольким репликам бота. Каждая запись живёт
+ttl секунд с последней записи; брошенные сессии удаляются
+периодической чисткой.
+
+    python state_storage.py [число карточек] — память против PostgreSQL
+"""
+import logging
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import case, cast, delete, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.exc import SQLAlchemyError
+from telebot.storage import StateStorageBase
+from telebot.storage.base_storage import StateDataContext
+
+from models import BotState
+
+logger = logging.getLogger(__name__)
+
+EMPTY_DATA = func.jsonb_build_object()
+
+
+class StatePostgresStorage(StateStorageBase):
+    """
+    Реализация StateStorageBase поверх UNLOGGED-таблицы.
+    Данные хранятся в JSONB, поэтому в них допустимы только
+    JSON-совместимые значения
+    """
+
+    def __init__(
+        self, engine, ttl=86400, purge_interval=300,
+        separator=":", prefix="telebot",
+    ):
+        self.engine = engine
+        self.ttl = timedelta(seconds=ttl)
+        self.purge_interval = purge_interval
+        self.separator = separator
+        self.prefix = prefix
+        self._purged_at = time.monotonic()
+        self._purge_lock = threading.Lock()
+
+    def _key(self, chat_id, user_id, business_connection_id=None,
+             message_thread_id=None, bot_id=None):
+        return self._get_key(
+            chat_id, user_id, self.prefix, self.separator,
+            business_connection_id, message_thread_id, bot_id,
+        )
+
+    def _alive(self, key):
+        return (BotState.key == key) & (BotState.expires_at > func.now())
+
+    def _execute(self, stmt):
+        # Core-соединение без ORM-сессии: запись — один оператор
+        with self.engine.begin() as conn:
+            return conn.execute(stmt).rowcount
+
+    def _scalar(self, stmt):
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).scalar()
+
+    def set_state(self, chat_id, user_id, state,
+                  business_connection_id=None, message_thread_id=None,
+                  bot_id=None):
+        if hasattr(state, "name"):
+            state = state.name
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        stmt = insert(BotState).values(
+            key=key,
+            state=state,
+            data=EMPTY_DATA,
+            expires_at=func.now() + self.ttl,
+        )
+        # Данные просроченной записи не наследуются новой сессией
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                "state": stmt.excluded.state,
+                "data": case(
+                    (BotState.expires_at > func.now(), BotState.data),
+                    else_=EMPTY_DATA,
+                ),
+                "expires_at": stmt.excluded.expires_at,
+            },
+        )
+        self._execute(stmt)
+        self._maybe_purge()
+        return True
+
+    def get_state(self, chat_id, user_id,
+                  business_connection_id=None, message_thread_id=None,
+                  bot_id=None):
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        return self._scalar(select(BotState.state).where(self._alive(key)))
+
+    def delete_state(self, chat_id, user_id,
+                     business_connection_id=None, message_thread_id=None,
+                     bot_id=None):
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        return self._execute(delete(BotState).where(self._alive(key))) > 0
+
+    def set_data(self, chat_id, user_id, key, value,
+                 business_connection_id=None, message_thread_id=None,
+                 bot_id=None):
+        _key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        # Атомарное слияние ключа в JSONB без чтения всей записи
+        stmt = (
+            update(BotState)
+            .where(self._alive(_key))
+            .values(
+                data=BotState.data.op("||")(
+                    func.jsonb_build_object(key, cast(value, JSONB))
+                ),
+                expires_at=func.now() + self.ttl,
+            )
+        )
+        if not self._execute(stmt):
+            raise RuntimeError(
+                f"StatePostgresStorage: key {_key} does not exist."
+            )
+        return True
+
+    def get_data(self, chat_id, user_id,
+                 business_connection_id=None, message_thread_id=None,
+                 bot_id=None):
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        data = self._scalar(select(BotState.data).where(self._alive(key)))
+        return data or {}
+
+    def reset_data(self, chat_id, user_id,
+                   business_connection_id=None, message_thread_id=None,
+                   bot_id=None):
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        stmt = (
+            update(BotState)
+            .where(self._alive(key))
+            .values(data=EMPTY_DATA, expires_at=func.now() + self.ttl)
+        )
+        return self._execute(stmt) > 0
+
+    def get_interactive_data(self, chat_id, user_id,
+                             business_connection_id=None,
+                             message_thread_id=None, bot_id=None):
+        return StateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    def save(self, chat_id, user_id, data,
+             business_connection_id=None, message_thread_id=None,
+             bot_id=None):
+        key = self._key(
+            chat_id, user_id, business_connection_id, message_thread_id,
+            bot_id,
+        )
+        stmt = (
+            update(BotState)
+            .where(self._alive(key))
+            .values(data=data, expires_at=func.now() + self.ttl)
+        )
+        return self._execute(stmt) > 0
+
+    def purge_expired(self):
+        """
+        Удаляет брошенные сессии, возвращает число удалённых записей
+        """
+        removed = self._execute(
+            delete(BotState).where(BotState.expires_at <= func.now())
+        )
+        if removed:
+            logger.info("Удалено просроченных состояний: %s", removed)
+        return removed
+
+    def _maybe_purge(self):
+        """
+        Чистка не чаще раза в purge_interval секунд; ошибка чистки
+        не должна ломать обработку сообщения
+        """
+        if not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._purged_at < self.purge_interval:
+                return
+            self._purged_at = now
+            self.purge_expired()
+        except SQLAlchemyError as e:
+            logger.exception("Ошибка БД при чистке состояний: %s", e)
+        finally:
+            self._purge_lock.release()
+
+    def __str__(self):
+        return f"<StatePostgresStorage: ttl={self.ttl}>"
+
+
+def benchmark(cards=2000, users=500):
+    """
+    Карточек в секунду для StateMemoryStorage и StatePostgresStorage:
+    на карточку set_state, retrieve_data с сохранением, get_state
+    и get_data, как в обработчиках викторины. Ключи PostgreSQL — с
+    префиксом bench и удаляются после прогона
+    """
+    from telebot.storage import StateMemoryStorage
+
+    from default_db import engine
+
+    data = {"card": [395, [395, 12, 48, 7]]}
+    storages = (
+        ("память", StateMemoryStorage()),
+        ("postgres", StatePostgresStorage(engine, prefix="bench")),
+    )
+    try:
+        for name, storage in storages:
+            started = time.perf_counter()
+            for n in range(cards):
+                user_id = n % users
+                storage.set_state(user_id, user_id, "StateWords:choose_word")
+                with StateDataContext(storage, user_id, user_id) as state:
+                    state.update(data)
+                storage.get_state(user_id, user_id)
+                storage.get_data(user_id, user_id)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:>8}: {cards / elapsed:9.0f} карточек/с, "
+                f"{elapsed / cards * 1000:.3f} мс на карточку"
+            )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(BotState).where(BotState.key.like("bench:%")))
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,71 @@
+"""
+Тесты с локальным Postgres из .env (DB_HOST, DB_NAME, ...). Схема
+должна быть готова: python default_db.py migrate. Без настроенной или
+доступной БД тесты пропускаются.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from sqlalchemy.exc import OperationalError
+
+    from config import config
+
+    if not config.db_name:
+        pytest.skip("БД не настроена (DB_NAME)")
+    from default_db import engine
+
+    try:
+        with engine.connect():
+            pass
+    except OperationalError as e:
+        pytest.skip(f"БД недоступна: {e.orig}")
+    return engine
+
+
+@pytest.fixture
+def user_word(engine):
+    """
+    Временные пользователь и слово общего словаря: (user_id, word_id).
+    После теста удаляются вместе с историей и журналом ответов
+    """
+    from sqlalchemy import text
+
+    tag = uuid.uuid4().hex[:12]
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            text(
+                "INSERT INTO users (username, tg_id) "
+                "VALUES (:name, :tg_id) RETURNING user_id"
+            ),
+            # отрицательный tg_id не совпадёт с настоящим пользователем
+            {"name": f"test_{tag}", "tg_id": -int(tag, 16) - 1},
+        ).scalar()
+        word_id = conn.execute(
+            text(
+                "INSERT INTO words (original, translation) "
+                "VALUES (:word, 'тест') RETURNING word_id"
+            ),
+            {"word": f"test{tag}"},
+        ).scalar()
+    yield user_id, word_id
+    with engine.begin() as conn:
+        conn.execute(
+            text("DELETE FROM answer_events WHERE user_id = :user_id"),
+            {"user_id": user_id},
+        )
+        conn.execute(
+            text("DELETE FROM users WHERE user_id = :user_id"),
+            {"user_id": user_id},
+        )
+        conn.execute(
+            text("DELETE FROM words WHERE word_id = :word_id"),
+            {"word_id": word_id},
+        )
@@ -0,0 +1,66 @@
+"""
+Журнал answer_events пишется в транзакции пакета ответов: откаченный
+пакет не оставляет строк, а повтор по ключам не дублирует их
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+# Слова с таким id нет: upsert learning_history нарушит внешний ключ
+# (отрицательные id — карточки словаря пользователя, без истории)
+MISSING_WORD = 2 ** 31 - 1
+
+
+def batch(user_id, word_ids):
+    import event_log
+
+    return {
+        (user_id, word_id): event_log.answer_event(True)
+        for word_id in word_ids
+    }
+
+
+def logged(engine, user_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                "SELECT word_id FROM answer_events "
+                "WHERE user_id = :user_id ORDER BY word_id"
+            ),
+            {"user_id": user_id},
+        ).scalars().all()
+
+
+@pytest.fixture(params=["sync", "async"])
+def flush_answers(request, engine):
+    if request.param == "sync":
+        import services
+
+        return services.flush_answers
+
+    import async_db
+    import async_services
+
+    def flush(events):
+        async def run():
+            try:
+                await async_services.flush_answers(events)
+            finally:
+                await async_db.engine.dispose()
+
+        asyncio.run(run())
+
+    return flush
+
+
+def test_rolled_back_flush_leaves_no_events(engine, user_word, flush_answers):
+    user_id, _ = user_word
+    flush_answers(batch(user_id, [MISSING_WORD]))
+    assert logged(engine, user_id) == []
+
+
+def test_retried_keys_are_logged_once(engine, user_word, flush_answers):
+    user_id, word_id = user_word
+    flush_answers(batch(user_id, [word_id, MISSING_WORD]))
+    assert logged(engine, user_id) == [word_id]
@@ -0,0 +1,106 @@
+"""
+Запись ответов не теряет инкременты, когда потоки бота (или несколько
+процессов) пишут ответы на одно слово одновременно
+"""
+import threading
+
+from sqlalchemy import text
+
+THREADS = 4
+BATCHES = 100
+ANSWERS = 5
+
+
+def history(engine, user_id, word_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                "SELECT lh.correct_count, lh.fail_count, "
+                "us.total_correct, us.total_errors "
+                "FROM learning_history lh "
+                "JOIN user_stats us USING (user_id) "
+                "WHERE lh.user_id = :user_id AND lh.word_id = :word_id"
+            ),
+            {"user_id": user_id, "word_id": word_id},
+        ).one()
+
+
+def run_threads(target):
+    start = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(n):
+        start.wait()
+        try:
+            target(n)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=worker, args=(n,)) for n in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_concurrent_batches_keep_every_answer(engine, user_word):
+    """
+    Пакеты разных потоков на один ключ: upsert увеличивает счётчики
+    в БД, ни один ответ не теряется
+    """
+    import event_log
+    import services
+
+    user_id, word_id = user_word
+
+    def write(n):
+        # чётные потоки отвечают верно, нечётные — с ошибкой
+        for _ in range(BATCHES):
+            events = {
+                (user_id, word_id): [
+                    answer
+                    for _ in range(ANSWERS)
+                    for answer in event_log.answer_event(n % 2 == 0)
+                ]
+            }
+            services.write_batch(events, services.write_answers)
+
+    run_threads(write)
+
+    expected = THREADS // 2 * BATCHES * ANSWERS
+    assert tuple(history(engine, user_id, word_id)) == (
+        expected, expected, expected, expected,
+    )
+
+
+def test_concurrent_answers_through_buffer(engine, user_word, monkeypatch):
+    """
+    update_learning_history из нескольких потоков: буфер схлопывает
+    ответы под lock, после остановки в БД все до одного
+    """
+    import services
+    from batching import WriteBehindBuffer
+
+    user_id, word_id = user_word
+    buffer = WriteBehindBuffer(
+        services.flush_answers, interval=0.01, max_events=50,
+        merge=services.answer_buffer.merge,
+    )
+    monkeypatch.setattr(services, "answer_buffer", buffer)
+
+    def answer(n):
+        for _ in range(BATCHES):
+            services.update_learning_history(user_id, word_id, n % 2 == 0)
+
+    try:
+        run_threads(answer)
+    finally:
+        buffer.stop()
+
+    expected = THREADS // 2 * BATCHES
+    assert tuple(history(engine, user_id, word_id)) == (
+        expected, expected, expected, expected,
+    )
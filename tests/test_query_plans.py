@@ -0,0 +1,65 @@
+"""
+Поиски слов идут по индексам из models.py. В тестовой БД таблицы
+маленькие, и планировщик выбрал бы Seq Scan, поэтому он запрещается:
+тест проверяет, что индекс подходит к запросу, а не оценку стоимости
+"""
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+import queries
+
+USER_ID = 1
+
+
+def plan(engine, stmt):
+    """
+    Текст EXPLAIN запроса stmt (без выполнения)
+    """
+    sql = stmt.compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={"literal_binds": True},
+    )
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text(f"EXPLAIN {sql}")).scalars().all()
+        conn.rollback()
+    return "\n".join(rows)
+
+
+def uses_index(explained, index):
+    return re.search(
+        rf"(Index Scan|Index Only Scan) using {index}\b"
+        rf"|Bitmap Index Scan on {index}\b",
+        explained,
+    )
+
+
+@pytest.mark.parametrize(
+    ("stmt", "indexes"),
+    [
+        # «Удалить слово»: поиск слова общего словаря без учёта регистра
+        (
+            queries.hide_word(USER_ID, "Apple"),
+            ["ix_words_original_lower"],
+        ),
+        (
+            queries.find_user_word(USER_ID, "Apple"),
+            ["uq_dictionaries_user_word"],
+        ),
+        # слова пользователя — по префиксу user_id уникального индекса
+        (queries.user_words(USER_ID), ["uq_dictionaries_user_word"]),
+        (
+            queries.due_words(USER_ID, 8, exclude=[1, 2]),
+            ["ix_learning_history_due", "hidden_words_pkey"],
+        ),
+    ],
+    ids=["hide_word", "find_user_word", "user_words", "due_words"],
+)
+def test_lookup_uses_index(engine, stmt, indexes):
+    explained = plan(engine, stmt)
+    for index in indexes:
+        assert uses_index(explained, index), explained
+    assert "Seq Scan" not in explained, explained
@@ -0,0 +1,233 @@
+"""
+Приём апдейтов через webhook (BOT_MODE=webhook).
+
+Telegram шлёт POST на локальный HTTP-сервер; апдейт кладётся в одну из
+ограниченных очередей, которые разбирает пул воркеров. Очередь выбирается
+по chat_id, поэтому сообщения одного пользователя обрабатываются строго
+по порядку, а разные пользователи — параллельно. Если очередь полна,
+сервер отвечает 503 и Telegram повторит доставку позже (backpressure).
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+import metrics
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Telegram держит до 40 параллельных соединений (max_connections),
+    стандартной очереди listen() на 5 соединений для этого мало
+    """
+
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def chat_key(update):
+    """
+    Ключ упорядочивания: чат апдейта (или сам апдейт, если чата нет)
+    """
+    message = update.message or update.edited_message
+    if message is not None:
+        return message.chat.id
+    callback = update.callback_query
+    if callback is not None:
+        return callback.from_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    """
+    Пул воркеров с отдельной ограниченной очередью на каждого.
+    handle(update) вызывается в потоке воркера
+    """
+
+    def __init__(self, handle, workers=8, queue_size=1000, put_timeout=1.0):
+        self.handle = handle
+        self.put_timeout = put_timeout
+        self._queues = [
+            queue.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self._threads = []
+        self.accepted = 0
+        self.rejected = 0
+        # от постановки в очередь до конца обработки
+        self.latency = Histogram()
+        self._lock = threading.Lock()
+
+    def start(self):
+        for idx, q in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker, args=(q,),
+                name=f"update-worker-{idx}", daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, update):
+        """
+        Ставит апдейт в очередь его чата. False — очередь переполнена
+        """
+        q = self._queues[hash(chat_key(update)) % len(self._queues)]
+        try:
+            q.put((time.perf_counter(), update), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def stop(self, timeout=30):
+        """
+        Дожидается обработки уже принятых апдейтов и останавливает воркеры
+        """
+        for q in self._queues:
+            q.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _worker(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            enqueued_at, update = item
+            try:
+                self.handle(update)
+            except Exception as e:
+                logger.exception(
+                    "Ошибка обработки апдейта %s: %s", update.update_id, e,
+                )
+            finally:
+                self.latency.observe(time.perf_counter() - enqueued_at)
+
+    def stats(self):
+        """
+        Глубина очередей, счётчики и задержка обработки
+        """
+        depths = [q.qsize() for q in self._queues]
+        with self._lock:
+            accepted, rejected = self.accepted, self.rejected
+        return {
+            "queue_depth": sum(depths),
+            "queue_depth_max": max(depths),
+            "accepted": accepted,
+            "rejected": rejected,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+def make_handler(dispatcher, path, secret=None, stats=None):
+    """
+    Класс обработчика HTTP-запросов для WebhookServer.
+    stats() — дополнительные метрики для GET /stats
+    """
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != path:
+                self._reply(404)
+                return
+            token = self.headers.get("X-Telegram-Bot-Api-Secret-Token")
+            if secret and token != secret:
+                self._reply(403)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                update = types.Update.de_json(
+                    json.loads(self.rfile.read(length))
+                )
+            except (ValueError, KeyError) as e:
+                logger.warning("Некорректный апдейт: %s", e)
+                self._reply(400)
+                return
+            self._reply(200 if dispatcher.submit(update) else 503)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                payload = dispatcher.stats()
+                if stats is not None:
+                    payload.update(stats())
+                self._reply(200, json.dumps(payload))
+            else:
+                self._reply(404)
+
+        def _reply(self, status, body=""):
+            payload = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return WebhookHandler
+
+
+def register_metrics(dispatcher):
+    """
+    Очереди и задержка диспетчера в /metrics
+    """
+    metrics.callback(
+        "webhook_queue_depth", "Апдейтов в очередях воркеров",
+        lambda: dispatcher.stats()["queue_depth"],
+    )
+    metrics.callback(
+        "webhook_updates", "Принятые и отклонённые (503) апдейты",
+        lambda: {
+            ("accepted",): dispatcher.accepted,
+            ("rejected",): dispatcher.rejected,
+        },
+        ("result",), kind="counter",
+    )
+    metrics.histogram(
+        "webhook_update_seconds", "От постановки в очередь до конца обработки",
+    ).bind((), dispatcher.latency)
+
+
+def serve(bot, host, port, path, url=None, secret=None, workers=8,
+          queue_size=1000, stats=None):
+    """
+    Регистрирует webhook (если задан url) и обслуживает его до Ctrl+C.
+    Апдейты обрабатываются воркерами, поэтому внутренний пул TeleBot
+    отключается — иначе порядок сообщений чата не гарантирован
+    """
+    bot.threaded = False
+    dispatcher = UpdateDispatcher(
+        lambda update: bot.process_new_updates([update]),
+        workers=workers, queue_size=queue_size,
+    )
+    dispatcher.start()
+    register_metrics(dispatcher)
+
+    if url:
+        bot.remove_webhook()
+        bot.set_webhook(url=url + path, secret_token=secret)
+
+    server = WebhookServer(
+        (host, port), make_handler(dispatcher, path, secret, stats),
+    )
+    logger.info("Webhook слушает %s:%s%s", host, port, path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.stop()
+        logger.info("Webhook остановлен: %s", dispatcher.stats())